@@ -0,0 +1,122 @@
+# allocation_optimizer.py
+#
+# Searches the SWP / FD / SCSS / POMIS split of the corpus for the best allocation.
+#
+# A candidate is (SWP %, Normal FD % of the FD money, SCSS amount, POMIS amount). The
+# grid covers SWP and Normal FD shares in fixed steps and SCSS / POMIS amounts from zero
+# up to their caps (single or joint limits); candidates whose schemes don't fit in the
+# FD money are dropped. Every candidate runs through ledger_engine.simulate_ledger() with
+# its parameters as (batch,) arrays, a few thousand per call, and is scored by
+#   - worst-year surplus: the lowest net cash flow of any year, or
+#   - terminal corpus: what is left in all buckets after the last year.
+# Candidates that leave expenses unfunded always rank below those that don't.
+
+import numpy as np
+
+from ledger_engine import simulate_ledger
+
+OBJECTIVES = {
+    "worst_surplus": "Best worst-year surplus",
+    "terminal_corpus": "Largest final corpus",
+}
+SWP_STEP = 5           # SWP % of the corpus, in steps of
+NORMAL_FD_STEP = 10    # Normal FD % of the FD money, in steps of
+SCHEME_STEPS = 6       # SCSS / POMIS amounts: 0, 1/6, ..., 6/6 of the cap
+CHUNK_SIZE = 4096      # candidates per ledger run
+
+
+def candidate_grid(corpus, scss_cap, pomis_cap):
+    """Every allocation on the grid, as parallel arrays; index 0 is left for the current plan."""
+    swp, normal, scss, pomis = np.meshgrid(
+        np.arange(0, 100 + SWP_STEP, SWP_STEP, dtype=float),
+        np.arange(0, 100 + NORMAL_FD_STEP, NORMAL_FD_STEP, dtype=float),
+        np.linspace(0.0, scss_cap, SCHEME_STEPS + 1),
+        np.linspace(0.0, pomis_cap, SCHEME_STEPS + 1),
+        indexing="ij",
+    )
+    grid = {"swp_percent": swp.ravel(), "normal_fd_percent": normal.ravel(),
+            "scss_amount": scss.ravel(), "pomis_amount": pomis.ravel()}
+    fits = grid["scss_amount"] + grid["pomis_amount"] <= corpus * (100.0 - grid["swp_percent"]) / 100.0
+    return {name: values[fits] for name, values in grid.items()}
+
+
+def evaluate_candidates(params, corpus, grid, years):
+    """Runs the ledger for every candidate; returns the score arrays."""
+    count = len(grid["swp_percent"])
+    scores = {name: np.empty(count) for name in ("worst_surplus", "terminal_corpus", "unfunded")}
+    for start in range(0, count, CHUNK_SIZE):
+        part = slice(start, start + CHUNK_SIZE)
+        swp_share = grid["swp_percent"][part] / 100.0
+        batch = dict(params)
+        batch.update({
+            "swp_corpus": corpus * swp_share,
+            "fd_fund": corpus * (1.0 - swp_share),
+            "normal_fd_share": grid["normal_fd_percent"][part] / 100.0,
+            "scss_amount": grid["scss_amount"][part],
+            "pomis_amount": grid["pomis_amount"][part],
+        })
+        ledger = simulate_ledger(batch, years)
+        scores["worst_surplus"][part] = ledger["net_cash_flow"].min(axis=-1)
+        scores["terminal_corpus"][part] = ledger["total_corpus"][..., -1]
+        scores["unfunded"][part] = ledger["unfunded"].sum(axis=-1)
+    return scores
+
+
+def pareto_front(x, y):
+    """Indexes of the points no other point beats on both x and y (both maximized), by x."""
+    if len(x) == 0:
+        return np.empty(0, dtype=int)
+    order = np.lexsort((-y, -x))
+    best_y = np.maximum.accumulate(y[order])
+    efficient = np.concatenate([[True], y[order][1:] > best_y[:-1]])
+    return order[efficient][::-1]
+
+
+def optimize_allocation(params, objective="worst_surplus", joint_limits=False, limits=None):
+    """
+    Best allocation for an evaluated plan (`params` from projection_engine.plan_params).
+    `limits` holds the SCSS / POMIS caps {"scss_single", "scss_joint", "pomis_single",
+    "pomis_joint"}. Returns the candidate arrays and their scores; "current" is the plan's
+    own allocation, "best" the recommended one and "frontier" the efficient candidates.
+    """
+    corpus = float(params["swp_corpus"] + params["fd_fund"])
+    years = int(params["years"])
+    if corpus <= 0 or years <= 0:
+        return None
+    kind = "joint" if joint_limits else "single"
+    grid = candidate_grid(corpus, limits[f"scss_{kind}"], limits[f"pomis_{kind}"])
+
+    current = {
+        "swp_percent": 100.0 * params["swp_corpus"] / corpus,
+        "normal_fd_percent": 100.0 * params["normal_fd_share"],
+        "scss_amount": params["scss_amount"],
+        "pomis_amount": params["pomis_amount"],
+    }
+    grid = {name: np.concatenate([[current[name]], values]) for name, values in grid.items()}
+    result = dict(grid)
+    result.update(evaluate_candidates(params, corpus, grid, years))
+
+    score = result[objective]
+    # Unfunded expenses first (rounded, so tiny float leftovers don't decide), then the objective
+    result["best"] = int(np.lexsort((-score, np.round(result["unfunded"])))[0])
+    # The frontier is drawn from the fully funded candidates, if there are any
+    pool = np.flatnonzero(np.round(result["unfunded"]) == 0)
+    if pool.size == 0:
+        pool = np.arange(len(score))
+    result["frontier"] = pool[pareto_front(result["worst_surplus"][pool], result["terminal_corpus"][pool])]
+    result["current"] = 0
+    result["candidates"] = len(score) - 1
+    return result
+
+
+def allocation_inputs(result, index):
+    """Plan inputs that apply candidate `index`."""
+    swp, normal = float(result["swp_percent"][index]), float(result["normal_fd_percent"][index])
+    return {
+        "GLSWPInvestmentPercentage": swp,
+        "GLNonSWPInvestmentPercentage": 100.0 - swp,
+        "GLNormalFDExcludingPOMISSCSS": normal,
+        "GLSrCitizenFDExcludingPOMISSCSS": 100.0 - normal,
+        "GLSCSSSingle": round(float(result["scss_amount"][index])),
+        "GLPOMISSingle": round(float(result["pomis_amount"][index])),
+    }
@@ -0,0 +1,299 @@
+# api_server.py
+#
+# HTTP JSON API over the projection engine, for clients other than the Streamlit app.
+#
+#   POST /v1/projections           {"plan": {...}, "monthly_resolution": false}
+#   POST /v1/scenarios             {"plan": {...}, "scenarios": {name: scenario}} (default: the plan's own)
+#   GET  /v1/results/{key}         a result the caller computed earlier, by its key
+#   GET  /v1/plans/me/projection   the caller's saved plan, projected
+#   GET  /metrics                  p50 / p99 latency per route, cache stats (needs a token too)
+#
+# Plans use the user_data file format ({FieldName: {"input": value}}); missing fields keep
+# their config defaults and linked rates are resolved against the rate table. Plans and
+# scenarios outside the input pages' limits (input_validation.py) or with malformed entries
+# are answered with a 422 before anything is projected.
+#
+# - Results are cached in a session_store.ArtifactStore, keyed by a hash of the request
+#   input (user, plan, resolution, rate table version), so a key only ever returns its own
+#   user's result. Identical requests arriving while one is being computed wait for that
+#   one instead of projecting again.
+# - Projections are CPU-bound, so they run in a process pool (API_WORKERS processes,
+#   0 = in the server process) and the event loop only parses, hashes and answers.
+# - Auth and storage are small interfaces: API_TOKENS ("token:user,token:user") and the
+#   {user}_user_data.json files by default, dicts in memory for local testing:
+#
+#       app = create_app(auth=TokenAuth({"t": "alice"}), storage=MemoryPlanStorage({"alice": plan}))
+#
+# Run with `python api_server.py` (API_HOST / API_PORT) or `uvicorn api_server:app`.
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import numpy as np
+from fastapi import Depends, FastAPI, HTTPException, Request
+from pydantic import BaseModel
+
+from config_registry import DESC_MAP, INPUT_DEFAULTS
+from custom_fields import CUSTOM_KEY, MAX_LINES, clean_line
+from input_validation import validate_inputs
+from plan_projection import evaluate_formula, prepare_plan, project_plan
+from rate_table import load_rate_table
+from scenarios import BASE_SCENARIO, MAX_SCENARIOS, SCENARIO_FIELDS, SCENARIOS_KEY, build_scenario_plan
+from session_store import ArtifactStore
+
+API_WORKERS = int(os.environ.get("API_WORKERS", str(os.cpu_count() or 1)))
+API_TOKENS = os.environ.get("API_TOKENS", "")
+# Latency samples kept per route for the percentiles
+LATENCY_WINDOW = 1000
+UNMATCHED_ROUTE = "(unmatched)"
+
+
+# --- Projection jobs (run in the worker processes) ---
+def projection_result(plan, monthly_resolution):
+    df, _ = project_plan(plan, monthly_resolution)
+    # Through to_json so NaN comes out as null and numpy values as plain numbers
+    return {"years": [] if df is None else json.loads(df.to_json(orient="records"))}
+
+
+def project_job(data, monthly_resolution):
+    return projection_result(prepare_plan(data), monthly_resolution)
+
+
+def scenario_job(data, scenario, monthly_resolution):
+    plan = prepare_plan(data)
+    if scenario is not None:
+        plan = build_scenario_plan(plan, scenario, evaluate_formula)
+    return projection_result(plan, monthly_resolution)
+
+
+# --- Request checks (in the event loop, before anything goes to the pool) ---
+def number_errors(values, prefix=""):
+    return [f"{prefix}{DESC_MAP[name]} must be a number." for name, value in values.items()
+            if isinstance(INPUT_DEFAULTS.get(name), (int, float)) and (isinstance(value, bool) or not isinstance(value, (int, float)))]
+
+
+def checked_plan(data, scenarios=None):
+    """
+    (plan, scenarios) of a request, with the custom lines cleaned. Scenarios default to the
+    plan's own. Raises a 422 listing every problem when an entry is malformed or an input is
+    outside the limits of the input pages (input_validation.py), so a plan with e.g. 100000
+    projection years is never projected.
+    """
+    if not all(isinstance(entry, dict) for entry in data.values()):
+        raise HTTPException(status_code=422, detail=['Every plan field must be an object like {"input": value}.'])
+    data = dict(data)
+    values = {name: entry["input"] for name, entry in data.items() if name in INPUT_DEFAULTS and "input" in entry}
+    errors = number_errors(values)
+    errors += validate_inputs({name: value for name, value in values.items() if not number_errors({name: value})}, data)
+
+    rows = data.get(CUSTOM_KEY, {}).get("input", [])
+    if not isinstance(rows, list) or len(rows) > MAX_LINES or not all(isinstance(row, dict) for row in rows):
+        errors.append(f"{CUSTOM_KEY} must be a list of up to {MAX_LINES} line objects.")
+    elif rows:
+        try:
+            data[CUSTOM_KEY] = {"input": [clean_line(row) for row in rows]}
+        except (TypeError, ValueError) as e:
+            errors.append(f"Custom line: {e}")
+
+    if scenarios is None:
+        scenarios = data.get(SCENARIOS_KEY, {}).get("input", {})
+    if not isinstance(scenarios, dict) or len(scenarios) > MAX_SCENARIOS:
+        errors.append(f"Scenarios must be an object of up to {MAX_SCENARIOS} named scenarios.")
+        scenarios = {}
+    for name, scenario in scenarios.items():
+        inputs = scenario.get("inputs", {}) if isinstance(scenario, dict) else None
+        if not isinstance(inputs, dict):
+            errors.append(f'Scenario "{name}" must be an object like {{"inputs": {{field: value}}}}.')
+            continue
+        unknown = [field for field in inputs if field not in SCENARIO_FIELDS]
+        if unknown:
+            errors.append(f'Scenario "{name}" can\'t change: {", ".join(map(str, unknown))}.')
+            continue
+        errors += number_errors(inputs, f'Scenario "{name}": ') or [f'Scenario "{name}": {message}' for message in validate_inputs(inputs, data)]
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return data, scenarios
+
+
+# --- Auth and storage ---
+class TokenAuth:
+    """Bearer tokens mapped to user names."""
+
+    def __init__(self, tokens):
+        self.tokens = dict(tokens)
+
+    @classmethod
+    def from_env(cls, spec=API_TOKENS):
+        pairs = (item.split(":", 1) for item in spec.split(",") if ":" in item)
+        return cls({token.strip(): user.strip() for token, user in pairs})
+
+    def user_for(self, authorization):
+        scheme, _, token = (authorization or "").partition(" ")
+        return self.tokens.get(token.strip()) if scheme.lower() == "bearer" else None
+
+
+class FilePlanStorage:
+    """The app's own plan files: {user}_user_data.json."""
+
+    def __init__(self, directory="."):
+        self.directory = directory
+
+    def load(self, user):
+        path = os.path.join(self.directory, f"{user}_user_data.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+
+class MemoryPlanStorage:
+    def __init__(self, plans=None):
+        self.plans = dict(plans or {})
+
+    def load(self, user):
+        return self.plans.get(user)
+
+
+class LatencyMetrics:
+    """Recent request latencies per route."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+
+    def record(self, route, seconds):
+        self._samples.setdefault(route, deque(maxlen=self.window)).append(seconds)
+        self._counts[route] = self._counts.get(route, 0) + 1
+
+    def report(self):
+        report = {}
+        for route, samples in self._samples.items():
+            p50, p99 = np.percentile(np.fromiter(samples, dtype=float), [50, 99]) * 1000.0
+            report[route] = {"count": self._counts[route], "p50_ms": round(p50, 2), "p99_ms": round(p99, 2)}
+        return report
+
+
+# --- Requests ---
+class ProjectionRequest(BaseModel):
+    plan: dict = {}
+    monthly_resolution: bool = False
+
+
+class ScenarioRequest(BaseModel):
+    plan: dict = {}
+    scenarios: dict | None = None
+    monthly_resolution: bool = False
+
+
+def request_key(user, kind, *parts):
+    payload = json.dumps([user, kind, load_rate_table().version, *parts], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def create_app(auth=None, storage=None, workers=API_WORKERS, cache=None):
+    auth = auth or TokenAuth.from_env()
+    storage = storage or FilePlanStorage()
+    results = cache or ArtifactStore()
+    metrics = LatencyMetrics()
+    pending = {}  # key -> future of a result being computed
+
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.pool = ProcessPoolExecutor(workers) if workers > 0 else ThreadPoolExecutor(1)
+        yield
+        app.state.pool.shutdown(cancel_futures=True)
+
+    app = FastAPI(title="Retirement Planner API", lifespan=lifespan)
+
+    @app.middleware("http")
+    async def measure(request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        # Route templates, so /v1/results/abc and /v1/results/def are one route; requests
+        # that match no route share one bucket, so unknown paths can't grow the map
+        route = request.scope.get("route")
+        metrics.record(getattr(route, "path", UNMATCHED_ROUTE), time.perf_counter() - started)
+        return response
+
+    def current_user(request: Request):
+        user = auth.user_for(request.headers.get("authorization"))
+        if user is None:
+            raise HTTPException(status_code=401, detail="Missing or unknown token")
+        return user
+
+    async def cached(user, key, job, *args):
+        """
+        `user`'s result for `key`, computed in the pool by job(*args) when it is not cached.
+        Results are stored under (user, key), so another user's key is never found.
+        """
+        result = results.get((user, key))
+        if result is not None:
+            return key, result, True
+        if key not in pending:
+            loop = asyncio.get_running_loop()
+            pending[key] = loop.run_in_executor(app.state.pool, job, *args)
+        try:
+            result = await asyncio.shield(pending[key])
+        except (TypeError, ValueError, AttributeError, KeyError) as e:
+            raise HTTPException(status_code=422, detail=f"Invalid plan: {e}")
+        finally:
+            pending.pop(key, None)
+        return key, results.put((user, key), result), False
+
+    def answer(key, result, was_cached):
+        return {"key": key, "cached": was_cached, **result}
+
+    @app.post("/v1/projections")
+    async def create_projection(body: ProjectionRequest, user: str = Depends(current_user)):
+        plan, _ = checked_plan(body.plan)
+        key = request_key(user, "projection", plan, body.monthly_resolution)
+        return answer(*await cached(user, key, project_job, plan, body.monthly_resolution))
+
+    @app.post("/v1/scenarios")
+    async def create_scenarios(body: ScenarioRequest, user: str = Depends(current_user)):
+        plan, requested = checked_plan(body.plan, body.scenarios)
+        scenarios = {BASE_SCENARIO: None, **requested}
+        # One job per scenario, so they run side by side in the pool
+        jobs = [cached(user, request_key(user, "scenario", plan, scenario, body.monthly_resolution),
+                       scenario_job, plan, scenario, body.monthly_resolution)
+                for scenario in scenarios.values()]
+        answers = await asyncio.gather(*jobs)
+        return {"scenarios": {name: answer(*result) for name, result in zip(scenarios, answers)}}
+
+    @app.get("/v1/results/{key}")
+    async def get_result(key: str, user: str = Depends(current_user)):
+        result = results.get((user, key))
+        if result is None:
+            # Also for another user's key: not found rather than forbidden, so keys can't be probed
+            raise HTTPException(status_code=404, detail="No cached result for this key")
+        return answer(key, result, True)
+
+    @app.get("/v1/plans/me/projection")
+    async def my_projection(monthly_resolution: bool = False, user: str = Depends(current_user)):
+        plan = storage.load(user)
+        if plan is None:
+            raise HTTPException(status_code=404, detail="No saved plan")
+        plan, _ = checked_plan(plan)
+        key = request_key(user, "projection", plan, monthly_resolution)
+        return answer(*await cached(user, key, project_job, plan, monthly_resolution))
+
+    @app.get("/metrics")
+    async def get_metrics(user: str = Depends(current_user)):
+        return {"latency": metrics.report(), "cache": results.stats(), "in_flight": len(pending)}
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get("API_HOST", "127.0.0.1"), port=int(os.environ.get("API_PORT", "8000")))
@@ -1,15 +1,43 @@
 # main.py
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
+import numpy as np
 import json
 import os
-import re
-import unicodedata
-import math
 import plotly.express as px
+import streamlit.components.v1 as components
 import plotly.graph_objects as go
-import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from config_data import * # Import all data from the new config file
+from config_registry import (
+    FIELD_MAP, DESC_MAP, INPUT_DEFAULTS, INVESTMENT_STATIC_FIELDS, INVESTMENT_DYNAMIC_FIELDS,
+    PLOT_LABEL_MAP, ONETIME_EXPENSES_DF, RECURRING_EXPENSES_DF,
+)
+from plan_state import PlanState
+from plan_projection import evaluate_formula, evaluate_input_formulas, evaluate_investment_formulas, project_plan
+from projection_engine import MONTHS_PER_YEAR, plan_params, monthly_projection_table
+from tax_engine import DEDUCT_TAX_OPTIONS, TAX_REGIMES, deducts_tax
+from ladder_model import KIND_LABELS, LADDER_KEY, PAYOUTS, RULES, clean_row, custom_ladder, default_ladder
+from ledger_engine import BUCKETS, BUCKET_LABELS, DEFAULT_WATERFALL, DEFAULT_SURPLUS_BUCKET, simulate_ledger, ledger_table, table_flows
+from backtest import PERCENTILES, load_history, run_backtest
+from allocation_optimizer import OBJECTIVES, allocation_inputs, optimize_allocation
+from custom_fields import GROWTH_TYPES, LINE_COLUMNS, LINE_TYPES, MAX_LINES, FormulaError, clean_line, load_lines, store_lines
+from whatif import WHATIF_FIELDS, income_expenses, interpolate, response_surface, slider_ranges, whatif_plan
+from mortality import life_table_note, load_life_table, scenario_outcomes, weighted_outcomes
+from cohort_analytics import FLAGS, METRICS, CohortStore, bin_labels, metric_summary, rebuild
+from household import MAX_MEMBERS, MEMBER_COLUMNS, clean_member, load_members, primary_member, project_household, scss_too_young, store_members
+from session_store import ArtifactStore
+from plan_store import open_plan, save_plan, close_plan
+from onboarding import seed_plan_inputs
+from rate_table import RATE_FIELDS, is_linked, link_rates, link_legacy_rates, load_rate_table, resolve_rates, stored_plan
+from input_validation import number_input_bounds, clamp_to_bounds, validate_inputs
+from scenarios import (
+    BASE_SCENARIO, MAX_SCENARIOS, SCENARIO_FIELDS, load_scenarios, store_scenarios, scenario_deltas,
+    build_scenario_plan, describe_scenario,
+)
 from fpdf import FPDF
 from fpdf.enums import XPos, YPos # <-- ADD THIS LINE
 import io
@@ -81,7 +109,11 @@ def fetch_users():
             "email": user_dict.get("email"),
             "name": user_dict.get("name"),
             "password": user_dict.get("password_hash"),
-            "premium": user_dict.get("premium", False)
+            "premium": user_dict.get("premium", False),
+            # Admins see the Cohort Analytics page
+            "admin": user_dict.get("admin", False),
+            # Accounts from before the wizard existed count as onboarded
+            "onboarding_complete": user_dict.get("onboarding_complete", True)
         }
     return users_data
 
@@ -99,30 +131,9 @@ authenticator = stauth.Authenticate(
 #
 # ############################################################################
 
-def clean_formula(formula):
-    if not isinstance(formula, str) or not formula.startswith("="):
-        return formula
-    formula = formula[1:].strip()
-    formula = unicodedata.normalize("NFKC", formula).strip()
-    formula = formula.replace("−", "-").replace("\u2212", "-")
-    return formula
-
 def eval_formula_with_debug(formula, data_context, field_name):
-    expression = clean_formula(formula)
-    def replacer(match):
-        var_name = match.group(1)
-        val = data_context.get(var_name, {}).get("input", 0)
-        try:
-            return str(float(val))
-        except (ValueError, TypeError):
-            return "0"
-    expression = re.sub(r"\{([^}]+)\}", replacer, expression)
-    try:
-        result = eval(expression, {"__builtins__": {"math": math, "min": min, "max": max}}, {})
-        return result
-    except Exception as e:
-        st.error(f"❌ ERROR in `{field_name}` ({expression}): {e}")
-        return 0
+    # The evaluator lives in plan_projection.py (shared with the API); errors are shown on the page
+    return evaluate_formula(formula, data_context, field_name, on_error=lambda message: st.error(f"❌ {message}"))
 
 def render_text_sheet(sheet_name, is_guest=False):
     st.header(sheet_name)
@@ -171,21 +182,75 @@ def plot_recurring_expenses(df_config, user_data):
         st.plotly_chart(fig, use_container_width=True)
 
 def store_and_eval_all_variables(calc_context):
-    # This function now only calculates secondary formulas (like totals)
-    # and will NOT overwrite any primary values calculated in the yearly loop.
-    for item in INVESTMENT_PLAN_CONFIG:
-        varname = item["Field Name"]
-        
-        # If a value was already calculated by our yearly loop, DO NOT overwrite it.
-        if varname in calc_context and "manual" in calc_context[varname].get("source", ""):
-            continue
+    # Investment Plan formulas; fields the yearly loop marked "manual" are kept (see plan_projection.py)
+    evaluate_investment_formulas(calc_context, eval_formula_with_debug)
 
-        formula = item["Field Value"]
-        if isinstance(formula, str) and formula.startswith("="):
-            value = eval_formula_with_debug(formula, calc_context, varname)
-            if varname not in calc_context:
-                calc_context[varname] = {}
-            calc_context[varname]["input"] = value
+def update_plan_input(varname, value):
+    """
+    Writes an input value into the session's plan. If it changed, the totals that depend on
+    it are refreshed and the plan is saved right away, so this also works from a fragment
+    rerun, which never reaches the save at the end of the script.
+    """
+    previous = user_data.get(varname, {}).get("input") if varname in user_data else None
+    if previous != value:
+        # Only real edits are written: rewriting the entry would also drop its source (e.g. a rate-table link)
+        user_data[varname] = {"input": value}
+        user_data.refresh_formulas({varname}, eval_formula_with_debug)
+        save_plan()
+
+# --- Batch edit mode ---
+# In batch mode each input section is a form: values are collected in `pending`, checked
+# with validate_inputs() and applied together on submit (one totals refresh, one save)
+# instead of one rerun per field.
+def input_mode_toggle():
+    # Kept outside the widget key so the mode carries over between the input pages
+    st.session_state.batch_input_mode = st.toggle(
+        "Batch edit", value=st.session_state.get("batch_input_mode", False),
+        help="Edit a whole section and apply it with one button. Values are checked first: ranges, "
+             "allocations adding up to 100% and the SCSS/POMIS limits.")
+    return st.session_state.batch_input_mode
+
+def batch_form(key, pending):
+    return st.form(key, border=False) if pending is not None else nullcontext()
+
+def plan_number_input(label, varname, current_value, pending, disabled):
+    # Forms get the config-derived ranges, so the browser rejects out-of-range values
+    if pending is None:
+        return st.number_input(label, value=current_value, key=varname, disabled=disabled)
+    return st.number_input(label, value=clamp_to_bounds(varname, current_value), key=varname, disabled=disabled,
+                           **number_input_bounds(varname))
+
+def commit_input(varname, value, pending):
+    if pending is None:
+        update_plan_input(varname, value)
+    else:
+        pending[varname] = value
+
+def rerun_section():
+    # A fragment rerun redraws just the section; during a full run the whole page goes again
+    ctx = get_script_run_ctx()
+    st.rerun(scope="fragment" if ctx and ctx.fragment_ids_this_run else "app")
+
+def submit_batch(pending, is_guest):
+    """Submit button of a batch form; must be called inside the form, after its fields."""
+    if pending is None:
+        return
+    if st.form_submit_button("Apply Changes", disabled=is_guest):
+        errors = validate_inputs(pending, user_data)
+        for error in errors:
+            st.error(error)
+        if not errors:
+            changed = {name for name, value in pending.items() if user_data.get(name, {}).get("input") != value}
+            for name in changed:
+                user_data[name] = {"input": pending[name]}
+            st.toast(f"Saved {len(changed)} change(s)." if changed else "No changes to save.")
+            if changed:
+                user_data.refresh_formulas(changed, eval_formula_with_debug)
+                save_plan()
+                pending.clear()
+                # Totals shown above the button were drawn with the old values
+                rerun_section()
+    pending.clear()
 
 def render_input_form(config_data, sheet_name, is_guest=False):
     # Define icons for the fields
@@ -193,7 +258,8 @@ def render_input_form(config_data, sheet_name, is_guest=False):
         "LocalKidsEducation": "🎓", "LocalHouseRenovation": "🏡", "LocalVehicleRenewal": "🚗",
         "LocalJewelry": "💎", "LocalTravelForeign": "✈️", "LocalOthers": "🛍️",
         "LocalMarriages": "💍", "LocalProperty": "🏘️",
-        "LocalTotalOneTimeMust": "✅", "LocalTotalOneTimeDelayed": "🏖️", "GrandTotalOneTime": "∑"
+        "LocalTotalOneTimeMust": "✅", "LocalTotalOneTimeDelayed": "🏖️", "GrandTotalOneTime": "∑",
+        "GLDelayedExpensesYear": "📅"
     }
 
     if sheet_name == "Capture Basic Data":
@@ -201,8 +267,10 @@ def render_input_form(config_data, sheet_name, is_guest=False):
         st.markdown("Enter your details below. Start with the basics and expand other sections as needed.")
 
         if not is_premium and not is_guest:
-            st.warning("Free accounts are limited to a 2-year projection. Upgrade to Premium for unlimited planning!")
-            user_data['GLProjectionYears'] = {'input': 2}
+            st.warning(f"Free accounts are limited to a {FREE_PROJECTION_YEARS}-year projection. Upgrade to Premium for unlimited planning!")
+            user_data['GLProjectionYears'] = {'input': FREE_PROJECTION_YEARS}
+
+        pending = {} if input_mode_toggle() else None
 
         # Helper function to generate a field, making the code cleaner
         def generate_field(varname, label, default_val, editable=True, is_percent=False):
@@ -210,98 +278,153 @@ def render_input_form(config_data, sheet_name, is_guest=False):
                 display_value = f"{default_val:,.1f}%" if is_percent else f"{default_val:,.0f}"
                 st.metric(label=label, value=display_value)
                 if varname not in user_data:
-                    user_data[varname] = {"input": default_val}
+                    update_plan_input(varname, default_val)
             else:
                 current_value = float(user_data.get(varname, {}).get("input", default_val))
                 # Apply the disabled flag for guest mode
-                user_input = st.number_input(label, value=current_value, key=varname, disabled=is_guest)
-                user_data[varname] = {"input": user_input}
+                user_input = plan_number_input(label, varname, current_value, pending, is_guest)
+                commit_input(varname, user_input, pending)
 
-        field_map = {item["Field Name"]: item for item in config_data}
+        field_map = FIELD_MAP
 
-        # --- Main Layout ---
-        col1, col2 = st.columns(2)
-
-        with col1:
-            with st.container(border=True):
+        # Each section is a fragment: changing one of its fields reruns only that section
+        @st.fragment
+        def personal_info_section():
+            with st.container(border=True), batch_form("personal_info_form", pending):
                 st.subheader("👤 Personal Info")
                 generate_field("GLAge", "Current Age", field_map["GLAge"]["Field Default Value"])
                 gender_options = ["Male", "Female"]
                 current_gender = user_data.get("GLGender", {}).get("input", field_map["GLGender"]["Field Default Value"])
                 user_gender = st.selectbox("Gender", options=gender_options, index=gender_options.index(current_gender) if current_gender in gender_options else 0, key="GLGender", disabled=is_guest)
-                user_data["GLGender"] = {"input": user_gender}
-        
-        with col2:
-            with st.container(border=True):
+                commit_input("GLGender", user_gender, pending)
+                submit_batch(pending, is_guest)
+
+        @st.fragment
+        def core_assumptions_section():
+            with st.container(border=True), batch_form("core_assumptions_form", pending):
                 st.subheader("🗓️ Core Assumptions")
                 # Make projection years non-editable for free users, but viewable for guests
                 generate_field("GLProjectionYears", "Projection Years", user_data.get("GLProjectionYears", {}).get("input", field_map["GLProjectionYears"]["Field Default Value"]), editable=(is_premium and not is_guest))
                 generate_field("GLInflationRate", "Assumed Annual Inflation", field_map["GLInflationRate"]["Field Default Value"], is_percent=True, editable=not is_guest)
+                submit_batch(pending, is_guest)
 
         # --- Rates Section with Edit Toggle ---
-        with st.container(border=True):
-            st.subheader("📈 Interest Rates & Growth Assumptions")
-            edit_rates = st.checkbox("Edit Default Rates and Assumptions", disabled=is_guest)
-
-            rate_cols = st.columns(4)
-            rate_fields = ["GLSrCitizenFDRate", "GLNormalFDRate", "GLSCSSRate", "GLPOMISRate"]
-            
-            for i, field_name in enumerate(rate_fields):
-                with rate_cols[i]:
-                    item = field_map[field_name]
-                    generate_field(item["Field Name"], item['Field Description'], item["Field Default Value"], editable=edit_rates and not is_guest, is_percent=True)
-
-            st.markdown("---")
-            swp_cols = st.columns(2)
-            with swp_cols[0]:
-                item = field_map["GLSWPGrowthRate"]
-                generate_field(item["Field Name"], item['Field Description'], item["Field Default Value"], editable=edit_rates and not is_guest, is_percent=True)
-            with swp_cols[1]:
-                item = field_map["GLSWPMonthlyWithdrawal"]
-                generate_field(item["Field Name"], item['Field Description'], item["Field Default Value"], editable=not is_guest)
+        @st.fragment
+        def rates_section():
+            with st.container(border=True):
+                st.subheader("📈 Interest Rates & Growth Assumptions")
+                # Outside the form, so ticking it takes effect immediately
+                edit_rates = st.checkbox("Edit Default Rates and Assumptions", disabled=is_guest)
+
+                with batch_form("rates_form", pending):
+                    rate_cols = st.columns(4)
+                    rate_fields = list(RATE_FIELDS)
+                    
+                    for i, field_name in enumerate(rate_fields):
+                        with rate_cols[i]:
+                            item = field_map[field_name]
+                            generate_field(item["Field Name"], item['Field Description'], user_data.get(field_name, {}).get("input", item["Field Default Value"]), editable=edit_rates and not is_guest, is_percent=True)
+                            effective = RATES.effective_from(field_name)
+                            if is_linked(user_data, field_name) and effective:
+                                st.caption(f"Published rate since {effective:%d %b %Y}")
+                            elif not is_linked(user_data, field_name):
+                                st.caption("Your own rate")
+
+                    st.markdown("---")
+                    swp_cols = st.columns(2)
+                    with swp_cols[0]:
+                        item = field_map["GLSWPGrowthRate"]
+                        generate_field(item["Field Name"], item['Field Description'], item["Field Default Value"], editable=edit_rates and not is_guest, is_percent=True)
+                    with swp_cols[1]:
+                        item = field_map["GLSWPMonthlyWithdrawal"]
+                        generate_field(item["Field Name"], item['Field Description'], item["Field Default Value"], editable=not is_guest)
+                    submit_batch(pending, is_guest)
+
+                own_rates = [name for name in RATE_FIELDS if not is_linked(user_data, name)]
+                if own_rates and st.button("Use Published Rates", disabled=is_guest,
+                                           help="Link these rates to the published rate table again; they then follow every rate change."):
+                    link_rates(user_data, own_rates)
+                    resolve_rates(user_data, RATES)
+                    save_plan()
+                    for name in own_rates:
+                        # Drop the widget state, or the old value would be written back
+                        st.session_state.pop(name, None)
+                    rerun_section()
 
         # --- Advanced Settings are hidden by default in an Expander ---
-        with st.expander("⚙️ Advanced Settings: Initial Corpus, Other Income & Allocations"):
-            c1, c2 = st.columns(2)
-            with c1:
-                with st.container(border=True):
-                    st.subheader("💰 Initial Corpus")
-                    corpus_fields = ["GLPFAccumulation", "GLPPFAccumulation", "GLSuperannuation"]
-                    for field_name in corpus_fields:
-                        item = field_map[field_name]
-                        generate_field(item["Field Name"], item["Field Description"], item["Field Default Value"], editable=not is_guest)
-
-            with c2:
-                with st.container(border=True):
-                    st.subheader("🏠 Other Income Sources (Yearly)")
-                    other_income_fields = ["GLDividendIncome", "GLAgricultureIncome", "GLTradingIncome", "GLRealStateIncome", "GLConsultingIncome"]
-                    for field_name in other_income_fields:
-                        item = field_map[field_name]
-                        generate_field(item["Field Name"], item["Field Description"], item["Field Default Value"], editable=not is_guest)
+        @st.fragment
+        def advanced_settings_section():
+            with batch_form("advanced_settings_form", pending):
+                c1, c2 = st.columns(2)
+                with c1:
+                    with st.container(border=True):
+                        st.subheader("💰 Initial Corpus")
+                        corpus_fields = ["GLPFAccumulation", "GLPPFAccumulation", "GLSuperannuation"]
+                        for field_name in corpus_fields:
+                            item = field_map[field_name]
+                            generate_field(item["Field Name"], item["Field Description"], item["Field Default Value"], editable=not is_guest)
+
+                with c2:
+                    with st.container(border=True):
+                        st.subheader("🏠 Other Income Sources (Yearly)")
+                        other_income_fields = ["GLDividendIncome", "GLAgricultureIncome", "GLTradingIncome", "GLRealStateIncome", "GLConsultingIncome"]
+                        for field_name in other_income_fields:
+                            item = field_map[field_name]
+                            generate_field(item["Field Name"], item["Field Description"], item["Field Default Value"], editable=not is_guest)
             
-            st.markdown("---")
-            c3, c4 = st.columns(2)
-            with c3:
-                with st.container(border=True):
-                    st.subheader("📊 Investment Allocation")
-                    alloc_fields = ["GLSWPInvestmentPercentage", "GLNonSWPInvestmentPercentage", "GLNormalFDExcludingPOMISSCSS", "GLSrCitizenFDExcludingPOMISSCSS"]
-                    for field_name in alloc_fields:
-                        item = field_map[field_name]
-                        generate_field(item["Field Name"], item["Field Description"], item["Field Default Value"], is_percent=True, editable=not is_guest)
+                st.markdown("---")
+                c3, c4 = st.columns(2)
+                with c3:
+                    with st.container(border=True):
+                        st.subheader("📊 Investment Allocation")
+                        alloc_fields = ["GLSWPInvestmentPercentage", "GLNonSWPInvestmentPercentage", "GLNormalFDExcludingPOMISSCSS", "GLSrCitizenFDExcludingPOMISSCSS"]
+                        for field_name in alloc_fields:
+                            item = field_map[field_name]
+                            generate_field(item["Field Name"], item["Field Description"], item["Field Default Value"], is_percent=True, editable=not is_guest)
             
-            with c4:
+                with c4:
+                    with st.container(border=True):
+                        st.subheader("🏦 Other Allowances & Annuities")
+                        allowance_fields = ["GLPOMISSingle", "GLSCSSSingle", "GLCurrentMonthlyRental", "GLMaxMonthlyRental", "GLAnnuityExistingMonthly", "GLPensionEPS"]
+                        for field_name in allowance_fields:
+                            item = field_map[field_name]
+                            generate_field(item["Field Name"], item["Field Description"], item["Field Default Value"], editable=not is_guest)
+
+                st.markdown("---")
                 with st.container(border=True):
-                    st.subheader("🏦 Other Allowances & Annuities")
-                    allowance_fields = ["GLPOMISSingle", "GLSCSSSingle", "GLCurrentMonthlyRental", "GLMaxMonthlyRental", "GLAnnuityExistingMonthly", "GLPensionEPS"]
-                    for field_name in allowance_fields:
-                        item = field_map[field_name]
-                        generate_field(item["Field Name"], item["Field Description"], item["Field Default Value"], editable=not is_guest)
+                    st.subheader("🧾 Tax")
+                    tax_cols = st.columns(3)
+                    with tax_cols[0]:
+                        current_regime = user_data.get("GLTaxRegime", {}).get("input", field_map["GLTaxRegime"]["Field Default Value"])
+                        regime = st.selectbox("Income Tax Regime", options=TAX_REGIMES, index=TAX_REGIMES.index(current_regime) if current_regime in TAX_REGIMES else 0, key="GLTaxRegime", disabled=is_guest)
+                        commit_input("GLTaxRegime", regime, pending)
+                        current_deduct = user_data.get("GLDeductComputedTax", {}).get("input", field_map["GLDeductComputedTax"]["Field Default Value"])
+                        deduct = st.selectbox("Deduct Computed Tax from Cash Flow", options=DEDUCT_TAX_OPTIONS, index=DEDUCT_TAX_OPTIONS.index(current_deduct) if current_deduct in DEDUCT_TAX_OPTIONS else 0, key="GLDeductComputedTax", disabled=is_guest,
+                                              help="Pay the computed tax out of every projection year, in place of the 'Miscellaneous (SWP - LTCG Tax)' expense.")
+                        commit_input("GLDeductComputedTax", deduct, pending)
+                    for col, field_name in zip(tax_cols[1:], ["GLSWPLCTGExemption", "GLSWPLCTGTaxSlab"]):
+                        with col:
+                            item = field_map[field_name]
+                            generate_field(item["Field Name"], item["Field Description"], item["Field Default Value"], is_percent=field_name.endswith("Slab"), editable=not is_guest)
+                    st.caption("Tax on SWP redemptions, interest and rent is computed for every projection year on the Investment Plan page.")
+                submit_batch(pending, is_guest)
+
+        # --- Main Layout ---
+        col1, col2 = st.columns(2)
+        with col1:
+            personal_info_section()
+        with col2:
+            core_assumptions_section()
+        rates_section()
+        with st.expander("⚙️ Advanced Settings: Initial Corpus, Other Income & Allocations"):
+            advanced_settings_section()
 
     elif sheet_name == "Capture Major One Time Expenses":
         st.header("💸 One-Time Expenses")
         st.markdown("Enter any large, one-off expenses you anticipate for retirement.")
+        pending = {} if input_mode_toggle() else None
         
-        field_map = {item["Field Name"]: item for item in config_data}
+        field_map = FIELD_MAP
 
         def generate_expense_field(varname, editable=True):
             item = field_map[varname]
@@ -320,8 +443,8 @@ def render_input_form(config_data, sheet_name, is_guest=False):
             else:
                 # For regular user inputs
                 current_value = float(user_data.get(varname, {}).get("input", default_val))
-                user_input = st.number_input(label, value=current_value, key=varname, disabled=is_guest)
-                user_data[varname] = {"input": user_input}
+                user_input = plan_number_input(label, varname, current_value, pending, is_guest)
+                commit_input(varname, user_input, pending)
 
             #if editable:
             #   current_value = float(user_data.get(varname, {}).get("input", default_val))
@@ -332,37 +455,46 @@ def render_input_form(config_data, sheet_name, is_guest=False):
             #    st.metric(label=label, value=f"{calculated_val:,.0f}")
             #    user_data[varname] = {"input": calculated_val}
         
-        col1, col2 = st.columns(2)
-        with col1:
+        # A fragment: editing an expense reruns only this section, totals and chart included
+        @st.fragment
+        def one_time_expenses_section():
+            with batch_form("one_time_expenses_form", pending):
+                col1, col2 = st.columns(2)
+                with col1:
+                    with st.container(border=True):
+                        st.subheader("✅ Must-Have Expenses")
+                        must_fields = ["LocalKidsEducation", "LocalHouseRenovation", "LocalVehicleRenewal", "LocalJewelry", "LocalTravelForeign", "LocalOthers"]
+                        for field in must_fields:
+                            generate_expense_field(field, editable=not is_guest)
+                        st.markdown("---")
+                        generate_expense_field("LocalTotalOneTimeMust", editable=False)
+
+                with col2:
+                    with st.container(border=True):
+                        st.subheader("🏖️ Optional / Delayed Expenses")
+                        delayed_fields = ["LocalMarriages", "LocalProperty"]
+                        for field in delayed_fields:
+                            generate_expense_field(field, editable=not is_guest)
+                        generate_expense_field("GLDelayedExpensesYear", editable=not is_guest)
+                        st.markdown("---")
+                        generate_expense_field("LocalTotalOneTimeDelayed", editable=False)
+                        warn_delayed_after_plan(user_data)
+                submit_batch(pending, is_guest)
+            
+            st.markdown("##")
             with st.container(border=True):
-                st.subheader("✅ Must-Have Expenses")
-                must_fields = ["LocalKidsEducation", "LocalHouseRenovation", "LocalVehicleRenewal", "LocalJewelry", "LocalTravelForeign", "LocalOthers"]
-                for field in must_fields:
-                    generate_expense_field(field, editable=not is_guest)
-                st.markdown("---")
-                generate_expense_field("LocalTotalOneTimeMust", editable=False)
+                generate_expense_field("GrandTotalOneTime", editable=False)
+            
+            plot_onetime_expenses(ONETIME_EXPENSES_DF, user_data)
 
-        with col2:
-            with st.container(border=True):
-                st.subheader("🏖️ Optional / Delayed Expenses")
-                delayed_fields = ["LocalMarriages", "LocalProperty"]
-                for field in delayed_fields:
-                    generate_expense_field(field, editable=not is_guest)
-                st.markdown("---")
-                generate_expense_field("LocalTotalOneTimeDelayed", editable=False)
-        
-        st.markdown("##")
-        with st.container(border=True):
-            generate_expense_field("GrandTotalOneTime", editable=False)
-        
-        df = pd.DataFrame(config_data)
-        plot_onetime_expenses(df, user_data)
+        one_time_expenses_section()
 
 def render_expenses_recurring(config_data, sheet_name, is_guest=False):
     st.header("🗓️ Monthly Recurring Expenses")
     st.markdown("Enter your typical monthly spending. The tool will calculate the annual total and apply inflation.")
+    pending = {} if input_mode_toggle() else None
 
-    field_map = {item["Field Name"]: item for item in config_data}
+    field_map = FIELD_MAP
     
     FIELD_ICONS = {
         "LocalGroceryVeg": "🛒", "LocalWaterElectricity": "💡", "LocalHouseRepairs": "🛠️", "LocalMaidServices": "🧹",
@@ -389,169 +521,159 @@ def render_expenses_recurring(config_data, sheet_name, is_guest=False):
         
         cols = st.columns([2, 1])
         with cols[0]:
-            user_input = st.number_input(label, value=current_value, key=varname, disabled=is_guest)
+            user_input = plan_number_input(label, varname, current_value, pending, is_guest)
         with cols[1]:
             st.metric(label="Yearly", value=f"{user_input * 12:,.0f}")
+        if varname == "LocalMiscellaneousTax" and deducts_tax(user_data):
+            st.caption("The projection uses the computed tax instead (Tax in Basic Data).")
             
-        user_data[varname] = {"input": user_input}
+        commit_input(varname, user_input, pending)
 
-    for group_title, fields in expense_groups.items():
-        with st.container(border=True):
-            st.subheader(group_title)
-            c1, c2 = st.columns(2)
-            for i, field_name in enumerate(fields):
-                if i % 2 == 0:
-                    with c1:
-                        generate_recurring_field(field_name)
-                else:
-                    with c2:
-                        generate_recurring_field(field_name)
-
-    st.markdown("---")
-    st.subheader("Totals")
-    total_cols = st.columns(2)
-    with total_cols[0]:
-        total_must_val = eval_formula_with_debug(field_map["GLTotalYearlyExpensesMust"]["Field Input"], user_data, "GLTotalYearlyExpensesMust")
-        st.metric("Total Yearly (Must-Have)", f"{total_must_val * 12:,.0f}")
-        user_data["GLTotalYearlyExpensesMust"] = {"input": total_must_val}
-
-    with total_cols[1]:
-        total_opt_val = eval_formula_with_debug(field_map["GLTotalYearlyExpensesOptional"]["Field Input"], user_data, "GLTotalYearlyExpensesOptional")
-        st.metric("Total Yearly (Optional)", f"{total_opt_val * 12:,.0f}")
-        user_data["GLTotalYearlyExpensesOptional"] = {"input": total_opt_val}
-
-    df = pd.DataFrame(config_data)
-    plot_recurring_expenses(df, user_data)
-
-def inject_pwa_script():
+    # A fragment: editing an expense reruns only this section, totals and chart included
+    @st.fragment
+    def recurring_expenses_section():
+        with batch_form("recurring_expenses_form", pending):
+            for group_title, fields in expense_groups.items():
+                with st.container(border=True):
+                    st.subheader(group_title)
+                    c1, c2 = st.columns(2)
+                    for i, field_name in enumerate(fields):
+                        if i % 2 == 0:
+                            with c1:
+                                generate_recurring_field(field_name)
+                        else:
+                            with c2:
+                                generate_recurring_field(field_name)
+            submit_batch(pending, is_guest)
+
+        st.markdown("---")
+        st.subheader("Totals")
+        total_cols = st.columns(2)
+        with total_cols[0]:
+            total_must_val = eval_formula_with_debug(field_map["GLTotalYearlyExpensesMust"]["Field Input"], user_data, "GLTotalYearlyExpensesMust")
+            st.metric("Total Yearly (Must-Have)", f"{total_must_val * 12:,.0f}")
+            user_data["GLTotalYearlyExpensesMust"] = {"input": total_must_val}
+
+        with total_cols[1]:
+            total_opt_val = eval_formula_with_debug(field_map["GLTotalYearlyExpensesOptional"]["Field Input"], user_data, "GLTotalYearlyExpensesOptional")
+            st.metric("Total Yearly (Optional)", f"{total_opt_val * 12:,.0f}")
+            user_data["GLTotalYearlyExpensesOptional"] = {"input": total_opt_val}
+
+        plot_recurring_expenses(RECURRING_EXPENSES_DF, user_data)
+
+    recurring_expenses_section()
+
+# PWA files are served by Streamlit from ./static (server.enableStaticServing) at app/static/
+PWA_STATIC_DIR = "static"
+PWA_FILES = ("manifest.json", "service-worker.js", "offline.html")
+# Years of the last projection kept for offline viewing
+PWA_SUMMARY_YEARS = 40
+
+@st.cache_resource(show_spinner=False)
+def pwa_payload():
     """
-    Injects the PWA manifest and service worker registration script into the app.
+    Manifest link and service worker registration, built once per process. None if the
+    PWA files are missing. Runs in a component iframe, so it works on the parent page.
     """
-    # Read the manifest and service worker files
-    try:
-        with open("manifest.json", "r") as f:
-            manifest_content = f.read()
-        with open("service-worker.js", "r") as f:
-            service_worker_content = f.read()
-    except FileNotFoundError:
-        st.error("PWA files (manifest.json, service-worker.js) not found. Please ensure they are in the root directory.")
-        return
-
-    # PWA registration script
-    pwa_script = f"""
-    <link rel="manifest" href="data:application/manifest+json;base64,{base64.b64encode(manifest_content.encode()).decode()}">
+    if not all(os.path.exists(os.path.join(PWA_STATIC_DIR, name)) for name in PWA_FILES):
+        return None
+    return """
     <script>
-        if ('serviceWorker' in navigator) {{
-            const swContent = `{service_worker_content}`;
-            const swBlob = new Blob([swContent], {{type: 'application/javascript'}});
-            const swUrl = URL.createObjectURL(swBlob);
-
-            navigator.serviceWorker.register(swUrl).then(function(registration) {{
-                console.log('Service Worker registration successful with scope: ', registration.scope);
-            }}).catch(function(err) {{
-                console.log('Service Worker registration failed: ', err);
-            }});
-        }}
+    const page = window.parent;
+    const staticRoot = new URL("app/static/", page.location.href);
+    if (!page.document.querySelector('link[rel="manifest"]')) {
+        const link = page.document.createElement("link");
+        link.rel = "manifest";
+        link.href = new URL("manifest.json", staticRoot).href;
+        page.document.head.appendChild(link);
+    }
+    if ("serviceWorker" in page.navigator) {
+        const worker = new URL("service-worker.js", staticRoot).href;
+        // The whole app when the server allows it (Service-Worker-Allowed: /), else app/static/ only
+        page.navigator.serviceWorker.register(worker, {scope: new URL("../../", staticRoot).href})
+            .catch(() => page.navigator.serviceWorker.register(worker))
+            .catch((err) => console.log("Service Worker registration failed: ", err));
+    }
+    const summary = window.PROJECTION_SUMMARY;
+    if (summary && "caches" in page) {
+        summary.saved_at = new Date().toISOString();
+        page.caches.open("planner-summary").then((cache) => cache.put(
+            new URL("summary.json", staticRoot).href,
+            new Response(JSON.stringify(summary), {headers: {"Content-Type": "application/json"}})));
+    }
     </script>
     """
-    st.markdown(pwa_script, unsafe_allow_html=True)
 
-def calculate_projections():
+def projection_summary(df_projections):
+    """The few columns of a projection the offline page shows."""
+    years = df_projections.head(PWA_SUMMARY_YEARS)
+    data = income_expense_data(years)
+    shortfall = data.loc[data['Total Income'] < data['Total Expenses'], 'Year']
+    return {
+        "years": [{"Year": int(year), "Income": float(income), "Expenses": float(expenses), "Corpus": float(corpus)}
+                  for year, income, expenses, corpus in zip(data['Year'], data['Total Income'], data['Total Expenses'],
+                                                           years['LocalSWPBalancePostWithdrawal'])],
+        "first_shortfall": int(shortfall.iloc[0]) if not shortfall.empty else None,
+    }
+
+def inject_pwa_script(summary=None):
+    """
+    Injects the PWA manifest and service worker registration into the app, plus the summary
+    of the user's last projection for offline use (see static/service-worker.js).
+    """
+    payload = pwa_payload()
+    if payload is None:
+        st.error("PWA files (manifest.json, service-worker.js, offline.html) not found. Please ensure they are in the static directory.")
+        return
+    if summary is not None:
+        payload = f"<script>window.PROJECTION_SUMMARY = {json.dumps(summary)};</script>" + payload
+    components.html(payload, height=0)
+
+def calculate_projections(plan=None, monthly_resolution=None):
     """
     Runs the full financial projection loop and returns the calculated data.
+    Projects the user's plan unless another `plan` (e.g. a scenario) is given.
     """
-    projection_years = int(user_data.get("GLProjectionYears", {}).get("input", 1))
-    if projection_years <= 0:
-        return None, None
+    plan = user_data if plan is None else plan
+    if monthly_resolution is None:
+        monthly_resolution = st.session_state.get("monthly_resolution", False)
+    return project_plan(plan, monthly_resolution, eval_formula_with_debug)
 
-    base_context = json.loads(json.dumps(user_data))
-    store_and_eval_all_variables(base_context)
-    
-    # --- Get all base values needed for the loop ---
-    inflation_rate = base_context.get("GLInflationRate", {}).get("input", 0) / 100.0
-    base_monthly_rental = base_context.get("GLCurrentMonthlyRental", {}).get("input", 0)
-    max_monthly_rental = base_context.get("GLMaxMonthlyRental", {}).get("input", 0)
-    recurring_expense_varnames = [item['Field Name'] for item in RECURRING_EXPENSES_CONFIG if not item['Field Name'].startswith('GLTotal')]
-    base_recurring_expenses = {var: base_context.get(var, {}).get('input', 0) for var in recurring_expense_varnames}
-    
-    # Create a map for recurring expense formulas
-    recurring_field_map = {item["Field Name"]: item for item in RECURRING_EXPENSES_CONFIG}
-    
-    fd_investment_fund = base_context.get("LocalFDInvestmentFund", {}).get("input", 0)
-    scss_amount = base_context.get("LocalSCSSAmount", {}).get("input", 0)
-    pomis_amount = base_context.get("LocalPOMISAmount", {}).get("input", 0)
-    normal_fd_percent = base_context.get("LocalNormalFDPercent", {}).get("input", 0) / 100.0
-    sr_citizen_fd_percent = 1.0 - normal_fd_percent
-    
-    normal_fd_rate = base_context.get("GLNormalFDRate", {}).get("input", 0) / 100.0
-    sr_citizen_fd_rate = base_context.get("GLSrCitizenFDRate", {}).get("input", 0) / 100.0
-    pomis_rate = base_context.get("GLPOMISRate", {}).get("input", 0) / 100.0
-    scss_rate = base_context.get("GLSCSSRate", {}).get("input", 0) / 100.0
-    
-    swp_monthly_rate = base_context.get("LocalSWPMonthlyRate", {}).get("input", 0)
-    swp_monthly_withdrawal = base_context.get("GLSWPMonthlyWithdrawal", {}).get("input", 0)
-    
-    all_years_data = []
-    swp_corpus = base_context.get("LocalSWPInvestAmount", {}).get("input", 0)
+# One artifact store per process: projections, figures and PDFs are shared by content
+# hash across sessions instead of living in each session (see session_store.py)
+@st.cache_resource
+def artifact_store():
+    return ArtifactStore()
 
-    for year in range(1, projection_years + 1):
-        calc_context = json.loads(json.dumps(base_context))
-        
-        yearly_interest = swp_corpus * ((1 + swp_monthly_rate) ** 12 - 1)
-        yearly_withdrawal = swp_monthly_withdrawal * 12
-        ending_balance = swp_corpus + yearly_interest - yearly_withdrawal
-        
-        calc_context["LocalSWPInvestAmount"] = {"input": swp_corpus, "source": "manual"}
-        calc_context["LocalSWPYearlyInterest"] = {"input": yearly_interest, "source": "manual"}
-        calc_context["LocalSWPYearlyWithdrawal"] = {"input": yearly_withdrawal, "source": "manual"}
-        calc_context["LocalSWPBalancePostWithdrawal"] = {"input": ending_balance, "source": "manual"}
-        calc_context["GLSWPCorpusStatus"] = {"input": ending_balance - swp_corpus, "source": "manual"}
-        
-        # Inflate recurring expenses
-        for varname, base_value in base_recurring_expenses.items():
-            calc_context[varname] = {"input": base_value * ((1 + inflation_rate) ** (year - 1)), "source": "manual"}
-        
-        # ** THE FIX - Part 1: Explicitly calculate expense totals for the year **
-        must_formula = recurring_field_map["GLTotalYearlyExpensesMust"]["Field Input"]
-        optional_formula = recurring_field_map["GLTotalYearlyExpensesOptional"]["Field Input"]
-        total_must_val = eval_formula_with_debug(must_formula, calc_context, "GLTotalYearlyExpensesMust")
-        total_opt_val = eval_formula_with_debug(optional_formula, calc_context, "GLTotalYearlyExpensesOptional")
-        calc_context["GLTotalYearlyExpensesMust"] = {"input": total_must_val, "source": "manual"}
-        calc_context["GLTotalYearlyExpensesOptional"] = {"input": total_opt_val, "source": "manual"}
-        
-        # Inflate rental income
-        inflated_monthly_rental = base_monthly_rental * ((1 + inflation_rate) ** (year - 1))
-        calc_context["LocalRentalIncome"] = {"input": min(inflated_monthly_rental, max_monthly_rental) * 12, "source": "manual"}
-
-        # Time-based FD logic
-        if year <= 5:
-            fd_principal = fd_investment_fund - scss_amount - pomis_amount
-            calc_context["LocalNormalFDYearlyIncome"] = {"input": fd_principal * normal_fd_percent * normal_fd_rate, "source": "manual"}
-            calc_context["LocalSrFDYearlyIncomeFirst5"] = {"input": fd_principal * sr_citizen_fd_percent * sr_citizen_fd_rate, "source": "manual"}
-            calc_context["LocalPOMISYearlyIncome"] = {"input": pomis_amount * pomis_rate, "source": "manual"}
-            calc_context["LocalSCSSYearlyIncome"] = {"input": scss_amount * scss_rate, "source": "manual"}
-            calc_context["LocalSrFDYearlyIncomePast5"] = {"input": 0, "source": "manual"}
-        else:
-            fd_principal = fd_investment_fund
-            calc_context["LocalNormalFDYearlyIncome"] = {"input": fd_principal * normal_fd_percent * normal_fd_rate, "source": "manual"}
-            calc_context["LocalSrFDYearlyIncomePast5"] = {"input": fd_principal * sr_citizen_fd_percent * sr_citizen_fd_rate, "source": "manual"}
-            calc_context["LocalSrFDYearlyIncomeFirst5"] = {"input": 0, "source": "manual"}
-            calc_context["LocalPOMISYearlyIncome"] = {"input": 0, "source": "manual"}
-            calc_context["LocalSCSSYearlyIncome"] = {"input": 0, "source": "manual"}
-
-        store_and_eval_all_variables(calc_context)
-        
-        # ** THE FIX - Part 2: Collect all relevant data for the year **
-        year_data = {"Year": year}
-        for key, value_dict in calc_context.items():
-            if "input" in value_dict:
-                year_data[key] = value_dict["input"]
-        all_years_data.append(year_data)
-        
-        swp_corpus = ending_balance
-    
-    df_out = pd.DataFrame(all_years_data) if all_years_data else pd.DataFrame()
-    return df_out, base_context
+ARTIFACTS = artifact_store()
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+def cached_projection(plan=None, monthly_resolution=None):
+    """
+    calculate_projections() through the artifact store, keyed by the plan's content hash, so
+    a plan or scenario that has not changed is never projected twice. The returned table and
+    context are shared: read them, don't modify them.
+    """
+    plan = user_data if plan is None else plan
+    if monthly_resolution is None:
+        monthly_resolution = st.session_state.get("monthly_resolution", False)
+    key = ("projection", plan.content_hash(), bool(monthly_resolution))
+    return ARTIFACTS.get_or_create(key, lambda: calculate_projections(plan, monthly_resolution), current_session_id())
+
+def default_ladder_notice(what):
+    if custom_ladder(user_data):
+        st.info(f"{what} uses the default deposit schedule (SCSS/POMIS for five years, then FDs), not your custom deposit ladder.")
+
+def warn_delayed_after_plan(context):
+    # The ledger only charges the delayed expenses in a year the plan actually runs
+    def value(name):
+        return context.get(name, {}).get("input", INPUT_DEFAULTS.get(name, 0))
+    if value("LocalTotalOneTimeDelayed") > 0 and int(value("GLDelayedExpensesYear")) > int(value("GLProjectionYears")):
+        st.warning(f"The delayed one-time expenses fall due in Year {int(value('GLDelayedExpensesYear'))}, after the last "
+                   f"projection year ({int(value('GLProjectionYears'))}), so they are not counted. Add projection years or move them earlier.")
 
 def render_summary_page_old(config_data, is_guest=False):
     # ... (Your existing function, modified below) ...
@@ -568,11 +690,120 @@ def render_summary_page_old(config_data, is_guest=False):
         # (Your existing AI and PDF buttons go here)
         pass
 
+def income_expense_data(df_projections):
+    # Built next to the projection table, which is shared and must not be modified.
+    # Income is yearly, the expense totals are monthly amounts (scaled to a year here)
+    return pd.DataFrame({
+        'Year': df_projections['Year'],
+        'Total Income': df_projections['GLTotalIncomeOverallFDs'],
+        'Total Expenses': (df_projections['GLTotalYearlyExpensesMust'] + df_projections['GLTotalYearlyExpensesOptional']) * MONTHS_PER_YEAR,
+    })
+
+def income_expense_chart(df_chart):
+    fig = px.line(df_chart, x='Year', y=['Total Income', 'Total Expenses'], title="Income vs. Expense Projection", markers=True)
+    fig.update_layout(yaxis_title="Amount (₹)")
+    return fig
+
+def income_sources_chart(df_projections):
+    fields_to_plot = [
+        "LocalNormalFDYearlyIncome", "LocalSrFDYearlyIncomeFirst5", "LocalSrFDYearlyIncomePast5",
+        "LocalPOMISYearlyIncome", "LocalSCSSYearlyIncome", "LocalRentalIncome", "LocalDividentIncome",
+        "LocalAnnuityExisting", "LocalAnnuityNew", "LocalPensionEPS", "LocalTradingIncome",
+        "LocalRealStateIncome", "LocalConsultingIncome", "GLSWPCorpusStatus" 
+    ]
+    
+    plot_df = df_projections[["Year"] + [f for f in fields_to_plot if f in df_projections.columns]]
+    plot_df = plot_df.melt(id_vars="Year", var_name="Income/Gain Source", value_name="Amount")
+    plot_df["Income/Gain Source"] = plot_df["Income/Gain Source"].map(PLOT_LABEL_MAP)
+
+    fig = px.bar(plot_df, x="Year", y="Amount", color="Income/Gain Source", title="Yearly Income & SWP Gain/Loss Projection")
+    fig.update_layout(barmode="relative", xaxis_title="Year", yaxis_title="Amount (₹)")
+    return fig
+
+# What-if response surfaces are built by one background thread per process (see whatif.py).
+# Finished surfaces go to the artifact store; `pending` only holds the builds in flight.
+@st.cache_resource
+def whatif_worker():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="whatif"), {}
+
+# Stored instead of a surface that could not be built, so it is not retried on every rerun
+NO_SURFACE = {"axes": None}
+
+def whatif_surface(plan, ranges, monthly_resolution):
+    """
+    The plan's response surface; None while the background thread is still building it,
+    NO_SURFACE when it could not be built.
+    """
+    key = ("whatif_surface", plan.content_hash(), monthly_resolution)
+    session_id = current_session_id()
+    surface = ARTIFACTS.get(key, session_id)
+    if surface is not None:
+        return surface
+    executor, pending = whatif_worker()
+    if key not in pending:
+        future = pending[key] = executor.submit(response_surface, plan.copy(), ranges, monthly_resolution)
+        future.add_done_callback(lambda done: store_whatif_surface(key, done, pending, session_id))
+    return None
+
+def store_whatif_surface(key, future, pending, session_id):
+    # Runs on the worker thread when a build ends; stored first, so the key is never in neither place
+    surface = None if future.cancelled() or future.exception() is not None else future.result()
+    ARTIFACTS.put(key, NO_SURFACE if surface is None else surface, session_id)
+    pending.pop(key, None)
+
+def whatif_chart(years, plan_data, whatif_income, whatif_expenses, title):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=years, y=plan_data["Total Income"], name="Income (your plan)", line=dict(dash="dot", color="#1f77b4")))
+    fig.add_trace(go.Scatter(x=years, y=plan_data["Total Expenses"], name="Expenses (your plan)", line=dict(dash="dot", color="#d62728")))
+    fig.add_trace(go.Scatter(x=years, y=whatif_income, name="Income (what-if)", mode="lines+markers", line=dict(color="#1f77b4")))
+    fig.add_trace(go.Scatter(x=years, y=whatif_expenses, name="Expenses (what-if)", mode="lines+markers", line=dict(color="#d62728")))
+    fig.update_layout(title=title, yaxis_title="Amount (₹)", xaxis_title="Year")
+    return fig
+
+@st.fragment
+def render_whatif_section(df_chart):
+    """
+    What-if sliders; a slider change reruns only this section. The chart is first drawn
+    from the plan's precomputed response surface (interpolated, instant) and then replaced
+    by the exact projection of the chosen values.
+    """
+    st.subheader("What If?")
+    monthly_resolution = bool(st.session_state.get("monthly_resolution", False))
+    ranges = slider_ranges(user_data)
+    columns = st.columns(len(WHATIF_FIELDS))
+    values = {}
+    for column, (field, (label, _, _)) in zip(columns, WHATIF_FIELDS.items()):
+        low, high, value, step = ranges[field]
+        values[field] = column.slider(label, low, high, min(max(value, low), high), step, key=f"whatif_{field}")
+    if st.button("Reset to My Plan", key="whatif_reset"):
+        for field in WHATIF_FIELDS:
+            st.session_state.pop(f"whatif_{field}", None)
+        rerun_section()
+
+    surface = whatif_surface(user_data, ranges, monthly_resolution)
+    if surface is None:
+        st.caption("Preparing instant previews for these sliders...")
+    if all(values[field] == ranges[field][2] for field in WHATIF_FIELDS):
+        st.caption("Move a slider to compare with your plan.")
+        return
+
+    chart = st.empty()
+    if surface is not None and surface is not NO_SURFACE:
+        income, expenses = interpolate(surface, list(values.values()))
+        chart.plotly_chart(whatif_chart(df_chart["Year"], df_chart, income, expenses, "What-if Preview (approximate)"),
+                           use_container_width=True)
+    df_whatif, _ = cached_projection(whatif_plan(user_data, values), monthly_resolution)
+    if df_whatif is None or df_whatif.empty:
+        chart.empty()
+        return
+    income, expenses = income_expenses(df_whatif)
+    chart.plotly_chart(whatif_chart(df_chart["Year"], df_chart, income, expenses, "What-if Projection"), use_container_width=True)
+
 def render_summary_page(config_data, is_guest=False):
     st.header("📄 Financial Summary")
     st.markdown("This page provides a high-level overview of your financial projection.")
 
-    df_projections, year_1_context = calculate_projections()
+    df_projections, year_1_context = cached_projection()
 
     if df_projections is None or df_projections.empty:
         st.warning("Please set a valid 'Projection Years' value in the BaseData page to see the summary.")
@@ -585,7 +816,7 @@ def render_summary_page(config_data, is_guest=False):
         total_one_time = year_1_context.get("GrandTotalOneTime", {}).get("input", 0)
         st.metric("Total One-Time Expenses", f"{total_one_time:,.0f}")
     with c2:
-        total_must_recurring = year_1_context.get("GLTotalYearlyExpensesMust", {}).get("input", 0)
+        total_must_recurring = df_projections["GLTotalYearlyExpensesMust"].iloc[0]
         st.metric("Annual Recurring Expenses (Must)", f"{total_must_recurring * 12:,.0f}")
     with c3:
         initial_corpus = year_1_context.get("LocalStartingCorpus", {}).get("input", 0)
@@ -596,24 +827,20 @@ def render_summary_page(config_data, is_guest=False):
     # --- Income vs Expense Chart ---
     st.subheader("Income vs. Expenses Over Time")
     
-    # Calculate Total Expenses
-    df_projections['TotalYearlyExpenses'] = df_projections['GLTotalYearlyExpensesMust'] + df_projections['GLTotalYearlyExpensesOptional']
-    
-    # Prepare data for plotting
-    df_chart = df_projections[['Year', 'GLTotalIncomeOverallFDs', 'TotalYearlyExpenses']].copy()
-    df_chart.rename(columns={'GLTotalIncomeOverallFDs': 'Total Income', 'TotalYearlyExpenses': 'Total Expenses'}, inplace=True)
-    
-    fig_iv_exp = px.line(df_chart, x='Year', y=['Total Income', 'Total Expenses'], title="Income vs. Expense Projection", markers=True)
-    fig_iv_exp.update_layout(yaxis_title="Amount (₹)")
+    df_chart = income_expense_data(df_projections)
+    plan_key = (user_data.content_hash(), bool(st.session_state.get("monthly_resolution", False)))
+    fig_iv_exp = ARTIFACTS.get_or_create(("income_expense_chart",) + plan_key, lambda: income_expense_chart(df_chart), current_session_id())
     st.plotly_chart(fig_iv_exp, use_container_width=True)
 
+    render_whatif_section(df_chart)
+
     # --- Expense Breakdown Charts ---
     st.subheader("Initial Expense Breakdown")
     c1, c2 = st.columns(2)
     with c1:
-        plot_onetime_expenses(pd.DataFrame(ONETIME_EXPENSES_CONFIG), user_data)
+        plot_onetime_expenses(ONETIME_EXPENSES_DF, user_data)
     with c2:
-        plot_recurring_expenses(pd.DataFrame(RECURRING_EXPENSES_CONFIG), user_data)
+        plot_recurring_expenses(RECURRING_EXPENSES_DF, user_data)
     
     st.markdown("---")
 
@@ -626,7 +853,10 @@ def render_summary_page(config_data, is_guest=False):
         # --- PDF Download Section ---
         st.subheader("Download Report")
 
-        if st.button("Generate Summary PDF"):
+        # The PDF stays in the artifact store (not in the session) until the plan changes
+        pdf_key = ("summary_pdf", st.session_state['username']) + plan_key
+        pdf_output = ARTIFACTS.get(pdf_key, current_session_id())
+        if pdf_output is None and st.button("Generate Summary PDF"):
             with st.spinner("Creating PDF..."):
                 
                 # Prepare data for PDF
@@ -682,37 +912,105 @@ def render_summary_page(config_data, is_guest=False):
                     pdf.ln()
 
                 # ** THE FIX: Convert the bytearray to bytes **
-                pdf_output = bytes(pdf.output())
+                pdf_output = ARTIFACTS.put(pdf_key, bytes(pdf.output()), current_session_id())
                 
-                st.download_button(
-                    label="📥 Download as PDF",
-                    data=pdf_output,
-                    file_name=f"{st.session_state['username']}_financial_summary.pdf",
-                    mime="application/pdf"
-                )
+        if pdf_output is not None:
+            st.download_button(
+                label="📥 Download as PDF",
+                data=pdf_output,
+                file_name=f"{st.session_state['username']}_financial_summary.pdf",
+                mime="application/pdf"
+            )
+
+def render_deposit_ladder(is_guest=False):
+    # Rendered before the projections are computed, so an edit shows up in the same rerun
+    base_context = user_data.copy()
+    store_and_eval_all_variables(base_context)
+    stored_rows = custom_ladder(user_data)
+    rows = stored_rows or default_ladder(plan_params(base_context))
+
+    with st.expander("🪜 Deposit Ladder: FDs, SCSS & POMIS"):
+        st.markdown("Each row is a deposit with its own tenure, payout frequency and maturity rule. "
+                    "Renewals and rollovers are made at the rate in force at that time.")
+        # The key follows the stored rows, so the editor starts fresh after each saved change
+        editor_key = "deposit_ladder_" + hashlib.sha1(json.dumps(rows, sort_keys=True).encode()).hexdigest()[:12]
+        with st.form("deposit_ladder_form"):
+            edited = st.data_editor(
+                pd.DataFrame(rows), key=editor_key, num_rows="dynamic", hide_index=True, disabled=is_guest,
+                use_container_width=True,
+                column_config={
+                    "Instrument": st.column_config.SelectboxColumn(options=list(KIND_LABELS.values()), required=True),
+                    "Amount": st.column_config.NumberColumn(min_value=0, format="%.0f", required=True),
+                    "Start Year": st.column_config.NumberColumn(min_value=1, step=1, required=True),
+                    "Tenure (years)": st.column_config.NumberColumn(min_value=1, step=1, required=True),
+                    "Payout": st.column_config.SelectboxColumn(options=list(PAYOUTS), required=True),
+                    "At Maturity": st.column_config.SelectboxColumn(options=list(RULES), required=True),
+                })
+            apply_col, reset_col = st.columns(2)
+            with apply_col:
+                applied = st.form_submit_button("Apply Ladder", disabled=is_guest)
+            with reset_col:
+                reset = st.form_submit_button("Reset to Plan Defaults", disabled=is_guest or not stored_rows)
+
+        # No st.rerun() here: user_data is saved at the end of the run, and the projections
+        # below already pick up the change
+        if applied:
+            rows = [clean_row(row) for row in edited.to_dict("records") if row.get("Instrument") in KIND_LABELS.values()]
+            user_data[LADDER_KEY] = {"input": rows}
+        elif reset:
+            del user_data[LADDER_KEY]
+            rows = default_ladder(plan_params(base_context))
+
+        ladder_total = sum(float(row.get("Amount") or 0) for row in rows)
+        fd_fund = base_context.get("LocalFDInvestmentFund", {}).get("input", 0)
+        if ladder_total > fd_fund + 1:
+            st.warning(f"The ladder holds {ladder_total:,.0f}, more than the FD Investment Fund of {fd_fund:,.0f}.")
+
+# Years of the year-over-year table sent to the browser at a time
+TABLE_WINDOW_YEARS = 10
+
+def year_over_year_table(df_projections, fields):
+    """
+    The year-over-year table as one (fields, years) array of rounded numbers, plus its labels.
+    Built once per projection (artifact store) instead of transposing and styling on every rerun.
+    """
+    values = df_projections.reindex(columns=fields).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    return {
+        "fields": [DESC_MAP.get(field) for field in fields],
+        "years": [f"Year {year}" for year in range(1, len(df_projections) + 1)],
+        "values": np.round(values.T),
+    }
+
+def year_table_window(table, first_year, window=TABLE_WINDOW_YEARS):
+    """TABLE_WINDOW_YEARS columns of the table from `first_year` on, as a DataFrame."""
+    columns = slice(first_year - 1, first_year - 1 + window)
+    frame = pd.DataFrame(table["values"][:, columns], columns=table["years"][columns])
+    frame.insert(0, "Field Description", table["fields"])
+    return frame
 
 # It now calls the central calculation function.
 def render_output_table(config_data, sheet_name,is_guest=False):
     st.header("📈 Investment Plan Projections")
+    render_deposit_ladder(is_guest)
+    # Kept outside the widget key so the Summary page uses the same resolution
+    st.session_state.monthly_resolution = st.toggle(
+        "Monthly resolution", value=st.session_state.get("monthly_resolution", False),
+        disabled=custom_ladder(user_data) is not None,
+        help="Simulate month by month: monthly SWP withdrawals and POMIS payouts, quarterly SCSS interest and a mid-year inflation step.")
+    if custom_ladder(user_data) and st.session_state.monthly_resolution:
+        st.caption("Your custom deposit ladder is projected year by year; the monthly engine only knows the default schedule.")
     
-    df_projections, year_1_context = calculate_projections()
+    df_projections, year_1_context = cached_projection()
     
     if df_projections is None or df_projections.empty:
         st.warning("Please set a valid 'Projection Years' value in the BaseData page to see the projection.")
         return
 
     # --- UI and DataFrame Manipulation Starts Here ---
-    all_fields_ordered = [item['Field Name'] for item in config_data]
-    
-    all_fields_ordered.remove('LocalSWPInvestAmount')
-    pomis_index = all_fields_ordered.index('LocalPOMISAmount')
-    all_fields_ordered.insert(pomis_index + 1, 'LocalSWPInvestAmount')
-
-    split_index = all_fields_ordered.index('LocalSWPInvestAmount')
-    static_fields = all_fields_ordered[:split_index]
-    dynamic_fields = all_fields_ordered[split_index:]
+    static_fields = INVESTMENT_STATIC_FIELDS
+    dynamic_fields = list(INVESTMENT_DYNAMIC_FIELDS)
 
-    desc_map = {item["Field Name"]: item["Field Description"] for item in config_data}
+    desc_map = DESC_MAP
     year_1_data = df_projections.iloc[0].to_dict()
 
     st.subheader("Initial Investment Setup (Calculated for Year 1)")
@@ -728,54 +1026,481 @@ def render_output_table(config_data, sheet_name,is_guest=False):
             col_idx = (col_idx + 1) % len(cols)
 
     st.subheader("Year-over-Year Financial Projections")
+    plan_key = (user_data.content_hash(), bool(st.session_state.get("monthly_resolution", False)))
+    table = ARTIFACTS.get_or_create(("year_table",) + plan_key, lambda: year_over_year_table(df_projections, dynamic_fields), current_session_id())
+    years = table["values"].shape[1]
+    first_year = 1
+    if years > TABLE_WINDOW_YEARS:
+        windows = [(start, min(start + TABLE_WINDOW_YEARS - 1, years)) for start in range(1, years + 1, TABLE_WINDOW_YEARS)]
+        labels = [f"Years {start}-{end}" for start, end in windows]
+        choice = st.radio("Show", labels, horizontal=True, key="year_table_window")
+        first_year = windows[labels.index(choice)][0]
+    st.dataframe(year_table_window(table, first_year), hide_index=True,
+                 column_config={label: st.column_config.NumberColumn(format="localized") for label in table["years"]})
     
-    df_for_display = df_projections.drop(columns=['Year']).T
-    df_for_display.columns = [f"Year {y+1}" for y in range(len(df_projections))]
+    # Charting
+    fig = ARTIFACTS.get_or_create(("income_sources_chart",) + plan_key, lambda: income_sources_chart(df_projections), current_session_id())
+    st.plotly_chart(fig, use_container_width=True)
 
-    df_dynamic_display = df_for_display[df_for_display.index.isin(dynamic_fields)]
-    df_dynamic_display = df_dynamic_display.reindex(dynamic_fields)
+    # --- Cash-flow Ledger ---
+    st.subheader("💧 Cash-flow Ledger")
+    st.markdown("Each year's net cash flow is routed through your corpus: shortfalls are drawn in the order below, "
+                "surpluses are re-invested, and one-time expenses are paid in the year they fall due.")
+    ledger_cols = st.columns([3, 1])
+    with ledger_cols[0]:
+        waterfall = st.multiselect("Draw shortfalls from (in this order)", options=BUCKETS, default=DEFAULT_WATERFALL, format_func=BUCKET_LABELS.get)
+    with ledger_cols[1]:
+        surplus_bucket = st.selectbox("Re-invest surpluses into", options=BUCKETS, index=BUCKETS.index(DEFAULT_SURPLUS_BUCKET), format_func=BUCKET_LABELS.get)
+
+    params = plan_params(year_1_context)
+    params.update(table_flows(df_projections))
+    warn_delayed_after_plan(year_1_context)
+    default_ladder_notice("The cash-flow ledger")
+    ledger = simulate_ledger(params, len(df_projections), waterfall, surplus_bucket)
+    df_ledger = ledger_table(ledger)
+    st.dataframe(df_ledger.style.format(precision=0, thousands=","), hide_index=True)
+    if ledger["unfunded"].any():
+        first_gap = int(df_ledger.loc[df_ledger["Unfunded Shortfall"] > 0, "Year"].iloc[0])
+        st.warning(f"Your corpus cannot cover all expenses from Year {first_gap} onwards. Total unfunded shortfall: {ledger['unfunded'].sum():,.0f}")
+
+    fig_ledger = px.area(df_ledger, x="Year", y=[BUCKET_LABELS[name] for name in BUCKETS], title="Corpus by Bucket")
+    fig_ledger.update_layout(xaxis_title="Year", yaxis_title="Amount (₹)", legend_title="Bucket")
+    st.plotly_chart(fig_ledger, use_container_width=True)
+
+    # --- Survival-weighted view ---
+    if st.toggle("Weight by survival probability", key="survival_weighting",
+                 help="Count every year with the chance of still being alive in it, from a life table for your age and gender."):
+        render_survival_view(year_1_context, ledger, df_ledger)
+
+def render_survival_view(context, ledger, df_ledger):
+    life_table = load_life_table()
+    age = context.get("GLAge", {}).get("input", 0)
+    gender = context.get("GLGender", {}).get("input", "")
+    outcome = weighted_outcomes(life_table, age, gender, ledger["unfunded"])
+    life_expectancy = float(life_table.life_expectancy(age, gender))
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Life Expectancy", f"{life_expectancy:.1f} years", help=f"On average to about age {age + life_expectancy:.0f}")
+    m2.metric("Chance to Outlive the Corpus", f"{outcome['outlive_probability']:.0%}",
+              help="Chance of still being alive in the first year your corpus cannot cover the expenses.")
+    m3.metric("Expected Lifetime Shortfall", f"₹{outcome['expected_shortfall']:,.0f}",
+              help="Unfunded shortfalls, each year weighted by the chance of being alive in it.")
+    m4.metric("Chance to Outlive the Plan", f"{outcome['alive_at_end']:.0%}",
+              help="Chance of being alive after the last projection year. If it is high, consider more projection years.")
+    if life_table_note():
+        st.caption(life_table_note())
+
+    survival = pd.DataFrame({
+        "Year": df_ledger["Year"],
+        "Age": age + df_ledger["Year"] - 1,
+        "Survival Probability": outcome["weights"],
+        "Expected Net Cash Flow": outcome["weights"] * df_ledger["Net Cash Flow"],
+        "Unfunded Shortfall": df_ledger["Unfunded Shortfall"],
+        "Expected Shortfall": outcome["weights"] * df_ledger["Unfunded Shortfall"],
+    })
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=survival["Year"], y=survival["Unfunded Shortfall"], name="Unfunded Shortfall", marker_color="#f4a3a3"))
+    fig.add_trace(go.Bar(x=survival["Year"], y=survival["Expected Shortfall"], name="Expected Shortfall", marker_color="#d62728"))
+    fig.add_trace(go.Scatter(x=survival["Year"], y=survival["Survival Probability"], name="Survival Probability", yaxis="y2", mode="lines+markers"))
+    fig.update_layout(title="Shortfalls Weighted by Survival", barmode="overlay", xaxis_title="Year", yaxis_title="Amount (₹)",
+                      yaxis2=dict(title="Survival Probability", overlaying="y", side="right", range=[0, 1], tickformat=".0%"))
+    st.plotly_chart(fig, use_container_width=True)
+    with st.expander("Survival-weighted cash flow by year"):
+        st.dataframe(survival, hide_index=True, use_container_width=True, column_config={
+            "Survival Probability": st.column_config.NumberColumn(format="percent"),
+            **{name: st.column_config.NumberColumn(format="localized")
+               for name in ("Expected Net Cash Flow", "Unfunded Shortfall", "Expected Shortfall")},
+        })
+
+def scenario_summary(df_projections):
+    balance = df_projections["LocalSWPBalancePostWithdrawal"]
+    exhausted = df_projections.loc[balance <= 0, "Year"]
+    return {
+        "Final SWP Corpus": balance.iloc[-1],
+        "SWP Lasts (years)": f"{int(exhausted.iloc[0])}" if not exhausted.empty else f"{len(df_projections)}+",
+        "Total Income": df_projections["GLTotalIncomeOverallFDs"].sum(),
+        "Total Expenses": ((df_projections["GLTotalYearlyExpensesMust"] + df_projections["GLTotalYearlyExpensesOptional"]) * 12).sum(),
+        "Total Tax": df_projections["GLTotalTax"].sum(),
+    }
 
-    df_dynamic_display.insert(0, "Field Description", df_dynamic_display.index.map(desc_map))
+def render_scenarios_page(sheet_name, is_guest=False):
+    st.header("🔀 Compare Scenarios")
+    st.markdown("Save variants of your plan (a higher withdrawal, joint SCSS/POMIS limits, a different FD split...) "
+                "and compare them side by side. A scenario only stores what it changes, so it keeps following your base plan.")
+    scenarios = load_scenarios(user_data)
+    label_to_field = {DESC_MAP[name]: name for name in SCENARIO_FIELDS}
+
+    with st.expander("➕ Create or edit a scenario", expanded=not scenarios):
+        editing = st.selectbox("Scenario", ["New scenario"] + list(scenarios), key="scenario_edit_select")
+        current = scenarios.get(editing, {"inputs": {}, "joint_limits": False})
+        with st.form(f"scenario_form_{editing}"):
+            name = st.text_input("Scenario name", value="" if editing == "New scenario" else editing, disabled=is_guest)
+            overrides = pd.DataFrame([{"Field": DESC_MAP[field], "Value": value} for field, value in current["inputs"].items()],
+                                     columns=["Field", "Value"])
+            edited = st.data_editor(
+                overrides, num_rows="dynamic", hide_index=True, use_container_width=True, disabled=is_guest,
+                column_config={
+                    "Field": st.column_config.SelectboxColumn(options=list(label_to_field), required=True),
+                    "Value": st.column_config.NumberColumn(required=True),
+                })
+            joint = st.checkbox("Use joint SCSS/POMIS limits", value=current.get("joint_limits", False), disabled=is_guest)
+            save_col, delete_col = st.columns(2)
+            with save_col:
+                saved = st.form_submit_button("Save Scenario", disabled=is_guest)
+            with delete_col:
+                deleted = st.form_submit_button("Delete Scenario", disabled=is_guest or editing == "New scenario")
+
+        # Like the other pages, user_data is saved at the end of the run
+        name = name.strip()
+        if saved and not name:
+            st.error("Please give the scenario a name.")
+        elif saved and name == BASE_SCENARIO:
+            st.error(f"'{BASE_SCENARIO}' is reserved for your base plan.")
+        elif saved and name not in scenarios and len(scenarios) >= MAX_SCENARIOS:
+            st.error(f"You can keep up to {MAX_SCENARIOS} scenarios. Delete one to add another.")
+        elif saved:
+            inputs = {label_to_field[row["Field"]]: row["Value"] for row in edited.dropna().to_dict("records")}
+            scenarios.pop(editing, None)
+            scenarios[name] = {"inputs": scenario_deltas(user_data, inputs), "joint_limits": joint}
+            store_scenarios(user_data, scenarios)
+            st.success(f"Scenario '{name}' saved.")
+        elif deleted:
+            scenarios.pop(editing, None)
+            store_scenarios(user_data, scenarios)
+            st.success(f"Scenario '{editing}' deleted.")
+
+    if not scenarios:
+        st.info("No scenarios yet. Create one above to compare it with your current plan.")
+        return
 
-    final_table = df_dynamic_display.reset_index(drop=True)
-    st.dataframe(final_table.style.format(precision=0, thousands=","), hide_index=True)
-    
-    # Charting
-    fields_to_plot = [
-        "LocalNormalFDYearlyIncome", "LocalSrFDYearlyIncomeFirst5", "LocalSrFDYearlyIncomePast5",
-        "LocalPOMISYearlyIncome", "LocalSCSSYearlyIncome", "LocalRentalIncome", "LocalDividentIncome",
-        "LocalAnnuityExisting", "LocalAnnuityNew", "LocalPensionEPS", "LocalTradingIncome",
-        "LocalRealStateIncome", "LocalConsultingIncome", "GLSWPCorpusStatus" 
-    ]
-    
-    plot_df = df_projections[["Year"] + [f for f in fields_to_plot if f in df_projections.columns]]
-    plot_df = plot_df.melt(id_vars="Year", var_name="Income/Gain Source", value_name="Amount")
-    desc_map_plot = {name: desc.split(" - ")[0].split("(")[0] for name, desc in desc_map.items()}
-    plot_df["Income/Gain Source"] = plot_df["Income/Gain Source"].map(desc_map_plot)
+    selected = st.multiselect("Scenarios to compare", list(scenarios), default=list(scenarios)[:4])
+    monthly_resolution = st.session_state.get("monthly_resolution", False)
+    # Every scenario starts from the same evaluated base plan; unchanged ones come straight from the cache
+    plans = {BASE_SCENARIO: build_scenario_plan(user_data, {}, eval_formula_with_debug)}
+    for name in selected:
+        plans[name] = build_scenario_plan(user_data, scenarios[name], eval_formula_with_debug)
+    projections = {name: cached_projection(plan, monthly_resolution) for name, plan in plans.items()}
+    frames = {name: df for name, (df, _) in projections.items()}
+    if any(df is None or df.empty for df in frames.values()):
+        st.warning("Please set a valid 'Projection Years' value in the BaseData page to compare scenarios.")
+        return
 
-    fig = px.bar(plot_df, x="Year", y="Amount", color="Income/Gain Source", title="Yearly Income & SWP Gain/Loss Projection")
-    fig.update_layout(barmode="relative", xaxis_title="Year", yaxis_title="Amount (₹)")
+    # --- Summary with differences from the current plan ---
+    summary = pd.DataFrame({name: scenario_summary(df) for name, df in frames.items()}).T
+    # Survival-weighted outcomes of all scenarios in one ledger run (see mortality.py)
+    survival = scenario_outcomes(load_life_table(), list(projections.values()))
+    summary["Chance to Outlive Corpus"] = [f"{p:.0%}" for p in survival["outlive_probability"]]
+    summary["Expected Lifetime Shortfall"] = survival["expected_shortfall"]
+    default_ladder_notice("The survival-weighted outlook")
+    for column in ("Final SWP Corpus", "Total Income", "Total Expenses", "Total Tax"):
+        summary[f"{column} vs Current"] = summary[column] - summary.loc[BASE_SCENARIO, column]
+    summary.insert(0, "Changes", [describe_scenario(scenarios.get(name, {}), DESC_MAP) for name in summary.index])
+    number_columns = [column for column in summary.columns if column not in ("Changes", "SWP Lasts (years)", "Chance to Outlive Corpus")]
+    st.dataframe(summary.style.format("{:,.0f}", subset=number_columns), use_container_width=True)
+    if life_table_note():
+        st.caption(life_table_note())
+
+    # --- Overlaid curves ---
+    long_df = pd.concat([
+        pd.DataFrame({
+            "Scenario": name,
+            "Year": df["Year"],
+            "Total Income": df["GLTotalIncomeOverallFDs"],
+            "Total Expenses": (df["GLTotalYearlyExpensesMust"] + df["GLTotalYearlyExpensesOptional"]) * 12,
+            "SWP Corpus": df["LocalSWPBalancePostWithdrawal"],
+        })
+        for name, df in frames.items()
+    ], ignore_index=True)
+    flows = long_df.melt(id_vars=["Scenario", "Year"], value_vars=["Total Income", "Total Expenses"], var_name="Series", value_name="Amount")
+    fig_flows = px.line(flows, x="Year", y="Amount", color="Scenario", line_dash="Series", markers=True, title="Yearly Income vs. Expenses")
+    fig_flows.update_layout(yaxis_title="Amount (₹)")
+    st.plotly_chart(fig_flows, use_container_width=True)
+    fig_corpus = px.line(long_df, x="Year", y="SWP Corpus", color="Scenario", markers=True, title="SWP Corpus After Withdrawals")
+    fig_corpus.update_layout(yaxis_title="Amount (₹)")
+    st.plotly_chart(fig_corpus, use_container_width=True)
+
+def render_custom_lines_page(sheet_name, is_guest=False):
+    st.header("🧩 Custom Income & Expenses")
+    st.markdown("Add your own income or expense lines. A line is a yearly amount, or a formula over plan fields such as "
+                "`{GLPensionEPS} * 12 * 0.5` or `max({Year} - 5, 0) * 10000`, that can grow with inflation or a fixed rate "
+                "and runs from its start year to its end year (blank = to the end). Lines count everywhere the plan is "
+                "projected: the Investment Plan and its cash-flow ledger, scenarios, the household and the optimizer.")
+    lines = load_lines(user_data)
+
+    with st.form("custom_lines_form"):
+        edited = st.data_editor(
+            pd.DataFrame(lines, columns=list(LINE_COLUMNS)), num_rows="dynamic", hide_index=True,
+            use_container_width=True, disabled=is_guest,
+            column_config={
+                "Name": st.column_config.TextColumn(required=True),
+                "Type": st.column_config.SelectboxColumn(options=list(LINE_TYPES), required=True),
+                "Amount": st.column_config.NumberColumn("Amount (Yearly)", min_value=0, format="%d"),
+                "Start Year": st.column_config.NumberColumn(min_value=1, step=1),
+                "End Year": st.column_config.NumberColumn(min_value=1, step=1),
+                "Growth": st.column_config.SelectboxColumn(options=list(GROWTH_TYPES)),
+                "Growth Rate": st.column_config.NumberColumn("Growth Rate (%)", format="%.2f"),
+                "Formula": st.column_config.TextColumn(),
+            })
+        st.caption("Formulas can use numbers, + - * / ** %, min(), max(), abs() and any {FieldName} (its value in each "
+                   "projection year), plus {Year}. Expenses are added to the must / optional totals, income to the total income.")
+        if st.form_submit_button("Save Custom Lines", disabled=is_guest):
+            rows, problems = [], []
+            for row in edited.to_dict("records"):
+                if not (row.get("Name") or row.get("Amount") or row.get("Formula")):
+                    continue
+                try:
+                    rows.append(clean_line(row))
+                except FormulaError as e:
+                    problems.append(f"**{row.get('Name') or 'Unnamed line'}**: {e}")
+            if problems:
+                st.error("Not saved, please fix these formulas:\n\n" + "\n\n".join(problems))
+            elif len(rows) > MAX_LINES:
+                st.error(f"You can add up to {MAX_LINES} custom lines.")
+            else:
+                # Names label the projection columns, so they must be unique
+                seen = set()
+                for row in rows:
+                    base_name, suffix = row["Name"], 2
+                    while row["Name"] in seen:
+                        row["Name"], suffix = f"{base_name} {suffix}", suffix + 1
+                    seen.add(row["Name"])
+                # Like the other pages, user_data is saved at the end of the run
+                store_lines(user_data, rows)
+                lines = rows
+                st.success("Custom lines saved.")
+
+    if not lines:
+        return
+    df_projections, _ = cached_projection()
+    if df_projections is None or df_projections.empty:
+        st.warning("Please set a valid 'Projection Years' value in the BaseData page.")
+        return
+    custom_columns = [column for column in df_projections.columns if column.startswith("Custom - ")]
+    plot_df = df_projections.melt(id_vars="Year", value_vars=custom_columns, var_name="Line", value_name="Amount")
+    plot_df["Line"] = plot_df["Line"].str.removeprefix("Custom - ")
+    fig = px.bar(plot_df, x="Year", y="Amount", color="Line", title="Custom Lines by Year")
+    fig.update_layout(barmode="stack", yaxis_title="Amount (₹)")
+    st.plotly_chart(fig, use_container_width=True)
+    with st.expander("Custom lines by year"):
+        st.dataframe(df_projections[["Year"] + custom_columns].style.format("{:,.0f}", subset=custom_columns),
+                     hide_index=True, use_container_width=True)
+
+def render_household_page(sheet_name, is_guest=False):
+    st.header("👪 Household Plan")
+    st.markdown("Add your spouse or other family members with their own age, pension, annuity and SCSS/POMIS deposits. "
+                "Everyone is projected together and their income is combined into one household cash flow.")
+    members = load_members(user_data)
+
+    with st.form("household_form"):
+        edited = st.data_editor(
+            pd.DataFrame(members, columns=list(MEMBER_COLUMNS)), num_rows="dynamic", hide_index=True,
+            use_container_width=True, disabled=is_guest,
+            column_config={
+                "Name": st.column_config.TextColumn(required=True),
+                "Age": st.column_config.NumberColumn(min_value=0, max_value=110, step=1, required=True),
+                "Monthly Pension": st.column_config.NumberColumn(min_value=0, format="%d"),
+                "Monthly Annuity": st.column_config.NumberColumn(min_value=0, format="%d"),
+                "SCSS Amount": st.column_config.NumberColumn(min_value=0, max_value=INPUT_DEFAULTS["GLSCSSSingle"], format="%d"),
+                "POMIS Amount": st.column_config.NumberColumn(min_value=0, max_value=INPUT_DEFAULTS["GLPOMISSingle"], format="%d"),
+            })
+        st.caption("Other members' SCSS/POMIS deposits are their own money, each within the single-account limits. "
+                   "SCSS needs an age of 60; deposits roll into FDs after five years, at the Sr Citizen rate for members "
+                   "who are 60 by then. Your own details come from the BaseData page.")
+        if st.form_submit_button("Save Household", disabled=is_guest):
+            rows = [clean_member(row) for row in edited.to_dict("records") if row.get("Name") or row.get("Age")]
+            if len(rows) > MAX_MEMBERS:
+                st.error(f"A household can have up to {MAX_MEMBERS} other members.")
+            else:
+                # Names label the chart and table columns, so they must be unique
+                seen = {"You"}
+                for row in rows:
+                    base_name, suffix = row["Name"], 2
+                    while row["Name"] in seen:
+                        row["Name"], suffix = f"{base_name} {suffix}", suffix + 1
+                    seen.add(row["Name"])
+                # Like the other pages, user_data is saved at the end of the run
+                store_members(user_data, rows)
+                members = rows
+                st.success("Household saved.")
+    too_young = scss_too_young(members)
+    if too_young:
+        st.warning(f"SCSS is only for members aged 60 or more, so the SCSS amount of {', '.join(too_young)} is left out.")
+
+    base_context = user_data.copy()
+    store_and_eval_all_variables(base_context)
+    params = plan_params(base_context)
+    if params["years"] <= 0:
+        st.warning("Please set a valid 'Projection Years' value in the BaseData page.")
+        return
+    primary = primary_member(base_context)
+    df_projections, _ = cached_projection(monthly_resolution=False)
+    flows = table_flows(df_projections)
+    # Keyed by the plan's hash, which covers the stored members too
+    default_ladder_notice("The household projection")
+    income, table = ARTIFACTS.get_or_create(("household", user_data.content_hash()),
+                                            lambda: project_household(params, primary, members, flows=flows), current_session_id())
+
+    shortfall = table.loc[table["Net Cash Flow"] < 0, "Year"]
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Household Income (Year 1)", f"₹{table['Household Income'].iloc[0]:,.0f}")
+    m2.metric("Household Expenses (Year 1)", f"₹{table['Household Expenses'].iloc[0]:,.0f}")
+    m3.metric("First Shortfall Year", f"Year {int(shortfall.iloc[0])}" if not shortfall.empty else "None")
+
+    member_columns = [column for column in table.columns if column.startswith("Income - ")]
+    plot_df = table.melt(id_vars="Year", value_vars=member_columns, var_name="Member", value_name="Income")
+    plot_df["Member"] = plot_df["Member"].str.removeprefix("Income - ")
+    fig = px.bar(plot_df, x="Year", y="Income", color="Member", title="Household Income by Member vs. Expenses")
+    fig.add_trace(go.Scatter(x=table["Year"], y=table["Household Expenses"], mode="lines+markers", name="Household Expenses"))
+    fig.update_layout(barmode="stack", yaxis_title="Amount (₹)")
     st.plotly_chart(fig, use_container_width=True)
 
+    with st.expander("Household cash flow by year"):
+        number_columns = [column for column in table.columns if column != "Year" and not column.startswith("Age - ")]
+        st.dataframe(table.style.format("{:,.0f}", subset=number_columns), hide_index=True, use_container_width=True)
+
+def render_backtest_page(sheet_name, is_guest=False):
+    st.header("📉 Backtest Your SWP")
+    history = load_history()
+    first_year, last_year = int(history["Year"][0]), int(history["Year"][-1])
+    st.markdown(f"Your plan assumes the same return every year. Here the SWP is replayed over every rolling window of "
+                f"historical returns ({first_year}-{last_year}), so you can see how the order of good and bad years affects it.")
+
+    base_context = user_data.copy()
+    store_and_eval_all_variables(base_context)
+    corpus = base_context.get("LocalSWPInvestAmount", {}).get("input", 0)
+    withdrawal = base_context.get("GLSWPMonthlyWithdrawal", {}).get("input", 0)
+    years = int(base_context.get("GLProjectionYears", {}).get("input", 1))
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        equity_percent = st.slider("Equity share of SWP corpus (%)", 0, 100, 60, step=5)
+    with c2:
+        inflation_linked = st.checkbox("Raise withdrawal with inflation", value=False)
+    with c3:
+        wrap = st.checkbox("Wrap around the data", value=years > 10,
+                           help="Windows that run past the last year continue from the first, so every year is a start year.")
+
+    if years <= 0:
+        st.warning("Please set a valid 'Projection Years' value in the BaseData page to run the backtest.")
+        return
+    if corpus <= 0:
+        st.warning("Your plan has no SWP corpus to backtest. Set the SWP investment percentage in the BaseData page.")
+        return
+    result = run_backtest(corpus, withdrawal, years, equity_percent / 100.0, history, wrap, inflation_linked)
+    if result is None:
+        st.warning(f"Not enough history for a {years}-year window. Turn on 'Wrap around the data' or shorten the projection.")
+        return
+
+    worst_depleted = result["depleted_year"][result["start_years"] == result["worst_start_year"]][0]
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Success Rate", f"{result['success_rate']:.0%}", help=f"Windows where the corpus lasted all {years} years")
+    m2.metric("Median Final Corpus", f"{result['median_final']:,.0f}")
+    m3.metric(f"Worst Case (start {result['worst_start_year']})",
+              f"Ran out in year {worst_depleted}" if worst_depleted else f"{result['worst_final']:,.0f}")
+
+    fig = go.Figure()
+    for start, balances in zip(result["start_years"], result["balances"]):
+        fig.add_trace(go.Scatter(x=list(range(1, years + 1)), y=balances, mode="lines", name=str(start),
+                                 line=dict(width=1, color="rgba(120,120,120,0.25)"), showlegend=False))
+    for p in PERCENTILES:
+        fig.add_trace(go.Scatter(x=list(range(1, years + 1)), y=result["percentiles"][p], mode="lines", name=f"P{p}", line=dict(width=3)))
+    fig.update_layout(title="SWP Corpus by Start Year", xaxis_title="Year", yaxis_title="Amount (₹)")
+    st.plotly_chart(fig, use_container_width=True)
+
+    with st.expander("All windows"):
+        st.dataframe(pd.DataFrame({
+            "Start Year": result["start_years"],
+            "Final Corpus": result["balances"][:, -1],
+            "Ran Out In Year": np.where(result["depleted_year"] > 0, result["depleted_year"].astype(str), "-"),
+        }).style.format({"Final Corpus": "{:,.0f}"}), hide_index=True, use_container_width=True)
+
+def render_optimizer_page(sheet_name, is_guest=False):
+    st.header("🧭 Optimize Your Allocation")
+    st.markdown("Instead of guessing the SWP / FD / SCSS / POMIS split, let the simulator try thousands of allocations "
+                "of your corpus and recommend the one that serves your goal best.")
+
+    base_context = user_data.copy()
+    store_and_eval_all_variables(base_context)
+    params = plan_params(base_context)
+    df_projections, _ = cached_projection(monthly_resolution=False)
+    if df_projections is not None and not df_projections.empty:
+        params.update(table_flows(df_projections))
+        if deducts_tax(base_context):
+            # Tax follows each allocation's interest; the current one's would favour high-FD candidates
+            params["recurring_expenses"] = params["recurring_expenses"] - df_projections["GLTotalTax"].to_numpy(dtype=float)
+            st.caption("Candidates are compared before income tax: the tax depends on the allocation, "
+                       "so it is left out of the expenses here.")
+    # GLSCSSSingle / GLPOMISSingle double as the plan's invested amounts, so their caps are the config defaults
+    limits = {
+        "scss_single": INPUT_DEFAULTS["GLSCSSSingle"],
+        "pomis_single": INPUT_DEFAULTS["GLPOMISSingle"],
+        "scss_joint": base_context.get("GLSCSSJoint", {}).get("input", INPUT_DEFAULTS["GLSCSSJoint"]),
+        "pomis_joint": base_context.get("GLPOMISJoint", {}).get("input", INPUT_DEFAULTS["GLPOMISJoint"]),
+    }
+
+    c1, c2 = st.columns(2)
+    with c1:
+        goal = st.radio("Goal", list(OBJECTIVES.values()), horizontal=True,
+                        help="Worst-year surplus: the weakest year's income minus expenses. Final corpus: what is left after the last year.")
+        objective = {label: name for name, label in OBJECTIVES.items()}[goal]
+    with c2:
+        joint = st.checkbox("Allow joint SCSS/POMIS limits", value=False)
+
+    key = ("allocation", user_data.content_hash(), objective, joint)
+    default_ladder_notice("The optimizer")
+    result = ARTIFACTS.get_or_create(key, lambda: optimize_allocation(params, objective, joint, limits), current_session_id())
+    if result is None:
+        st.warning("Your plan has no corpus to allocate. Enter your PF/PPF/Superannuation amounts in the BaseData page.")
+        return
+
+    best, current = result["best"], result["current"]
+    recommended, mine = allocation_inputs(result, best), allocation_inputs(result, current)
+    st.caption(f"{result['candidates']:,} allocations evaluated.")
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Worst-Year Surplus", f"{result['worst_surplus'][best]:,.0f}", f"{result['worst_surplus'][best] - result['worst_surplus'][current]:,.0f}")
+    m2.metric("Final Corpus", f"{result['terminal_corpus'][best]:,.0f}", f"{result['terminal_corpus'][best] - result['terminal_corpus'][current]:,.0f}")
+    m3.metric("Unfunded Expenses", f"{result['unfunded'][best]:,.0f}", f"{result['unfunded'][best] - result['unfunded'][current]:,.0f}", delta_color="inverse")
+    if round(result["unfunded"][best]) > 0:
+        st.warning("No allocation covers all your expenses; the recommendation leaves the least unfunded.")
+
+    st.dataframe(pd.DataFrame({
+        "Setting": [DESC_MAP[name] for name in recommended],
+        "Current": list(mine.values()),
+        "Recommended": list(recommended.values()),
+    }).style.format({"Current": "{:,.0f}", "Recommended": "{:,.0f}"}), hide_index=True, use_container_width=True)
+
+    frontier = result["frontier"]
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=result["worst_surplus"], y=result["terminal_corpus"], mode="markers", name="Candidates",
+                               marker=dict(size=4, color=result["swp_percent"], colorscale="Viridis", opacity=0.35,
+                                           colorbar=dict(title="SWP %"))))
+    fig.add_trace(go.Scatter(x=result["worst_surplus"][frontier], y=result["terminal_corpus"][frontier], mode="lines+markers",
+                             name="Efficient Frontier", line=dict(width=3)))
+    for index, name, symbol in ((current, "Current", "circle-open"), (best, "Recommended", "star")):
+        fig.add_trace(go.Scatter(x=[result["worst_surplus"][index]], y=[result["terminal_corpus"][index]], mode="markers",
+                                 name=name, marker=dict(size=16, symbol=symbol, line=dict(width=2))))
+    fig.update_layout(title="Worst-Year Surplus vs. Final Corpus", xaxis_title="Worst-Year Surplus (₹)", yaxis_title="Final Corpus (₹)")
+    st.plotly_chart(fig, use_container_width=True)
+
+    # The plan keeps SCSS / POMIS in its single-account fields, so a joint-limit amount can't be stored
+    problems = [f"{DESC_MAP[name]} ({recommended[name]:,.0f}) is above the single-account limit ({limits[cap]:,.0f})."
+                for name, cap in (("GLSCSSSingle", "scss_single"), ("GLPOMISSingle", "pomis_single")) if recommended[name] > limits[cap]]
+    problems += validate_inputs(recommended, user_data)
+    if problems:
+        st.warning("This recommendation can't be applied to your plan as is: " + " ".join(problems))
+    if st.button("Apply Recommended Allocation", disabled=is_guest or recommended == mine or bool(problems)):
+        for name, value in recommended.items():
+            user_data[name] = {"input": value}
+        user_data.refresh_formulas(set(recommended), eval_formula_with_debug)
+        save_plan()
+        st.rerun()
+
 def calculate_initial_totals(data_context):
         """
         Calculates all formula-based fields from the config files and adds them
         to the data context. This should be run after loading user data.
         """
-        all_configs = BASE_DATA_CONFIG + ONETIME_EXPENSES_CONFIG + RECURRING_EXPENSES_CONFIG
-        
-        for item in all_configs:
-            key = item.get('Field Name')
-            formula = item.get('Field Default Value', '')
-            
-            if key and isinstance(formula, str) and formula.startswith('='):
-                # If a field is a formula, calculate its value
-                value = eval_formula_with_debug(formula, data_context, key)
-                if key not in data_context:
-                    data_context[key] = {}
-                data_context[key]['input'] = value
-        
-        return data_context
+        return evaluate_input_formulas(data_context, eval_formula_with_debug)
 
 # ############################################################################
 #
@@ -787,10 +1512,100 @@ def calculate_initial_totals(data_context):
 # --- Main Controller / Router ---
 
 # This function contains your main app logic and is called when a user is logged in or in guest mode.
+GUEST_DEMO_FILE = "guest_user_data.json"
+FREE_PROJECTION_YEARS = 2
+
+def load_plan_file(path):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            try: plan = PlanState.from_dict(json.load(f))
+            except json.JSONDecodeError: return PlanState()
+    else:
+        plan = PlanState.from_dict({key: {'input': value} for key, value in INPUT_DEFAULTS.items()})
+    # Rates come from the published rate table unless the plan has its own (see rate_table.py)
+    return link_legacy_rates(plan)
+
+@st.cache_resource(show_spinner=False)
+def guest_demo_plan(rates_version):
+    """
+    The guest demo plan, built once per process (and rate table version). Its projection and
+    charts are pinned in the artifact store, so every guest is served the same precomputed
+    results. Guests get a copy of the plan (see run_simulator), the shared one is never modified.
+    """
+    plan = load_plan_file(GUEST_DEMO_FILE)
+    resolve_rates(plan, load_rate_table())
+    plan = calculate_initial_totals(plan)
+    plan_hash = plan.content_hash()
+    projection = ARTIFACTS.put(("projection", plan_hash, False), calculate_projections(plan, False), pinned=True)
+    df_projections = projection[0]
+    if df_projections is not None and not df_projections.empty:
+        ARTIFACTS.put(("income_expense_chart", plan_hash, False), income_expense_chart(income_expense_data(df_projections)), pinned=True)
+        ARTIFACTS.put(("income_sources_chart", plan_hash, False), income_sources_chart(df_projections), pinned=True)
+    return plan
+
+# Cohort analytics: saved plans are pushed into the running totals by one background
+# thread per process, so a save never waits for the projection (see cohort_analytics.py)
+@st.cache_resource
+def cohort_worker():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="cohort"), CohortStore()
+
+def record_cohort_metrics(username, plan):
+    executor, store = cohort_worker()
+    # Plans are saved on every run; only changed ones are projected and pushed
+    if store.plan_hash(username) != plan.content_hash():
+        executor.submit(store.push_plan, username, plan.copy())
+
+def render_cohort_page(sheet_name, is_guest=False):
+    st.header("📊 Cohort Analytics")
+    st.markdown("All users' plans at a glance. The numbers are updated as plans are saved; medians and "
+                "percentiles are estimated from the histograms.")
+    _, store = cohort_worker()
+    snapshot = store.snapshot()
+    totals = snapshot["totals"]
+    if not totals["plans"]:
+        st.info("No plans counted yet. They are added as users save their plans, or with a rebuild below.")
+    else:
+        withdrawal = metric_summary(totals, "withdrawal_rate")
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Plans", f"{totals['plans']:,}")
+        m2.metric("SWP Corpus Runs Out", f"{totals['flags']['swp_runs_out'] / totals['plans']:.0%}", help=FLAGS["swp_runs_out"])
+        m3.metric("Expenses Exceed Income", f"{totals['flags']['has_shortfall'] / totals['plans']:.0%}", help=FLAGS["has_shortfall"])
+        m4.metric("Median Withdrawal Rate", "-" if withdrawal["median"] is None else f"{withdrawal['median']:.1f}%")
+
+        columns = st.columns(2)
+        for position, (name, (label, edges)) in enumerate(METRICS.items()):
+            summary = metric_summary(totals, name)
+            fig = px.bar(x=bin_labels(edges), y=totals["metrics"][name]["histogram"], title=label, labels={"x": label, "y": "Plans"})
+            with columns[position % 2]:
+                st.plotly_chart(fig, use_container_width=True)
+                if summary["count"]:
+                    st.caption(f"{summary['count']:,} plans · mean {summary['mean']:,.1f} · median ≈ {summary['median']:,.1f} · "
+                               f"90th percentile ≈ {summary['p90']:,.1f}")
+
+    st.caption(f"Last update: {snapshot['updated_at'] or 'never'} · last full rebuild: {snapshot['rebuilt_at'] or 'never'}")
+    if st.button("Rebuild from all saved plans", help="Recomputes everything from the plan files "
+                 "(also available as `python cohort_analytics.py rebuild`)."):
+        with st.spinner("Projecting all saved plans..."):
+            # In this process: a process pool inside the web server would compete with every session
+            counted, skipped = rebuild(store=store, workers=0)
+        st.toast(f"Rebuilt from {counted} plans" + (f" ({skipped} unreadable or malformed files skipped)." if skipped else "."))
+        st.rerun()
+
+def render_memory_report():
+    # Ops view for admins, opened with ?memory=1 in the URL
+    stats = ARTIFACTS.stats()
+    with st.sidebar.expander("🧠 Memory"):
+        st.caption(f"{stats['artifacts']} artifacts ({stats['pinned']} pinned), {stats['bytes'] / 2**20:,.1f} of {stats['max_bytes'] / 2**20:,.0f} MB, "
+                   f"{stats['sessions']} sessions")
+        report = pd.DataFrame(ARTIFACTS.session_report())
+        if not report.empty:
+            report["Session"] = report["Session"].str[:8]
+            st.dataframe(report, hide_index=True, use_container_width=True)
+
 def run_simulator(is_guest=False):
     # (Your existing, working run_simulator function goes here, unchanged)
     # The only change is inside the sidebar for the guest mode button.
-    global user_data, is_premium, STORAGE_FILE
+    global user_data, is_premium, is_admin, STORAGE_FILE, RATES
     
     #print(f"DEBUG: Running Simulator")
     if not is_guest:
@@ -803,11 +1618,13 @@ def run_simulator(is_guest=False):
         #   st.rerun()
         username = st.session_state["username"]
         is_premium = user_config['credentials']['usernames'][username]['premium']
+        is_admin = user_config['credentials']['usernames'][username].get('admin', False)
         STORAGE_FILE = f"{username}_user_data.json"
     else:
         username = "guest"
         is_premium = False
-        STORAGE_FILE = "guest_user_data.json"
+        is_admin = False
+        STORAGE_FILE = GUEST_DEMO_FILE
         #st.sidebar.title("Guest Mode")
         #st.sidebar.info("This is a live demo with sample data.")
         #if st.sidebar.button("Sign Up for Free to Create Your Own Plan"):
@@ -815,25 +1632,27 @@ def run_simulator(is_guest=False):
         #    st.rerun()
 
     def load_user_data():
-        if os.path.exists(STORAGE_FILE):
-            with open(STORAGE_FILE, "r") as f:
-                try: return json.load(f)
-                except json.JSONDecodeError: return {}
-        default_data = {}
-        all_configs = BASE_DATA_CONFIG + ONETIME_EXPENSES_CONFIG + RECURRING_EXPENSES_CONFIG
-        for item in all_configs:
-            key = item.get('Field Name')
-            if key and not (isinstance(item.get('Field Default Value', ''), str) and item.get('Field Default Value', '').startswith('=')):
-                default_data[key] = {'input': item.get('Field Default Value')}
-        return default_data
+        return load_plan_file(STORAGE_FILE)
 
     def save_user_data(data):
         if not is_guest:
-            with open(STORAGE_FILE, "w") as f:
-                json.dump(data, f, indent=2)
+            save_plan()
+
+    RATES = load_rate_table()
 
-    user_data = load_user_data()
-    user_data = calculate_initial_totals(user_data)
+    # The plan is loaded once per session and kept in the central plan store, which the
+    # input-page fragments share (see plan_store.py)
+    if is_guest:
+        # Every guest sees the same demo: copy the shared plan instead of rebuilding it
+        user_data = open_plan(STORAGE_FILE, lambda: guest_demo_plan(RATES.version).copy(), read_only=True)
+    else:
+        user_data = open_plan(STORAGE_FILE, lambda: calculate_initial_totals(load_user_data()),
+                              on_save=lambda plan: record_cohort_metrics(username, plan))
+    # Linked rates follow the rate table; a plan only changes (and is projected again) when its rates moved
+    changed_rates = resolve_rates(user_data, RATES)
+    if changed_rates:
+        user_data.refresh_formulas(changed_rates, eval_formula_with_debug)
+    ARTIFACTS.touch(current_session_id())
 
     # --- Main App Layout ---
     if not is_guest:
@@ -852,11 +1671,17 @@ def run_simulator(is_guest=False):
             st.session_state.page = "Upgrade"
             st.rerun()
 
+    # Lists every session on the server, so only for admins
+    if is_admin and st.query_params.get("memory") == "1":
+        render_memory_report()
+
     # --- Navigation ---
     pages = ["AboutApp", "Capture Basic Data", "Capture Major One Time Expenses", "Capture Recurring Expenses", 
-             "Investment Plan", "Your Financial Summary", "KnowledgebaseFAQ"]
+             "Custom Income & Expenses", "Investment Plan", "Household", "Compare Scenarios", "Backtest SWP", "Optimize Allocation", "Your Financial Summary", "KnowledgebaseFAQ"]
     if is_premium:
-        pages.insert(6, "AI Advisor")
+        pages.insert(11, "AI Advisor")
+    if is_admin:
+        pages.append("Cohort Analytics")
 
     if 'page' not in st.session_state or st.session_state.page not in pages + ["Upgrade"]:
         st.session_state.page = "AboutApp"
@@ -884,9 +1709,15 @@ def run_simulator(is_guest=False):
             "Capture Basic Data": {"config": BASE_DATA_CONFIG, "render_func": render_input_form},
             "Capture Major One Time Expenses": {"config": ONETIME_EXPENSES_CONFIG, "render_func": render_input_form},
             "Capture Recurring Expenses": {"config": RECURRING_EXPENSES_CONFIG, "render_func": render_expenses_recurring},
+            "Custom Income & Expenses": {"config": None, "render_func": render_custom_lines_page},
             "Investment Plan": {"config": INVESTMENT_PLAN_CONFIG, "render_func": render_output_table},
+            "Household": {"config": None, "render_func": render_household_page},
+            "Compare Scenarios": {"config": None, "render_func": render_scenarios_page},
+            "Backtest SWP": {"config": None, "render_func": render_backtest_page},
+            "Optimize Allocation": {"config": None, "render_func": render_optimizer_page},
             "Your Financial Summary": {"config": None, "render_func": render_summary_page},
             "AI Advisor": {"config": None, "render_func": render_ai_advisor_page},
+            "Cohort Analytics": {"config": None, "render_func": render_cohort_page},
             "KnowledgebaseFAQ": {"config": None, "render_func": render_text_sheet}
         }
         
@@ -896,9 +1727,47 @@ def run_simulator(is_guest=False):
         else:
             selected_page["render_func"](st.session_state.page, is_guest=is_guest)
     
+    # Offline support; the summary is only taken from a projection this session already computed
+    last_projection = ARTIFACTS.get(("projection", user_data.content_hash(), bool(st.session_state.get("monthly_resolution", False))))
+    has_projection = last_projection is not None and last_projection[0] is not None and not last_projection[0].empty
+    with st.sidebar:
+        inject_pwa_script(projection_summary(last_projection[0]) if has_projection and not is_guest else None)
+
     if not is_guest:
         save_user_data(user_data)
 
+def needs_onboarding(username):
+    # New accounts without a saved plan go through the wizard first
+    if st.session_state.get("onboarding_complete"):
+        return False
+    user = user_config['credentials']['usernames'].get(username, {})
+    return not user.get("onboarding_complete", True) and not os.path.exists(f"{username}_user_data.json")
+
+def render_onboarding_preview(plan):
+    """
+    First look at a freshly seeded plan. Uses the vectorized engine with yearly inflation
+    steps (same figures as the yearly table, minus the deposit ladder and taxes), which
+    answers well within a second; the full projection runs once the user opens the plan.
+    """
+    context = plan.copy()
+    store_and_eval_all_variables(context)
+    df_preview = monthly_projection_table(context, inflation_step_months=12)
+    chart_data = income_expense_data(df_preview)
+
+    st.success("Your plan is ready! Here's a first projection.")
+    years = len(df_preview)
+    shortfall = chart_data.loc[chart_data['Total Income'] < chart_data['Total Expenses'], 'Year']
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Starting Corpus", f"₹{context['LocalStartingCorpus']['input']:,.0f}")
+    c2.metric("Monthly SWP Withdrawal", f"₹{context['GLSWPMonthlyWithdrawal']['input']:,.0f}")
+    c3.metric(f"SWP Corpus after {years} years", f"₹{df_preview['LocalSWPBalancePostWithdrawal'].iloc[-1]:,.0f}")
+    if shortfall.empty:
+        # Year 1 is the current age, so the last projected year is at age + years - 1
+        st.info(f"Income covers your expenses in every year up to age {int(context['GLAge']['input']) + years - 1}.")
+    else:
+        st.warning(f"Expenses overtake income from year {int(shortfall.iloc[0])}. Review your plan to close the gap.")
+    st.plotly_chart(income_expense_chart(chart_data), use_container_width=True)
+
 def run_onboarding_wizard():
     st.title("Welcome! Let's set up your financial plan.")
     st.markdown("We just need a few key details to get started. You can add more later.")
@@ -909,18 +1778,25 @@ def run_onboarding_wizard():
         monthly_expenses = st.number_input("What are your approximate total monthly expenses?", min_value=0, value=50000)
         
         submitted = st.form_submit_button("Create My First Plan!")
-        if submitted:
-            username = st.session_state["username"]
-            STORAGE_FILE = f"{username}_user_data.json"
-            user_data = {}
-            user_data['GLAge'] = {'input': age}
-            # ... (save other wizard inputs to user_data) ...
-            with open(STORAGE_FILE, "w") as f:
-                json.dump(user_data, f, indent=2)
-
-            db.collection('users').document(username).update({"onboarding_complete": True})
-            st.session_state.onboarding_complete = True
-            st.session_state.page = "Summary"
+
+    if submitted:
+        username = st.session_state["username"]
+        STORAGE_FILE = f"{username}_user_data.json"
+        premium = user_config['credentials']['usernames'][username].get('premium', False)
+        max_years = None if premium else FREE_PROJECTION_YEARS
+        seeded = {name: {'input': value} for name, value in seed_plan_inputs(age, initial_corpus, monthly_expenses, max_years).items()}
+        plan = link_rates(PlanState.from_dict(seeded))
+        resolve_rates(plan, load_rate_table())
+        plan = calculate_initial_totals(plan)
+        with open(STORAGE_FILE, "w") as f:
+            json.dump(stored_plan(plan), f, indent=2)
+        close_plan()
+
+        db.collection('users').document(username).update({"onboarding_complete": True})
+        st.session_state.onboarding_complete = True
+        st.session_state.page = "Your Financial Summary"
+        render_onboarding_preview(plan)
+        if st.button("Open My Plan"):
             st.rerun()
 
 def render_ai_advisor_page_old(sheet_name, is_guest=False):
@@ -1065,7 +1941,10 @@ if 'view' not in st.session_state:
 # --- FIX: The logout button is now part of the main controller ---
 if st.session_state.get("authentication_status"):
         # If logged in, display the logout button in the sidebar.
-    run_simulator(is_guest=False)
+    if needs_onboarding(st.session_state["username"]):
+        run_onboarding_wizard()
+    else:
+        run_simulator(is_guest=False)
     # The logout() widget returns True when the button is clicked.
     authenticator.logout("Logout", "sidebar")
         # When logout is clicked, reset the view and rerun immediately
@@ -0,0 +1,107 @@
+# backtest.py
+#
+# Historical backtest of the SWP part of a plan.
+#
+# The plan's fixed GLSWPGrowthRate hides sequence-of-returns risk: the same average return
+# is far worse when the bad years come first. The backtest replays the SWP over every
+# rolling start year of a local series of annual equity/debt returns and inflation
+# (historical_returns.csv, bundled sample figures, percent per calendar year) and
+# reports how the corpus fared in each window.
+#
+# All windows run together: the window returns form a (windows, months) array that goes
+# through projection_engine.swp_balances() in one call.
+
+import os
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from projection_engine import MONTHS_PER_YEAR, swp_balances
+
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historical_returns.csv")
+HISTORY_COLUMNS = ("Year", "Equity", "Debt", "Inflation")
+PERCENTILES = (10, 50, 90)
+
+
+@lru_cache(maxsize=4)
+def load_history(path=HISTORY_FILE):
+    """
+    Reads the yearly series once per process; every session shares the same read-only
+    arrays. Returns {"Year": int array, "Equity"/"Debt"/"Inflation": fractions}.
+    """
+    table = np.genfromtxt(path, delimiter=",", names=True)
+    missing = [name for name in HISTORY_COLUMNS if name not in table.dtype.names]
+    if missing:
+        raise ValueError(f"{os.path.basename(path)} is missing column(s): {', '.join(missing)}")
+    table = table[np.argsort(table["Year"])]
+    history = {"Year": table["Year"].astype(int)}
+    for name in HISTORY_COLUMNS[1:]:
+        history[name] = table[name] / 100.0
+    for values in history.values():
+        values.setflags(write=False)
+    return history
+
+
+def rolling_windows(series, years, wrap=False):
+    """
+    (windows, years) view of every run of `years` consecutive values. With `wrap` the series
+    is treated as circular, so every year of the data is a start year.
+    """
+    series = np.asarray(series)
+    if wrap:
+        series = np.resize(series, len(series) + years - 1)
+    if years > len(series):
+        return np.empty((0, years))
+    return sliding_window_view(series, years)
+
+
+def run_backtest(corpus, monthly_withdrawal, years, equity_share, history=None, wrap=False, inflation_linked=False):
+    """
+    Replays an SWP over every rolling window of the history.
+
+    The corpus holds `equity_share` in equity and the rest in debt, rebalanced every year.
+    Each year's return is spread evenly over its months; withdrawals are monthly and, if
+    `inflation_linked`, step up each year with that window's actual inflation.
+
+    Returns per-window arrays: "start_years" (W,), "balances" (W, years) year-end corpus,
+    "depleted_year" (W,) first year the corpus ran out (0 = lasted), plus the summary
+    figures "success_rate", "worst_final", "median_final" and "worst_start_year". None when
+    there is nothing to replay (no years, or no window that long).
+    """
+    history = load_history() if history is None else history
+    years = int(years)
+    if years <= 0:
+        return None
+    starts = rolling_windows(history["Year"], years, wrap)[:, 0]
+    blended = equity_share * history["Equity"] + (1.0 - equity_share) * history["Debt"]
+    yearly_returns = rolling_windows(blended, years, wrap)
+    if len(starts) == 0:
+        return None
+
+    monthly_rates = np.repeat((1.0 + yearly_returns) ** (1.0 / MONTHS_PER_YEAR) - 1.0, MONTHS_PER_YEAR, axis=1)
+    withdrawals = np.full(yearly_returns.shape, float(monthly_withdrawal))
+    if inflation_linked:
+        inflation = rolling_windows(history["Inflation"], years, wrap)
+        # Year 1 is paid at today's amount, later years carry the inflation of the years before
+        withdrawals = withdrawals * np.cumprod(np.concatenate([np.ones((len(starts), 1)), 1.0 + inflation[:, :-1]], axis=1), axis=1)
+    withdrawals = np.repeat(withdrawals, MONTHS_PER_YEAR, axis=1)
+
+    _, _, _, closing = swp_balances(np.full(len(starts), float(corpus)), monthly_rates, withdrawals)
+    balances = closing[:, MONTHS_PER_YEAR - 1::MONTHS_PER_YEAR]
+    exhausted = balances <= 0
+    depleted_year = np.where(exhausted.any(axis=1), exhausted.argmax(axis=1) + 1, 0)
+
+    finals = balances[:, -1]
+    # Worst window: the earliest depletion, or the lowest final corpus if none ran out
+    worst = int(np.argmin(np.where(depleted_year > 0, depleted_year - years - 1.0, finals)))
+    return {
+        "start_years": starts,
+        "balances": balances,
+        "depleted_year": depleted_year,
+        "success_rate": float(np.mean(depleted_year == 0)),
+        "worst_final": float(finals[worst]),
+        "worst_start_year": int(starts[worst]),
+        "median_final": float(np.median(finals)),
+        "percentiles": {p: np.percentile(balances, p, axis=0) for p in PERCENTILES},
+    }
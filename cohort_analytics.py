@@ -0,0 +1,307 @@
+# cohort_analytics.py
+#
+# Aggregates over all users' plans for the admin "Cohort Analytics" page: how many plans
+# run out of SWP corpus, how withdrawal rates, ages and corpus sizes are distributed...
+#
+# Every plan save pushes that plan's summary metrics (plan_metrics) into running totals in
+# COHORT_FILE: the number of plans, a count per yes/no flag and, per metric, a count, sum,
+# sum of squares and a histogram over fixed bins. Totals only ever add up, so they are
+# updated in place: the store keeps each user's last metrics (and plan content hash), and
+# a re-saved plan takes its old contribution out before adding the new one. The dashboard
+# reads the totals only; it never opens a plan file or projects anything.
+#
+# Medians and percentiles come from the histograms, so they are approximate (within a bin).
+#
+#   python cohort_analytics.py rebuild [--dir .] [--workers N]   full recompute
+#   python cohort_analytics.py show                              print the totals
+#
+# A rebuild streams every {user}_user_data.json through a process pool and replaces the
+# store in one write. Saves that land while a rebuild runs are overwritten by it; they come
+# back with the next save of those plans. One writer process is assumed (writes are
+# atomic, but two processes pushing at the same moment can lose one of the updates).
+
+import argparse
+import datetime
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from plan_projection import prepare_plan, project_plan
+from projection_engine import MONTHS_PER_YEAR
+
+# Aggregates over real users' plans: kept out of the source tree (data/ is git-ignored)
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+COHORT_FILE = os.environ.get("COHORT_FILE", os.path.join(DATA_DIR, "cohort_stats.json"))
+PLAN_SUFFIX = "_user_data.json"
+# Plan files that are not a user's own plan
+EXCLUDED_USERS = ("guest",)
+
+# metric: (label, histogram bin edges); values below the first or above the last edge
+# get a bin of their own
+METRICS = {
+    "withdrawal_rate": ("SWP Withdrawal Rate (% of SWP corpus a year)", np.arange(1.0, 16.0)),
+    "swp_years": ("Years the SWP Corpus Lasts", np.arange(5.0, 51.0, 5.0)),
+    "age": ("Age", np.arange(30.0, 91.0, 5.0)),
+    "starting_corpus": ("Starting Corpus (₹)", np.array([1e6, 2.5e6, 5e6, 7.5e6, 1e7, 2e7, 5e7, 1e8])),
+    "projection_years": ("Projection Years", np.arange(5.0, 51.0, 5.0)),
+}
+FLAGS = {
+    "swp_runs_out": "SWP corpus runs out",
+    "has_shortfall": "Expenses exceed income in some year",
+}
+
+
+def plan_metrics(plan):
+    """Summary metrics of an evaluated plan (None when it has no projection)."""
+    df, context = project_plan(plan)
+    if df is None or df.empty:
+        return None
+    def value(name):
+        return float(context.get(name, {}).get("input", 0) or 0)
+
+    balance = df["LocalSWPBalancePostWithdrawal"].to_numpy(dtype=float)
+    exhausted = np.flatnonzero(balance <= 0)
+    income = df["GLTotalIncomeOverallFDs"].to_numpy(dtype=float)
+    # Income is yearly, the expense totals monthly
+    expenses = (df["GLTotalYearlyExpensesMust"] + df["GLTotalYearlyExpensesOptional"]).to_numpy(dtype=float) * MONTHS_PER_YEAR
+    swp_corpus = value("LocalSWPInvestAmount")
+    return {
+        # No SWP, no withdrawal rate: the plan is left out of that metric
+        "withdrawal_rate": value("GLSWPMonthlyWithdrawal") * 12 / swp_corpus * 100 if swp_corpus > 0 else None,
+        # Plans whose corpus lasts count with their full horizon
+        "swp_years": float(exhausted[0] + 1 if exhausted.size else len(df)),
+        "age": value("GLAge"),
+        "starting_corpus": value("LocalStartingCorpus"),
+        "projection_years": float(len(df)),
+        "swp_runs_out": bool(exhausted.size),
+        "has_shortfall": bool(np.any(income < expenses)),
+    }
+
+
+# --- Totals ---
+def aggregate(rows):
+    """Totals over plan_metrics() results."""
+    rows = [row for row in rows if row is not None]
+    totals = {"plans": len(rows), "flags": {flag: sum(bool(row[flag]) for row in rows) for flag in FLAGS}, "metrics": {}}
+    for name, (_, edges) in METRICS.items():
+        values = np.array([row[name] for row in rows if row.get(name) is not None], dtype=float)
+        totals["metrics"][name] = {
+            "count": int(values.size),
+            "sum": float(values.sum()),
+            "sum_squares": float(np.square(values).sum()),
+            "histogram": np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1).tolist(),
+        }
+    return totals
+
+
+def combine(totals, other, sign=1):
+    """totals + sign * other: adds (1) or takes out (-1) the plans counted in `other`."""
+    return {
+        "plans": totals["plans"] + sign * other["plans"],
+        "flags": {flag: totals["flags"][flag] + sign * other["flags"][flag] for flag in FLAGS},
+        "metrics": {
+            name: {key: (np.add(stats[key], np.multiply(sign, other["metrics"][name][key])).tolist() if key == "histogram"
+                         else stats[key] + sign * other["metrics"][name][key])
+                   for key in stats}
+            for name, stats in totals["metrics"].items()
+        },
+    }
+
+
+def histogram_quantile(edges, histogram, q):
+    """Approximate q-quantile from a histogram, interpolated within its bin."""
+    counts = np.asarray(histogram, dtype=float)
+    if counts.sum() <= 0:
+        return None
+    # The open first and last bins are taken to be as wide as their neighbours
+    bounds = np.concatenate([[2 * edges[0] - edges[1]], edges, [2 * edges[-1] - edges[-2]]])
+    cumulative = np.cumsum(counts)
+    target = q * cumulative[-1]
+    index = min(int(np.searchsorted(cumulative, target)), len(counts) - 1)
+    fraction = (target - (cumulative[index] - counts[index])) / counts[index] if counts[index] else 0.0
+    return float(bounds[index] + fraction * (bounds[index + 1] - bounds[index]))
+
+
+def metric_summary(totals, name):
+    """Count, mean, standard deviation, median and 90th percentile of a metric."""
+    stats, edges = totals["metrics"][name], METRICS[name][1]
+    if not stats["count"]:
+        return {"count": 0, "mean": None, "std": None, "median": None, "p90": None}
+    mean = stats["sum"] / stats["count"]
+    return {
+        "count": stats["count"],
+        "mean": mean,
+        "std": float(np.sqrt(max(stats["sum_squares"] / stats["count"] - mean ** 2, 0.0))),
+        "median": histogram_quantile(edges, stats["histogram"], 0.5),
+        "p90": histogram_quantile(edges, stats["histogram"], 0.9),
+    }
+
+
+def bin_labels(edges):
+    labels = [f"< {edges[0]:,.0f}"]
+    labels += [f"{low:,.0f}–{high:,.0f}" for low, high in zip(edges[:-1], edges[1:])]
+    return labels + [f"≥ {edges[-1]:,.0f}"]
+
+
+# --- Store ---
+def empty_store():
+    return {"totals": aggregate([]), "users": {}, "updated_at": None, "rebuilt_at": None}
+
+
+def now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+class CohortStore:
+    """The totals in `path`, updated one plan at a time (thread-safe within a process)."""
+
+    def __init__(self, path=COHORT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = None
+        self._mtime = None
+
+    def _read(self):
+        # Re-read only when the file changed (e.g. after a rebuild in another process)
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if self._data is None or mtime != self._mtime:
+            self._data = empty_store()
+            if mtime is not None:
+                with open(self.path) as f:
+                    self._data.update(json.load(f))
+            self._mtime = mtime
+        return self._data
+
+    def _write(self, data):
+        data["updated_at"] = now()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(data, f)
+        os.replace(temporary, self.path)
+        self._data, self._mtime = data, os.path.getmtime(self.path)
+
+    def snapshot(self):
+        """Totals and update times, without the per-user entries."""
+        with self._lock:
+            data = self._read()
+            return {key: value for key, value in data.items() if key != "users"}
+
+    def plan_hash(self, user):
+        with self._lock:
+            return self._read()["users"].get(user, {}).get("hash")
+
+    def push(self, user, plan_hash, metrics):
+        """Replaces the user's contribution with `metrics`; False when the plan was already counted."""
+        with self._lock:
+            data = self._read()
+            old = data["users"].get(user)
+            if old is not None and old["hash"] == plan_hash:
+                return False
+            totals = data["totals"]
+            if old is not None and old["metrics"] is not None:
+                totals = combine(totals, aggregate([old["metrics"]]), -1)
+            if metrics is not None:
+                totals = combine(totals, aggregate([metrics]))
+            self._write({**data, "totals": totals, "users": {**data["users"], user: {"hash": plan_hash, "metrics": metrics}}})
+            return True
+
+    def push_plan(self, user, plan):
+        """push() for an evaluated plan; it is only projected when its content changed."""
+        plan_hash = plan.content_hash()
+        if self.plan_hash(user) == plan_hash:
+            return False
+        return self.push(user, plan_hash, plan_metrics(plan))
+
+    def replace(self, users):
+        """Writes totals recomputed from `users` ({user: {"hash", "metrics"}})."""
+        with self._lock:
+            totals = aggregate(entry["metrics"] for entry in users.values())
+            self._write({**empty_store(), "totals": totals, "users": users, "rebuilt_at": now()})
+
+
+# --- Rebuild ---
+def plan_files(directory="."):
+    """{user: path} of the plan files in `directory`."""
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        user = name[:-len(PLAN_SUFFIX)]
+        if name.endswith(PLAN_SUFFIX) and user and user not in EXCLUDED_USERS:
+            files[user] = os.path.join(directory, name)
+    return files
+
+
+def file_metrics(path):
+    """(content hash, plan_metrics()) of a plan file, or None when it can't be read or projected."""
+    try:
+        with open(path) as f:
+            plan = prepare_plan(json.load(f))
+        return plan.content_hash(), plan_metrics(plan)
+    except (OSError, json.JSONDecodeError, TypeError, ValueError, AttributeError):
+        # Unreadable or malformed (e.g. a list instead of a plan, a text where a number goes)
+        return None
+
+
+def rebuild(directory=".", store=None, workers=None):
+    """
+    Recomputes the totals from every plan file in `directory`, projecting the plans in
+    `workers` processes (0 = in this process). Returns (plans counted, files skipped).
+    """
+    store = CohortStore() if store is None else store
+    files = plan_files(directory)
+    users, skipped = {}, 0
+    if workers == 0:
+        results = map(file_metrics, files.values())
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(file_metrics, files.values(), chunksize=8)
+    try:
+        for user, result in zip(files, results):
+            if result is None:
+                skipped += 1
+                continue
+            plan_hash, metrics = result
+            users[user] = {"hash": plan_hash, "metrics": metrics}
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    store.replace(users)
+    return sum(entry["metrics"] is not None for entry in users.values()), skipped
+
+
+def format_summary(snapshot):
+    totals = snapshot["totals"]
+    lines = [f"Plans: {totals['plans']} (updated {snapshot['updated_at']}, rebuilt {snapshot['rebuilt_at']})"]
+    for flag, label in FLAGS.items():
+        share = totals["flags"][flag] / totals["plans"] if totals["plans"] else 0.0
+        lines.append(f"{label}: {totals['flags'][flag]} ({share:.0%})")
+    for name, (label, _) in METRICS.items():
+        summary = metric_summary(totals, name)
+        if summary["count"]:
+            lines.append(f"{label}: n={summary['count']} mean={summary['mean']:,.2f} median~{summary['median']:,.2f} p90~{summary['p90']:,.2f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cohort analytics over all saved plans.")
+    parser.add_argument("--store", default=COHORT_FILE, help="aggregates file (default: COHORT_FILE)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = commands.add_parser("rebuild", help="recompute the aggregates from every plan file")
+    rebuild_parser.add_argument("--dir", default=".", help="directory with the *_user_data.json files")
+    rebuild_parser.add_argument("--workers", type=int, default=None, help="worker processes (0 = none, default: CPU count)")
+    commands.add_parser("show", help="print the current aggregates")
+    args = parser.parse_args()
+
+    store = CohortStore(args.store)
+    if args.command == "rebuild":
+        counted, skipped = rebuild(args.dir, store, args.workers)
+        print(f"Rebuilt from {counted} plans ({skipped} unreadable files skipped)")
+    print(format_summary(store.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
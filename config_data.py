@@ -21,6 +21,8 @@ BASE_DATA_CONFIG = [
     {'Field Description': 'SWP monthly withdrawal', 'Field Name': 'GLSWPMonthlyWithdrawal', 'Field Default Value': 15000, 'Field Input': ''},
     {'Field Description': 'SWP LCTG Exemption', 'Field Name': 'GLSWPLCTGExemption', 'Field Default Value': 100000, 'Field Input': ''},
     {'Field Description': 'SWP LCTG tax slab', 'Field Name': 'GLSWPLCTGTaxSlab', 'Field Default Value': 20.0, 'Field Input': ''},
+    {'Field Description': 'Income Tax Regime', 'Field Name': 'GLTaxRegime', 'Field Default Value': 'New', 'Field Input': ''},
+    {'Field Description': 'Deduct Computed Tax from Cash Flow', 'Field Name': 'GLDeductComputedTax', 'Field Default Value': 'Yes', 'Field Input': ''},
     {'Field Description': 'SSCS rate', 'Field Name': 'GLSCSSRate', 'Field Default Value': 8.2, 'Field Input': ''},
     {'Field Description': 'POMIS rate', 'Field Name': 'GLPOMISRate', 'Field Default Value': 7.5, 'Field Input': ''},
     {'Field Description': 'POMIS Allowed Amount Single', 'Field Name': 'GLPOMISSingle', 'Field Default Value': 900000, 'Field Input': ''},
@@ -56,6 +58,7 @@ ONETIME_EXPENSES_CONFIG = [
     {'Field Description': 'Total Initial One Time Planned Expenses - Must', 'Field Name': 'LocalTotalOneTimeMust', 'Field Default Value': '={LocalKidsEducation}+{LocalHouseRenovation}+{LocalVehicleRenewal}+{LocalJewelry}+{LocalTravelForeign}+{LocalOthers}', 'Field Input': '={LocalKidsEducation}+{LocalHouseRenovation}+{LocalVehicleRenewal}+{LocalJewelry}+{LocalTravelForeign}+{LocalOthers}', 'Type': 'Must'},
     {'Field Description': 'Marriages of children', 'Field Name': 'LocalMarriages', 'Field Default Value': 5000000, 'Field Input': '', 'Type': 'Delayed'},
     {'Field Description': 'Property Purchases - Land Flat Agriculture', 'Field Name': 'LocalProperty', 'Field Default Value': 3000000, 'Field Input': '', 'Type': 'Delayed'},
+    {'Field Description': 'Year in which delayed one-time expenses fall due', 'Field Name': 'GLDelayedExpensesYear', 'Field Default Value': 5, 'Field Input': '', 'Type': 'Schedule'},
     {'Field Description': 'Total Initial One Time Planned Expenses - Delayed', 'Field Name': 'LocalTotalOneTimeDelayed', 'Field Default Value': '={LocalMarriages}+{LocalProperty}', 'Field Input': '={LocalMarriages}+{LocalProperty}', 'Type': 'Delayed'},
     {'Field Description': 'Total Initial One Time Planned Expenses', 'Field Name': 'GrandTotalOneTime', 'Field Default Value': '={LocalTotalOneTimeMust}+{LocalTotalOneTimeDelayed}', 'Field Input': '={LocalTotalOneTimeMust}+{LocalTotalOneTimeDelayed}', 'Type': 'Planned'}
 ]
@@ -118,7 +121,12 @@ INVESTMENT_PLAN_CONFIG = [
     {'Field Description': 'Others Income Source - Variable At Risk - Share Trading', 'Field Name': 'LocalTradingIncome', 'Field Value': '={GLTradingIncome}'},
     {'Field Description': 'Land Flat - Buy & Sell', 'Field Name': 'LocalRealStateIncome', 'Field Value': '={GLRealStateIncome}'},
     {'Field Description': 'Consulting Jobs income', 'Field Name': 'LocalConsultingIncome', 'Field Value': '={GLConsultingIncome}*12'},
-    {'Field Description': 'Total Yearly Income from All Sources', 'Field Name': 'GLTotalIncomeOverallFDs', 'Field Value': '={LocalNormalFDYearlyIncome}+{LocalSrFDYearlyIncomeFirst5}+{LocalPOMISYearlyIncome}+{LocalSCSSYearlyIncome}+{LocalSrFDYearlyIncomePast5}+{LocalRentalIncome}+{LocalDividentIncome}+{LocalAgricultureIncome}+{LocalAnnuityExisting}+{LocalAnnuityNew}+{LocalPensionEPS}+{LocalTradingIncome}+{LocalRealStateIncome}+{LocalConsultingIncome}+{LocalSWPYearlyWithdrawal}+{GLSWPCorpusStatus}'}
+    {'Field Description': 'Total Yearly Income from All Sources', 'Field Name': 'GLTotalIncomeOverallFDs', 'Field Value': '={LocalNormalFDYearlyIncome}+{LocalSrFDYearlyIncomeFirst5}+{LocalPOMISYearlyIncome}+{LocalSCSSYearlyIncome}+{LocalSrFDYearlyIncomePast5}+{LocalRentalIncome}+{LocalDividentIncome}+{LocalAgricultureIncome}+{LocalAnnuityExisting}+{LocalAnnuityNew}+{LocalPensionEPS}+{LocalTradingIncome}+{LocalRealStateIncome}+{LocalConsultingIncome}+{LocalSWPYearlyWithdrawal}+{GLSWPCorpusStatus}'},
+    {'Field Description': 'Deposits Matured & Paid Out (ladder)', 'Field Name': 'LocalDepositsPaidOut', 'Field Value': ''},
+    {'Field Description': 'Interest Accrued in Cumulative Deposits (ladder)', 'Field Name': 'LocalDepositsAccrued', 'Field Value': ''},
+    {'Field Description': 'LTCG Tax on SWP Redemptions (computed)', 'Field Name': 'LocalSWPLTCGTax', 'Field Value': ''},
+    {'Field Description': 'Income Tax on Interest & Rental - slab (computed)', 'Field Name': 'LocalSlabIncomeTax', 'Field Value': ''},
+    {'Field Description': 'Total Yearly Tax (computed)', 'Field Name': 'GLTotalTax', 'Field Value': ''}
 ]
 
 KNOWLEDGEBASE_FAQ_DATA = [
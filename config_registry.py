@@ -0,0 +1,141 @@
+# config_registry.py
+#
+# Derived lookup structures over the config tables in config_data.py.
+# Everything here is built once when the module is first imported, so every
+# page, rerun and session in the process shares the same read-only maps
+# instead of rebuilding field_map / desc_map / DataFrames on each interaction.
+
+import re
+import unicodedata
+from functools import lru_cache
+from types import MappingProxyType
+
+import pandas as pd
+
+from config_data import (
+    BASE_DATA_CONFIG,
+    ONETIME_EXPENSES_CONFIG,
+    RECURRING_EXPENSES_CONFIG,
+    INVESTMENT_PLAN_CONFIG,
+)
+
+VARIABLE_PATTERN = re.compile(r"\{([^}]+)\}")
+
+
+@lru_cache(maxsize=None)
+def clean_formula(formula):
+    if not isinstance(formula, str) or not formula.startswith("="):
+        return formula
+    formula = formula[1:].strip()
+    formula = unicodedata.normalize("NFKC", formula).strip()
+    formula = formula.replace("−", "-").replace("\u2212", "-")
+    return formula
+
+
+def _is_formula(value):
+    return isinstance(value, str) and value.startswith("=")
+
+
+def _raw_formula(item):
+    # Input configs keep formulas in 'Field Default Value', the plan config in 'Field Value'
+    for key in ("Field Default Value", "Field Value"):
+        if _is_formula(item.get(key)):
+            return item[key]
+    return None
+
+
+def _topological_order(names, deps):
+    order, done, visiting = [], set(), set()
+
+    def visit(name):
+        if name in done or name not in deps:
+            return
+        if name in visiting:
+            raise ValueError(f"Circular formula reference involving '{name}'")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return tuple(order)
+
+
+INPUT_CONFIGS = tuple(BASE_DATA_CONFIG + ONETIME_EXPENSES_CONFIG + RECURRING_EXPENSES_CONFIG)
+ALL_CONFIGS = INPUT_CONFIGS + tuple(INVESTMENT_PLAN_CONFIG)
+
+# --- Name -> index / item / description ---
+FIELD_NAMES = tuple(item["Field Name"] for item in ALL_CONFIGS)
+FIELD_INDEX = MappingProxyType({name: i for i, name in enumerate(FIELD_NAMES)})
+FIELD_MAP = MappingProxyType({item["Field Name"]: MappingProxyType(dict(item)) for item in ALL_CONFIGS})
+DESC_MAP = MappingProxyType({item["Field Name"]: item["Field Description"] for item in ALL_CONFIGS})
+PLOT_LABEL_MAP = MappingProxyType({name: desc.split(" - ")[0].split("(")[0] for name, desc in DESC_MAP.items()})
+
+# --- Groupings ---
+FIELDS_BY_CONFIG = MappingProxyType({
+    "base": tuple(item["Field Name"] for item in BASE_DATA_CONFIG),
+    "onetime": tuple(item["Field Name"] for item in ONETIME_EXPENSES_CONFIG),
+    "recurring": tuple(item["Field Name"] for item in RECURRING_EXPENSES_CONFIG),
+    "investment": tuple(item["Field Name"] for item in INVESTMENT_PLAN_CONFIG),
+})
+ONETIME_FIELDS_BY_TYPE = MappingProxyType({
+    expense_type: tuple(item["Field Name"] for item in ONETIME_EXPENSES_CONFIG if item["Type"].lower() == expense_type)
+    for expense_type in sorted({item["Type"].lower() for item in ONETIME_EXPENSES_CONFIG})
+})
+
+# --- Formulas and their dependencies ---
+FORMULAS = MappingProxyType({
+    item["Field Name"]: clean_formula(_raw_formula(item)) for item in ALL_CONFIGS if _raw_formula(item)
+})
+FORMULA_DEPS = MappingProxyType({
+    name: tuple(dict.fromkeys(VARIABLE_PATTERN.findall(expression))) for name, expression in FORMULAS.items()
+})
+INPUT_FORMULA_ORDER = _topological_order([item["Field Name"] for item in INPUT_CONFIGS], FORMULA_DEPS)
+INVESTMENT_FORMULA_ORDER = tuple(name for name in FIELDS_BY_CONFIG["investment"] if name in FORMULAS)
+
+# Reverse edges: field -> formula fields that read it directly
+_dependents = {}
+for _name, _deps in FORMULA_DEPS.items():
+    for _dep in _deps:
+        _dependents.setdefault(_dep, []).append(_name)
+FORMULA_DEPENDENTS = MappingProxyType({name: tuple(names) for name, names in _dependents.items()})
+
+
+@lru_cache(maxsize=256)
+def formulas_affected_by(names):
+    """Formula fields that read any of `names` (a frozenset), directly or through other formulas, in evaluation order."""
+    affected, pending = set(), list(names)
+    while pending:
+        for dependent in FORMULA_DEPENDENTS.get(pending.pop(), ()):
+            if dependent not in affected:
+                affected.add(dependent)
+                pending.append(dependent)
+    return tuple(name for name in INPUT_FORMULA_ORDER + INVESTMENT_FORMULA_ORDER if name in affected)
+
+# Non-formula input fields and their defaults (what a brand new plan starts from)
+INPUT_DEFAULTS = MappingProxyType({
+    item["Field Name"]: item["Field Default Value"] for item in INPUT_CONFIGS if not _is_formula(item.get("Field Default Value"))
+})
+RECURRING_EXPENSE_FIELDS = tuple(name for name in FIELDS_BY_CONFIG["recurring"] if not name.startswith("GLTotal"))
+
+
+# --- Display order of the Investment Plan page ---
+def _investment_display_order():
+    ordered = list(FIELDS_BY_CONFIG["investment"])
+    # The SWP corpus row is shown right after the POMIS amount, where the yearly part of the plan starts
+    ordered.remove("LocalSWPInvestAmount")
+    ordered.insert(ordered.index("LocalPOMISAmount") + 1, "LocalSWPInvestAmount")
+    return tuple(ordered)
+
+
+INVESTMENT_DISPLAY_ORDER = _investment_display_order()
+_split_index = INVESTMENT_DISPLAY_ORDER.index("LocalSWPInvestAmount")
+INVESTMENT_STATIC_FIELDS = INVESTMENT_DISPLAY_ORDER[:_split_index]
+INVESTMENT_DYNAMIC_FIELDS = INVESTMENT_DISPLAY_ORDER[_split_index:]
+
+# --- Config tables as DataFrames (shared; callers must .copy() before mutating) ---
+ONETIME_EXPENSES_DF = pd.DataFrame(ONETIME_EXPENSES_CONFIG)
+RECURRING_EXPENSES_DF = pd.DataFrame(RECURRING_EXPENSES_CONFIG)
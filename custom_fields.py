@@ -0,0 +1,177 @@
+# custom_fields.py
+#
+# User-defined income and expense lines on top of the fixed config fields.
+#
+# Lines are stored in user_data["CustomFields"] as a list of rows:
+#   Name, Type (Income / Expense / Optional Expense), Amount (yearly), Start Year, End Year
+#   (blank = to the end), Growth (None / Inflation / Fixed %), Growth Rate, Formula.
+# A line's yearly value is its Amount (or its Formula, when given) times its growth index
+# ((1 + rate) ** (year - 1), from projection_engine.growth_factors) in the years it is active.
+#
+# Formulas use the config syntax, e.g. "= {GLPensionEPS} * 12 * 0.5", may reference any
+# config field or {Year}, and allow numbers, + - * / // % **, min / max / abs and nothing
+# else. They are checked against an AST whitelist and compiled once into an expression
+# over NumPy arrays: every {Var} stands for its whole column of the projection table, so
+# a line is evaluated for all years in one go. Lines without formulas are evaluated
+# together as one (lines, years) array, so dozens of lines cost about as much as one.
+
+import ast
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from config_registry import FIELD_MAP, VARIABLE_PATTERN, clean_formula
+from projection_engine import MONTHS_PER_YEAR, growth_factors
+
+CUSTOM_KEY = "CustomFields"
+MAX_LINES = 50
+LINE_COLUMNS = ("Name", "Type", "Amount", "Start Year", "End Year", "Growth", "Growth Rate", "Formula")
+LINE_TYPES = ("Income", "Expense", "Optional Expense")
+GROWTH_TYPES = ("None", "Inflation", "Fixed %")
+# The projection totals each type adds to; expense totals are monthly amounts
+TOTAL_FIELDS = {"Income": "GLTotalIncomeOverallFDs", "Expense": "GLTotalYearlyExpensesMust",
+                "Optional Expense": "GLTotalYearlyExpensesOptional"}
+SUM_FIELDS = {"Income": "LocalCustomIncome", "Expense": "LocalCustomExpenses", "Optional Expense": "LocalCustomExpensesOpt"}
+YEAR_VARIABLE = "Year"
+
+FORMULA_FUNCTIONS = {"min": np.minimum, "max": np.maximum, "abs": np.abs}
+ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call,
+                 ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd)
+
+
+class FormulaError(ValueError):
+    pass
+
+
+def load_lines(plan):
+    return [dict(row) for row in plan.get(CUSTOM_KEY, {}).get("input", [])]
+
+
+def store_lines(plan, lines):
+    if lines:
+        plan[CUSTOM_KEY] = {"input": lines}
+    elif CUSTOM_KEY in plan:
+        del plan[CUSTOM_KEY]
+
+
+@lru_cache(maxsize=1024)
+def compile_formula(formula):
+    """
+    (code, variable names) for a custom formula; raises FormulaError when it uses anything
+    outside the whitelist. Each {Var} becomes an argument `_v<n>` of the compiled expression.
+    """
+    expression = clean_formula(formula if str(formula).startswith("=") else f"={formula}")
+    variables = []
+
+    def placeholder(match):
+        name = match.group(1).strip()
+        if name != YEAR_VARIABLE and name not in FIELD_MAP:
+            raise FormulaError(f"Unknown field {{{name}}}")
+        if name not in variables:
+            variables.append(name)
+        return f"_v{variables.index(name)}"
+
+    expression = VARIABLE_PATTERN.sub(placeholder, expression)
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula: {e.msg}")
+    allowed_names = set(FORMULA_FUNCTIONS) | {f"_v{index}" for index in range(len(variables))}
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise FormulaError(f"Not allowed in a formula: {type(node).__name__}")
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise FormulaError("Only numbers are allowed as constants")
+            # Floats, so a huge power overflows right away instead of computing a giant int
+            node.value = float(node.value)
+        if isinstance(node, ast.Name) and node.id not in allowed_names:
+            raise FormulaError(f"Unknown name: {node.id}")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in FORMULA_FUNCTIONS or node.keywords):
+            raise FormulaError("Only min(), max() and abs() can be called")
+    return compile(tree, "<custom formula>", "eval"), tuple(variables)
+
+
+def clean_line(row):
+    """A line from the editor, with numbers filled in and the formula checked (FormulaError)."""
+    def number(name, default=0.0):
+        value = row.get(name)
+        return default if value is None or value == "" or pd.isna(value) else float(value)
+
+    formula = str(row.get("Formula") or "").strip()
+    if formula:
+        compile_formula(formula)
+    end_year = number("End Year", None)
+    return {
+        "Name": str(row.get("Name") or "Custom Line").strip(),
+        "Type": row.get("Type") if row.get("Type") in LINE_TYPES else LINE_TYPES[0],
+        "Amount": max(number("Amount"), 0.0),
+        "Start Year": max(int(number("Start Year", 1)), 1),
+        "End Year": None if end_year is None else max(int(end_year), 1),
+        "Growth": row.get("Growth") if row.get("Growth") in GROWTH_TYPES else GROWTH_TYPES[0],
+        "Growth Rate": number("Growth Rate"),
+        "Formula": formula,
+    }
+
+
+def line_values(lines, table, context):
+    """(lines, years) yearly values of every line over a projection table."""
+    years = len(table)
+    year_numbers = np.arange(1, years + 1)
+    inflation = float(context.get("GLInflationRate", {}).get("input", 0)) / 100.0
+
+    rates = np.array([inflation if line["Growth"] == "Inflation" else line["Growth Rate"] / 100.0 if line["Growth"] == "Fixed %" else 0.0
+                      for line in lines])
+    base = np.array([line["Amount"] for line in lines], dtype=float)[:, None]
+    start = np.array([line["Start Year"] for line in lines])[:, None]
+    end = np.array([years if line["End Year"] is None else line["End Year"] for line in lines])[:, None]
+    values = np.broadcast_to(base, (len(lines), years)).copy()
+
+    for index, line in enumerate(lines):
+        if not line["Formula"]:
+            continue
+        code, variables = compile_formula(line["Formula"])
+        namespace = dict(FORMULA_FUNCTIONS)
+        for position, name in enumerate(variables):
+            if name == YEAR_VARIABLE:
+                column = year_numbers
+            elif name in table.columns:
+                column = pd.to_numeric(table[name], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+            else:
+                column = float(context.get(name, {}).get("input", 0) or 0)
+            namespace[f"_v{position}"] = column
+        try:
+            with np.errstate(all="ignore"):
+                result = eval(code, {"__builtins__": {}}, namespace)
+        except ArithmeticError:
+            # Only formulas over constants get here (e.g. 1 / 0); arrays give inf / nan instead
+            result = 0.0
+        values[index] = np.nan_to_num(np.broadcast_to(np.asarray(result, dtype=float), years))
+
+    # Growth indexes for all lines at once: (lines, years)
+    growth = growth_factors(rates, years)[:, :years]
+    active = (year_numbers >= start) & (year_numbers <= end)
+    return values * growth * active
+
+
+def add_custom_columns(table, context):
+    """
+    Projection table with a "Custom - <Name>" column per line and the per-type sums added,
+    and the lines counted in the income / expense totals. Tables of plans without custom
+    lines are returned as they are.
+    """
+    lines = load_lines(context)
+    if not lines or table is None or table.empty:
+        return table
+    values = line_values(lines, table, context)
+    types = np.array([line["Type"] for line in lines])
+    columns = {f"Custom - {line['Name']}": row for line, row in zip(lines, values)}
+    columns.update({SUM_FIELDS[line_type]: values[types == line_type].sum(axis=0) for line_type in LINE_TYPES})
+    # One concat instead of a column insert per line
+    table = pd.concat([table, pd.DataFrame(columns, index=table.index)], axis=1)
+    for line_type in LINE_TYPES:
+        # Income totals are yearly, expense totals monthly
+        total = table[SUM_FIELDS[line_type]] if line_type == "Income" else table[SUM_FIELDS[line_type]] / MONTHS_PER_YEAR
+        table[TOTAL_FIELDS[line_type]] = table[TOTAL_FIELDS[line_type]] + total
+    return table
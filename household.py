@@ -0,0 +1,135 @@
+# household.py
+#
+# Household plans: the plan's own person plus other members (spouse, parents...), each
+# with their own age, pension, annuity and SCSS / POMIS deposits.
+#
+# Members are stored in user_data["Household"] as a list of rows. The first member is
+# always the plan itself: it carries the shared corpus (SWP, FDs), rent, other income and
+# all household expenses. Other members add their own income; their SCSS / POMIS deposits
+# are their own money (outside the plan's corpus), each within the single-account limits.
+# A member's age decides whether they can hold SCSS (senior citizens only) and whether
+# their deposits earn the Sr Citizen FD rate once they roll into FDs.
+#
+# All members are projected together: their parameters are stacked into (members,)
+# arrays and go through projection_engine.simulate_monthly() in one call, so a household
+# of four costs about as much as one person. The plan's computed tax and custom lines
+# come from its projection table (ledger_engine.table_flows) and go to the first member.
+
+import numpy as np
+import pandas as pd
+
+from config_registry import INPUT_DEFAULTS
+from projection_engine import MONTHS_PER_YEAR, SCHEME_TENURE_YEARS, monthly_to_yearly, simulate_monthly
+from tax_engine import SENIOR_AGE
+
+HOUSEHOLD_KEY = "Household"
+MAX_MEMBERS = 6
+MEMBER_COLUMNS = ("Name", "Age", "Monthly Pension", "Monthly Annuity", "SCSS Amount", "POMIS Amount")
+# Income streams of a member, as named in simulate_monthly() output
+INCOME_STREAMS = ("swp_withdrawal", "normal_fd_income", "sr_fd_income_first5", "sr_fd_income_past5",
+                  "pomis_income", "scss_income", "rental_income", "other_income")
+
+
+def load_members(plan):
+    return [dict(row) for row in plan.get(HOUSEHOLD_KEY, {}).get("input", [])]
+
+
+def store_members(plan, members):
+    if members:
+        plan[HOUSEHOLD_KEY] = {"input": members}
+    elif HOUSEHOLD_KEY in plan:
+        del plan[HOUSEHOLD_KEY]
+
+
+def clean_member(row):
+    """A member row from the editor, with numbers filled in and deposits within the single limits."""
+    def number(name):
+        value = row.get(name)
+        return 0.0 if value is None or pd.isna(value) else float(value)
+
+    return {
+        "Name": str(row.get("Name") or "Member").strip(),
+        "Age": int(number("Age")),
+        "Monthly Pension": max(number("Monthly Pension"), 0.0),
+        "Monthly Annuity": max(number("Monthly Annuity"), 0.0),
+        "SCSS Amount": min(max(number("SCSS Amount"), 0.0), INPUT_DEFAULTS["GLSCSSSingle"]),
+        "POMIS Amount": min(max(number("POMIS Amount"), 0.0), INPUT_DEFAULTS["GLPOMISSingle"]),
+    }
+
+
+def primary_member(context, name="You"):
+    """The plan's own person, as a member row."""
+    def value(field):
+        return context.get(field, {}).get("input", INPUT_DEFAULTS[field])
+
+    return {
+        "Name": name,
+        "Age": int(value("GLAge")),
+        "Monthly Pension": float(value("GLPensionEPS")),
+        "Monthly Annuity": float(value("GLAnnuityExistingMonthly")),
+        "SCSS Amount": float(context.get("LocalSCSSAmount", {}).get("input", value("GLSCSSSingle"))),
+        "POMIS Amount": float(context.get("LocalPOMISAmount", {}).get("input", value("GLPOMISSingle"))),
+    }
+
+
+def scss_too_young(members):
+    """Names of the members with an SCSS amount who are too young to open SCSS."""
+    return [member["Name"] for member in members if member["SCSS Amount"] > 0 and member["Age"] < SENIOR_AGE]
+
+
+def stacked_params(params, members):
+    """
+    (members,) arrays for every engine parameter. Member 0 keeps the plan's parameters;
+    the others get only their own pension, annuity and deposits, as their age allows.
+    """
+    count = len(members) + 1
+    others = slice(1, None)
+    stacked = {key: np.full(count, float(value)) for key, value in params.items() if key != "years"}
+    for key in ("swp_corpus", "swp_monthly_withdrawal", "monthly_rental", "max_monthly_rental",
+                "expenses_must", "expenses_optional", "one_time_must", "one_time_delayed"):
+        stacked[key][others] = 0.0
+
+    ages = np.array([member["Age"] for member in members], dtype=float)
+    # SCSS is for senior citizens only; a younger member's SCSS amount is not invested
+    scss = np.where(ages >= SENIOR_AGE, [member["SCSS Amount"] for member in members], 0.0)
+    pomis = np.array([member["POMIS Amount"] for member in members], dtype=float)
+    stacked["scss_amount"][others] = scss
+    stacked["pomis_amount"][others] = pomis
+    # No FD money of their own: the fund is exactly what sits in the schemes
+    stacked["fd_fund"][others] = scss + pomis
+    # The deposits roll into FDs when the schemes mature: the senior rate only for seniors by then
+    stacked["sr_fd_rate"][others] = np.where(ages + SCHEME_TENURE_YEARS >= SENIOR_AGE, params["sr_fd_rate"], params["normal_fd_rate"])
+    stacked["other_income"][others] = np.array(
+        [(member["Monthly Pension"] + member["Monthly Annuity"]) * MONTHS_PER_YEAR for member in members], dtype=float)
+    return stacked
+
+
+def project_household(params, primary, members, years=None, flows=None):
+    """
+    Projects every member in one pass. Returns (per-member yearly income (M, Y), household
+    DataFrame with one income column per member, total income, expenses and net cash flow).
+    Figures follow the yearly table: expenses step up once a year, income is a yearly sum.
+    `flows` (ledger_engine.table_flows of the plan's table) replaces the plan's expenses
+    and adds its custom income.
+    """
+    years = int(params["years"] if years is None else years)
+    everyone = [primary] + list(members)
+    yearly = monthly_to_yearly(simulate_monthly(stacked_params(params, members), years, inflation_step_months=12))
+    income = sum(yearly[stream] for stream in INCOME_STREAMS)
+    if flows is not None:
+        income[0] += flows["extra_income"][:years]
+
+    table = pd.DataFrame({"Year": np.arange(1, years + 1)})
+    for member, member_income in zip(everyone, income):
+        table[f"Income - {member['Name']}"] = member_income
+    table["Household Income"] = income.sum(axis=0)
+    # Expenses are all carried by member 0 (monthly amounts, as in the yearly table)
+    if flows is not None:
+        table["Household Expenses"] = flows["recurring_expenses"][:years]
+    else:
+        table["Household Expenses"] = (yearly["expenses_must"][0] + yearly["expenses_optional"][0]) * MONTHS_PER_YEAR
+    table["Net Cash Flow"] = table["Household Income"] - table["Household Expenses"]
+    table["SWP Corpus"] = yearly["swp_closing"][0]
+    for member in everyone:
+        table[f"Age - {member['Name']}"] = member["Age"] + table["Year"] - 1
+    return income, table
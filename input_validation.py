@@ -0,0 +1,96 @@
+# input_validation.py
+#
+# Validation rules for the input pages, derived from the config tables.
+#
+# - ranges: every percentage / rate field is 0-100, amounts can't be negative, plus a few
+#   fields with natural limits (age, projection years). The batch-edit forms pass these
+#   to st.number_input, so the browser enforces them before anything is submitted.
+# - cross-field rules: allocation percentages that must add up to 100, and the SCSS /
+#   POMIS amounts, which can't exceed the joint-account limits.
+
+from types import MappingProxyType
+
+from config_registry import DESC_MAP, INPUT_DEFAULTS
+
+PERCENT_WORDS = ("rate", "percentage", "%", "slab")
+
+SPECIAL_BOUNDS = {
+    "GLAge": (18, 100),
+    "GLProjectionYears": (1, 60),
+    "GLDelayedExpensesYear": (1, 60),
+}
+
+# Pairs of allocation percentages that split one amount
+ALLOCATION_GROUPS = (
+    ("GLSWPInvestmentPercentage", "GLNonSWPInvestmentPercentage"),
+    ("GLNormalFDExcludingPOMISSCSS", "GLSrCitizenFDExcludingPOMISSCSS"),
+)
+# amount field -> field holding its upper limit
+AMOUNT_CAPS = {
+    "GLSCSSSingle": "GLSCSSJoint",
+    "GLPOMISSingle": "GLPOMISJoint",
+}
+SUM_TOLERANCE = 0.01
+
+
+def _bounds(name, default):
+    if name in SPECIAL_BOUNDS:
+        return SPECIAL_BOUNDS[name]
+    if any(word in DESC_MAP[name].lower() for word in PERCENT_WORDS):
+        return (0.0, 100.0)
+    return (0.0, None) if isinstance(default, (int, float)) else None
+
+
+FIELD_BOUNDS = MappingProxyType({
+    name: bounds for name, default in INPUT_DEFAULTS.items() if (bounds := _bounds(name, default)) is not None
+})
+
+
+def number_input_bounds(name):
+    """min_value / max_value keyword arguments for st.number_input."""
+    low, high = FIELD_BOUNDS.get(name, (None, None))
+    return {key: float(value) for key, value in (("min_value", low), ("max_value", high)) if value is not None}
+
+
+def clamp_to_bounds(name, value):
+    low, high = FIELD_BOUNDS.get(name, (None, None))
+    if low is not None:
+        value = max(value, low)
+    if high is not None:
+        value = min(value, high)
+    return float(value)
+
+
+def validate_inputs(values, plan):
+    """
+    Checks submitted `values` ({field: value}) together with the rest of `plan`.
+    Returns a list of error messages; empty when everything is valid.
+    """
+    def current(name):
+        if name in values:
+            return values[name]
+        return plan.get(name, {}).get("input", INPUT_DEFAULTS.get(name, 0))
+
+    errors = []
+    for name, value in values.items():
+        if name not in FIELD_BOUNDS or not isinstance(value, (int, float)):
+            continue
+        low, high = FIELD_BOUNDS[name]
+        if (low is not None and value < low) or (high is not None and value > high):
+            limits = f"between {low:g} and {high:g}" if high is not None else f"at least {low:g}"
+            errors.append(f"{DESC_MAP[name]} must be {limits}.")
+
+    for group in ALLOCATION_GROUPS:
+        if not any(name in values for name in group):
+            continue
+        total = sum(float(current(name)) for name in group)
+        if abs(total - 100.0) > SUM_TOLERANCE:
+            names = " + ".join(DESC_MAP[name] for name in group)
+            errors.append(f"{names} must add up to 100% (now {total:g}%).")
+
+    for amount, cap in AMOUNT_CAPS.items():
+        if amount not in values and cap not in values:
+            continue
+        if float(current(amount)) > float(current(cap)):
+            errors.append(f"{DESC_MAP[amount]} ({float(current(amount)):,.0f}) can't exceed {DESC_MAP[cap]} ({float(current(cap)):,.0f}).")
+    return errors
@@ -0,0 +1,190 @@
+# ladder_model.py
+#
+# Deposit ladder for the guaranteed part of the corpus (Normal FD, Sr Citizen FD, SCSS, POMIS).
+#
+# Every deposit is a tranche with an amount, start year, tenure, payout frequency and a
+# rule for what happens at maturity. The ladder is held as a set of parallel NumPy arrays
+# (one slot per tranche), so each projection year is a few array operations no matter how
+# many staggered deposits the plan has.
+#
+# The default ladder reproduces the app's original schedule: SCSS and POMIS for five
+# years, then their principal moves into FDs on the plan's Normal/Sr Citizen split.
+# Only the yearly projection runs a custom ladder (user_data["DepositLadder"]); the
+# monthly engine, the cash-flow ledger, the household and the optimizer use the default
+# schedule, so the app says so wherever a plan has a custom ladder.
+
+import numpy as np
+import pandas as pd
+
+from projection_engine import SCHEME_TENURE_YEARS
+
+KINDS = ("normal_fd", "sr_fd", "scss", "pomis")
+KIND_LABELS = {"normal_fd": "Normal FD", "sr_fd": "Sr Citizen FD", "scss": "SCSS", "pomis": "POMIS"}
+# Payouts per year; 0 = cumulative (interest compounds quarterly and is paid at maturity)
+PAYOUTS = {"Monthly": 12, "Quarterly": 4, "Yearly": 1, "Cumulative": 0}
+RULES = ("Renew", "Move to FDs", "Pay out")
+LADDER_KEY = "DepositLadder"
+CUMULATIVE_COMPOUNDING = 4
+# Tenure of the FDs that receive money from a "Move to FDs" maturity
+ROLLOVER_FD_TENURE = 5
+
+NORMAL_FD, SR_FD = KINDS.index("normal_fd"), KINDS.index("sr_fd")
+RENEW, MOVE, PAY_OUT = range(len(RULES))
+
+
+def default_ladder(params):
+    """Ladder rows equivalent to the original year<=5 / year>5 schedule."""
+    scss, pomis = params["scss_amount"], params["pomis_amount"]
+    fd_principal = params["fd_fund"] - scss - pomis
+    share = params["normal_fd_share"]
+    return [
+        {"Instrument": "Normal FD", "Amount": fd_principal * share, "Start Year": 1, "Tenure (years)": 5, "Payout": "Yearly", "At Maturity": "Renew"},
+        {"Instrument": "Sr Citizen FD", "Amount": fd_principal * (1 - share), "Start Year": 1, "Tenure (years)": 5, "Payout": "Yearly", "At Maturity": "Renew"},
+        {"Instrument": "SCSS", "Amount": scss, "Start Year": 1, "Tenure (years)": 5, "Payout": "Quarterly", "At Maturity": "Move to FDs"},
+        {"Instrument": "POMIS", "Amount": pomis, "Start Year": 1, "Tenure (years)": 5, "Payout": "Monthly", "At Maturity": "Move to FDs"},
+    ]
+
+
+def custom_ladder(plan):
+    """The plan's own ladder rows, None when it uses the default ladder."""
+    return plan.get(LADDER_KEY, {}).get("input") or None
+
+
+def clean_row(row):
+    """A ladder row as stored: blank cells (None / NaN from the editor) get their defaults."""
+    def number(name, default):
+        value = row.get(name)
+        return default if value is None or pd.isna(value) else float(value)
+
+    return {
+        "Instrument": row.get("Instrument"),
+        "Amount": max(number("Amount", 0.0), 0.0),
+        "Start Year": max(int(number("Start Year", 1)), 1),
+        "Tenure (years)": max(int(number("Tenure (years)", 1)), 1),
+        "Payout": row.get("Payout") if row.get("Payout") in PAYOUTS else "Yearly",
+        "At Maturity": row.get("At Maturity") if row.get("At Maturity") in RULES else RULES[RENEW],
+    }
+
+
+def rate_paths(params, years):
+    """Rate in force for new deposits of each kind, per year (constant at the plan's rates)."""
+    rates = np.array([params["normal_fd_rate"], params["sr_fd_rate"], params["scss_rate"], params["pomis_rate"]], dtype=float)
+    return np.repeat(rates[:, None], years, axis=1)
+
+
+def ladder_arrays(rows):
+    """
+    Converts ladder rows into parallel tranche arrays. Each "Move to FDs" tranche gets two
+    dormant child slots (Normal FD + Sr Citizen FD) that are filled when it matures, so the
+    arrays never change size during a simulation.
+    """
+    labels = {label: index for index, label in enumerate(KIND_LABELS.values())}
+    rows = [clean_row(row) for row in rows if row.get("Instrument") in labels]
+    rows = [row for row in rows if row["Amount"] > 0]
+    n_movable = sum(row.get("At Maturity") == "Move to FDs" for row in rows)
+    size = len(rows) + 2 * n_movable
+
+    tranches = {
+        "kind": np.zeros(size, dtype=int),
+        "amount": np.zeros(size),
+        "start": np.zeros(size, dtype=int),
+        "tenure": np.full(size, ROLLOVER_FD_TENURE, dtype=int),
+        "payouts": np.ones(size, dtype=int),
+        "rule": np.full(size, RENEW, dtype=int),
+        "child": np.full(size, -1, dtype=int),  # first of the two child slots, -1 if none
+    }
+    child = len(rows)
+    for i, row in enumerate(rows):
+        tranches["kind"][i] = labels[row["Instrument"]]
+        tranches["amount"][i] = row["Amount"]
+        tranches["start"][i] = row["Start Year"]
+        tranches["tenure"][i] = row["Tenure (years)"]
+        tranches["payouts"][i] = PAYOUTS[row["Payout"]]
+        tranches["rule"][i] = RULES.index(row["At Maturity"])
+        if tranches["rule"][i] == MOVE:
+            tranches["child"][i] = child
+            tranches["kind"][child], tranches["kind"][child + 1] = NORMAL_FD, SR_FD
+            tranches["start"][child:child + 2] = 0  # dormant until the parent matures
+            child += 2
+    return tranches
+
+
+def simulate_ladder(tranches, rates_by_year, normal_fd_share):
+    """
+    Runs the ladder year by year.
+
+    `rates_by_year` is (len(KINDS), Y): the rate a deposit of each kind gets when it starts
+    or renews in that year. Returns per-year arrays: "interest" (len(KINDS), Y) paid out,
+    "accrued" (Y,) interest compounding inside cumulative deposits, "principal"
+    (len(KINDS), Y) at year end and "paid_out" (Y,) principal returned as cash.
+    """
+    years = rates_by_year.shape[1]
+    kind = tranches["kind"]
+    principal = tranches["amount"].copy()
+    start = tranches["start"].copy()
+    tenure, payouts, rule, child = tranches["tenure"], tranches["payouts"], tranches["rule"], tranches["child"]
+    rate = np.where(start > 0, rates_by_year[kind, np.clip(start - 1, 0, years - 1)], 0.0)
+    n_kinds = len(KINDS)
+
+    out = {
+        "interest": np.zeros((n_kinds, years)),
+        "accrued": np.zeros(years),
+        "principal": np.zeros((n_kinds, years)),
+        "paid_out": np.zeros(years),
+    }
+    movers = np.flatnonzero(rule == MOVE)
+
+    for y in range(years):
+        year = y + 1
+        active = (start > 0) & (start <= year) & (principal > 0)
+
+        cumulative = active & (payouts == 0)
+        paying = active & (payouts > 0)
+        growth = (1.0 + rate / CUMULATIVE_COMPOUNDING) ** CUMULATIVE_COMPOUNDING - 1.0
+        out["accrued"][y] = (principal * growth)[cumulative].sum()
+        principal = np.where(cumulative, principal * (1.0 + growth), principal)
+        out["interest"][:, y] = np.bincount(kind[paying], weights=(principal * rate)[paying], minlength=n_kinds)
+
+        # Maturities at the end of this year
+        matured = active & ((year - start + 1) % tenure == 0)
+        renew = matured & (rule == RENEW)
+        next_year = min(year, years - 1)
+        rate = np.where(renew, rates_by_year[kind, next_year], rate)
+
+        pay_out = matured & (rule == PAY_OUT)
+        out["paid_out"][y] = principal[pay_out].sum()
+        principal = np.where(pay_out, 0.0, principal)
+
+        moving = movers[matured[movers]]
+        if moving.size:
+            normal_slot, sr_slot = child[moving], child[moving] + 1
+            principal[normal_slot] = principal[moving] * normal_fd_share
+            principal[sr_slot] = principal[moving] * (1.0 - normal_fd_share)
+            start[normal_slot] = start[sr_slot] = year + 1
+            rate[normal_slot] = rates_by_year[NORMAL_FD, next_year]
+            rate[sr_slot] = rates_by_year[SR_FD, next_year]
+            principal[moving] = 0.0
+
+        started = (start > 0) & (start <= year)
+        out["principal"][:, y] = np.bincount(kind, weights=np.where(started, principal, 0.0), minlength=n_kinds)
+    return out
+
+
+def ladder_income(params, years, rows=None):
+    """
+    Yearly income columns of the projection table from the deposit ladder (the plan's
+    default ladder unless `rows` are given).
+    """
+    rows = rows if rows else default_ladder(params)
+    result = simulate_ladder(ladder_arrays(rows), rate_paths(params, years), params["normal_fd_share"])
+    interest = dict(zip(KINDS, result["interest"]))
+    first_years = np.arange(1, years + 1) <= SCHEME_TENURE_YEARS
+    return {
+        "LocalNormalFDYearlyIncome": interest["normal_fd"],
+        "LocalSrFDYearlyIncomeFirst5": np.where(first_years, interest["sr_fd"], 0.0),
+        "LocalSrFDYearlyIncomePast5": np.where(first_years, 0.0, interest["sr_fd"]),
+        "LocalPOMISYearlyIncome": interest["pomis"],
+        "LocalSCSSYearlyIncome": interest["scss"],
+        "LocalDepositsPaidOut": result["paid_out"],
+        "LocalDepositsAccrued": result["accrued"],
+    }
@@ -0,0 +1,176 @@
+# ledger_engine.py
+#
+# Year-by-year cash-flow ledger. Unlike calculate_projections(), which lists income and
+# expenses side by side, the ledger moves money: a shortfall is drawn from the corpus
+# through a configurable waterfall, a surplus is re-invested, and one-time expenses are
+# paid out of the corpus in the year they fall due.
+#
+# The plan's money is held in a small state vector (one balance per bucket). Each year is
+# a handful of array operations, and every parameter may carry a batch axis, so many
+# plans or variants are run together.
+#
+# Recurring expenses and custom income lines come from the projection table when the
+# caller passes them (table_flows), so the ledger pays the same computed tax and custom
+# lines as the Investment Plan.
+
+import numpy as np
+import pandas as pd
+
+from custom_fields import SUM_FIELDS
+from projection_engine import MONTHS_PER_YEAR, SCHEME_TENURE_YEARS, growth_factors
+
+# Buckets of the state vector
+SWP, NORMAL_FD, SR_FD, SCHEMES = range(4)
+BUCKETS = ("swp", "normal_fd", "sr_fd", "schemes")
+BUCKET_LABELS = {
+    "swp": "SWP Corpus",
+    "normal_fd": "Normal FD",
+    "sr_fd": "Sr Citizen FD",
+    "schemes": "SCSS/POMIS (at maturity)",
+}
+DEFAULT_WATERFALL = ("swp", "normal_fd", "sr_fd", "schemes")
+DEFAULT_SURPLUS_BUCKET = "normal_fd"
+# Optional parameters with one value per year, shape (..., Y)
+YEARLY_PARAMS = ("recurring_expenses", "extra_income")
+
+
+def _arr(value):
+    return np.asarray(value, dtype=float)
+
+
+def initial_balances(params):
+    """Opening balance of each bucket, shape (..., 4)."""
+    scss, pomis, fund = _arr(params["scss_amount"]), _arr(params["pomis_amount"]), _arr(params["fd_fund"])
+    fd_principal = fund - scss - pomis
+    share = _arr(params["normal_fd_share"])
+    return np.stack(np.broadcast_arrays(
+        _arr(params["swp_corpus"]), fd_principal * share, fd_principal * (1.0 - share), scss + pomis), axis=-1)
+
+
+def table_flows(table):
+    """
+    Yearly ledger parameters from a projection table: recurring expenses as projected (tax
+    and custom expense lines included) and the custom income lines.
+    """
+    expenses = table["GLTotalYearlyExpensesMust"] + table["GLTotalYearlyExpensesOptional"]
+    income = table[SUM_FIELDS["Income"]].to_numpy(dtype=float) if SUM_FIELDS["Income"] in table else np.zeros(len(table))
+    return {"recurring_expenses": expenses.to_numpy(dtype=float) * MONTHS_PER_YEAR, "extra_income": income}
+
+
+def simulate_ledger(params, years=None, waterfall=DEFAULT_WATERFALL, surplus_bucket=DEFAULT_SURPLUS_BUCKET):
+    """
+    Runs the ledger for `years` years.
+
+    Each year:
+      1. buckets earn their return: the SWP corpus compounds and pays the planned
+         withdrawal, FDs and SCSS/POMIS pay out their interest
+      2. net cash flow = cash income - recurring expenses - one-time expenses due
+         (the 'must' one-time total in year 1, the delayed total in its scheduled year,
+         inflated to that year). Recurring expenses are params["recurring_expenses"][..., y]
+         if given (see table_flows), else the base monthly expenses inflated; cash income
+         includes params["extra_income"][..., y] if given.
+      3. a shortfall is drawn from the buckets in `waterfall` order; SCSS/POMIS money can
+         only be drawn once it matures. Whatever cannot be funded is reported as unfunded.
+      4. a surplus is added to `surplus_bucket` (None keeps it out of the corpus)
+      5. SCSS/POMIS principal maturing this year rolls into the FDs on the plan's split
+
+    Returns a dict of (..., Y) arrays plus "balances" of shape (..., Y, 4).
+    """
+    years = int(params["years"] if years is None else years)
+    order = [BUCKETS.index(name) for name in waterfall]
+    surplus_index = None if surplus_bucket is None else BUCKETS.index(surplus_bucket)
+
+    yearly = {key: _arr(params[key]) for key in YEARLY_PARAMS if key in params}
+    batch_shape = np.broadcast_shapes(*(np.shape(value) for key, value in params.items() if key not in yearly),
+                                      *(value.shape[:-1] for value in yearly.values()))
+    balances = np.broadcast_to(initial_balances(params), batch_shape + (len(BUCKETS),)).copy()
+    inflation_index = growth_factors(params["inflation_rate"], years)
+    swp_growth = growth_factors(params["swp_monthly_rate"], MONTHS_PER_YEAR)[..., -1] - 1.0
+    scheme_amount = _arr(params["scss_amount"]) + _arr(params["pomis_amount"])
+    scheme_income = _arr(params["scss_amount"]) * _arr(params["scss_rate"]) + _arr(params["pomis_amount"]) * _arr(params["pomis_rate"])
+    scheme_rate = np.divide(scheme_income, scheme_amount, out=np.zeros(np.broadcast(scheme_income, scheme_amount).shape), where=scheme_amount > 0)
+    share = _arr(params["normal_fd_share"])
+    delayed_year = np.rint(_arr(params["delayed_expense_year"]))
+
+    keys = ("cash_income", "swp_withdrawal", "fd_interest", "scheme_interest", "recurring_expenses",
+            "one_time_expenses", "net_cash_flow", "drawn", "reinvested", "unfunded")
+    out = {key: np.zeros(batch_shape + (years,)) for key in keys}
+    out["drawn_by_bucket"] = np.zeros(batch_shape + (years, len(BUCKETS)))
+    out["balances"] = np.zeros(batch_shape + (years, len(BUCKETS)))
+
+    for y in range(years):
+        year = y + 1
+        factor = inflation_index[..., y]
+
+        # 1. Returns on each bucket
+        swp_available = balances[..., SWP] * (1.0 + swp_growth)
+        swp_withdrawal = np.minimum(_arr(params["swp_monthly_withdrawal"]) * 12, swp_available)
+        balances[..., SWP] = swp_available - swp_withdrawal
+        fd_interest = balances[..., NORMAL_FD] * _arr(params["normal_fd_rate"]) + balances[..., SR_FD] * _arr(params["sr_fd_rate"])
+        scheme_interest = balances[..., SCHEMES] * scheme_rate
+
+        # 2. Net cash flow
+        rental = np.minimum(_arr(params["monthly_rental"]) * factor, _arr(params["max_monthly_rental"])) * 12
+        cash_income = swp_withdrawal + fd_interest + scheme_interest + rental + _arr(params["other_income"])
+        if "extra_income" in yearly:
+            cash_income = cash_income + yearly["extra_income"][..., y]
+        if "recurring_expenses" in yearly:
+            recurring = yearly["recurring_expenses"][..., y]
+        else:
+            recurring = (_arr(params["expenses_must"]) + _arr(params["expenses_optional"])) * 12 * factor
+        one_time = (_arr(params["one_time_must"]) if year == 1 else 0.0) + np.where(delayed_year == year, _arr(params["one_time_delayed"]) * factor, 0.0)
+        net = cash_income - recurring - one_time
+
+        # 3. Shortfall waterfall
+        need = np.maximum(-net, 0.0)
+        matured = year >= SCHEME_TENURE_YEARS
+        for index in order:
+            if index == SCHEMES and not matured:
+                continue
+            take = np.minimum(need, np.maximum(balances[..., index], 0.0))
+            balances[..., index] -= take
+            out["drawn_by_bucket"][..., y, index] = take
+            need = need - take
+
+        # 4. Surplus
+        surplus = np.maximum(net, 0.0)
+        if surplus_index is not None:
+            balances[..., surplus_index] += surplus
+
+        # 5. Scheme maturity
+        if year == SCHEME_TENURE_YEARS:
+            matured_amount = balances[..., SCHEMES].copy()
+            balances[..., NORMAL_FD] += matured_amount * share
+            balances[..., SR_FD] += matured_amount * (1.0 - share)
+            balances[..., SCHEMES] = 0.0
+
+        for key, value in (("cash_income", cash_income), ("swp_withdrawal", swp_withdrawal), ("fd_interest", fd_interest),
+                           ("scheme_interest", scheme_interest), ("recurring_expenses", recurring),
+                           ("one_time_expenses", one_time), ("net_cash_flow", net),
+                           ("drawn", out["drawn_by_bucket"][..., y, :].sum(axis=-1)),
+                           ("reinvested", surplus if surplus_index is not None else np.zeros_like(surplus)),
+                           ("unfunded", need)):
+            out[key][..., y] = value
+        out["balances"][..., y, :] = balances
+
+    out["total_corpus"] = out["balances"].sum(axis=-1)
+    return out
+
+
+def ledger_table(ledger):
+    """One row per year for a single (un-batched) ledger run."""
+    years = ledger["net_cash_flow"].shape[-1]
+    table = pd.DataFrame({
+        "Year": np.arange(1, years + 1),
+        "Cash Income": ledger["cash_income"],
+        "Recurring Expenses": ledger["recurring_expenses"],
+        "One-Time Expenses": ledger["one_time_expenses"],
+        "Net Cash Flow": ledger["net_cash_flow"],
+        "Drawn From Corpus": ledger["drawn"],
+        "Surplus Re-invested": ledger["reinvested"],
+        "Unfunded Shortfall": ledger["unfunded"],
+    })
+    for index, name in enumerate(BUCKETS):
+        table[BUCKET_LABELS[name]] = ledger["balances"][..., index]
+    table["Total Corpus"] = ledger["total_corpus"]
+    return table
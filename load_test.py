@@ -0,0 +1,333 @@
+# load_test.py
+#
+# Load test: how many concurrent sessions one node handles before rerun latency degrades.
+#
+# Drives app.py through streamlit.testing's AppTest: every session is its own AppTest (own
+# session state), driven from its own thread in this one process, so sessions share the
+# process-wide caches and the artifact store like real sessions on a node. Firebase /
+# Firestore, Gemini and the authenticator are replaced by local fakes before the app is
+# loaded; logged-in sessions are simply marked as authenticated.
+#
+# AppTest swaps process-global state around each run (the runtime instance, st.secrets),
+# so script runs are serialized by a lock. Reruns are CPU-bound Python, which the GIL
+# serializes on a real node too; "latency" includes the wait behind the other sessions,
+# like a user would see it, "service" is the rerun alone.
+#
+# Each session opens the app and then, round after round, visits every page; logged-in
+# sessions also change an input on the input pages. The report has latency percentiles
+# per action, process CPU time and RSS.
+#
+#   python load_test.py --guests 4 --users 4 --rounds 3 --json run.json
+#   python load_test.py --guests 4 --users 4 --baseline run.json   # exit 1 on regression
+#
+# Logged-in sessions save their plans as loadtest_<n>_user_data.json in the app directory;
+# those files are removed at the end. The cohort analytics of these saves go to a file in
+# the temp directory instead of the real COHORT_FILE.
+
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(APP_DIR, "app.py")
+USER_PREFIX = "loadtest_"
+COHORT_FILE = os.path.join(tempfile.gettempdir(), f"{USER_PREFIX}cohort_stats.json")
+PERCENTILES = (50, 90, 99)
+RERUN_TIMEOUT = 120
+# Pages with number inputs a logged-in session edits
+INPUT_PAGES = ("Capture Basic Data", "Capture Major One Time Expenses", "Capture Recurring Expenses")
+# Pages that call out to Gemini are left out
+SKIPPED_PAGES = ("AI Advisor",)
+# One script run at a time, see above
+RUN_LOCK = threading.Lock()
+
+
+# --- Fakes for the external services ---
+class FakeDocument:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def stream(self):
+        return [FakeDocument(doc_id, data) for doc_id, data in self.documents.items()]
+
+    def document(self, doc_id):
+        documents = self.documents
+        return types.SimpleNamespace(
+            set=lambda data: documents.__setitem__(doc_id, dict(data)),
+            update=lambda data: documents.setdefault(doc_id, {}).update(data))
+
+
+class FakeFirestore:
+    def __init__(self, users):
+        self.collections = {"users": FakeCollection(users)}
+
+    def collection(self, name):
+        return self.collections.setdefault(name, FakeCollection({}))
+
+
+class FakeAuthenticator:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def login(self, *args, **kwargs):
+        pass
+
+    def logout(self, *args, **kwargs):
+        pass
+
+    def register_user(self, *args, **kwargs):
+        return None, None, None
+
+
+class FakeGeminiModel:
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt):
+        return types.SimpleNamespace(text="Load test reply.")
+
+
+def fake_users(count):
+    return {f"{USER_PREFIX}{n}": {"email": f"{USER_PREFIX}{n}@example.com", "name": f"Load Test {n}", "password_hash": "",
+                                  "premium": n % 2 == 0, "onboarding_complete": True}
+            for n in range(count)}
+
+
+def install_fakes(users):
+    """Puts the fakes in sys.modules, where app.py's imports will find them."""
+    firebase = types.ModuleType("firebase_admin")
+    firebase._apps = {"[DEFAULT]": object()}  # already "initialized", so no credentials are read
+    firebase.credentials = types.ModuleType("firebase_admin.credentials")
+    firebase.firestore = types.ModuleType("firebase_admin.firestore")
+    store = FakeFirestore(users)
+    firebase.firestore.client = lambda: store
+
+    authenticator = types.ModuleType("streamlit_authenticator")
+    authenticator.Authenticate = FakeAuthenticator
+
+    try:
+        import google
+    except ImportError:
+        google = sys.modules["google"] = types.ModuleType("google")
+    gemini = types.ModuleType("google.generativeai")
+    gemini.configure = lambda **kwargs: None
+    gemini.GenerativeModel = FakeGeminiModel
+    google.generativeai = gemini
+
+    sys.modules.update({
+        "firebase_admin": firebase, "firebase_admin.credentials": firebase.credentials,
+        "firebase_admin.firestore": firebase.firestore, "streamlit_authenticator": authenticator,
+        "google.generativeai": gemini,
+    })
+
+
+# --- Sessions ---
+class Session:
+    """One simulated user: an AppTest plus the latencies of its reruns."""
+
+    def __init__(self, username=None, seed=0):
+        from streamlit.testing.v1 import AppTest
+
+        self.username = username
+        self.random = random.Random(seed)
+        self.timings = []  # (action, latency seconds, service seconds)
+        self.errors = []
+        self.app = AppTest.from_file(APP_FILE, default_timeout=RERUN_TIMEOUT)
+        self.app.secrets["GOOGLE_API_KEY"] = "load-test"
+        if username is None:
+            self.app.session_state.view = "demo"
+        else:
+            self.app.session_state.authentication_status = True
+            self.app.session_state.username = username
+            self.app.session_state.name = username
+
+    def timed(self, action, prepare):
+        """Runs the app after prepare() set up the interaction; prepare returns what to .run()."""
+        started = time.perf_counter()
+        try:
+            target = prepare()
+            with RUN_LOCK:
+                running = time.perf_counter()
+                target.run()
+        except Exception as e:
+            self.errors.append(f"{action}: {e!r}")
+            return
+        finished = time.perf_counter()
+        self.timings.append((action, finished - started, finished - running))
+        self.errors.extend(f"{action}: {exception.value}" for exception in self.app.exception)
+
+    def pages(self):
+        radio = self.app.sidebar.radio
+        return [page for page in radio[0].options if page not in SKIPPED_PAGES] if len(radio) else []
+
+    def visit(self, page):
+        self.timed("navigate", lambda: self.app.sidebar.radio[0].set_value(page))
+
+    def edit_input(self):
+        fields = [field for field in self.app.number_input if not field.disabled]
+        if not fields:
+            return
+        field = self.random.choice(fields)
+        value = field.value or 0
+        # A small change that stays within the field's bounds
+        new_value = value + (field.step or 1) if field.max is None or value + (field.step or 1) <= field.max else value - (field.step or 1)
+        self.timed("edit", lambda: field.set_value(type(value)(new_value)))
+        submit = [button for button in self.app.button if button.label == "Apply Changes"]
+        if submit:
+            self.timed("apply", lambda: submit[0].click())
+
+    def run(self, rounds):
+        self.timed("open", lambda: self.app)
+        for _ in range(rounds):
+            for page in self.pages():
+                self.visit(page)
+                if self.username is not None and page in INPUT_PAGES:
+                    self.edit_input()
+
+
+# --- Measurements ---
+def rss_bytes():
+    """Current resident set size (Linux), else the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def latency_stats(seconds):
+    values = np.asarray(seconds, dtype=float) * 1000.0
+    stats = {f"p{p}_ms": round(float(np.percentile(values, p)), 1) for p in PERCENTILES}
+    stats.update({"count": int(values.size), "max_ms": round(float(values.max()), 1)})
+    return stats
+
+
+def load_test(guests, users, rounds, seed=0):
+    install_fakes(fake_users(users))
+    os.chdir(APP_DIR)
+    os.environ["COHORT_FILE"] = COHORT_FILE
+    sessions = [Session(seed=seed + n) for n in range(guests)]
+    sessions += [Session(f"{USER_PREFIX}{n}", seed=seed + guests + n) for n in range(users)]
+
+    rss_before, cpu_before, started = rss_bytes(), time.process_time(), time.perf_counter()
+    threads = [threading.Thread(target=session.run, args=(rounds,), name=f"session-{n}") for n, session in enumerate(sessions)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for path in glob.glob(os.path.join(APP_DIR, f"{USER_PREFIX}*_user_data.json")) + glob.glob(f"{COHORT_FILE}*"):
+            os.remove(path)
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_before
+
+    timings = [timing for session in sessions for timing in session.timings]
+    report = {
+        "sessions": {"guests": guests, "users": users, "rounds": rounds},
+        "latency": {},
+        "service": {},
+        "wall_s": round(wall, 2),
+        "cpu_s": round(cpu, 2),
+        "cpu_utilization": round(cpu / wall, 2) if wall else 0.0,
+        "rss_mb": {"before": round(rss_before / 2**20, 1), "after": round(rss_bytes() / 2**20, 1),
+                   "peak": round(peak_rss_bytes() / 2**20, 1)},
+        "errors": sorted({error for session in sessions for error in session.errors}),
+    }
+    for column, measure in ((1, "latency"), (2, "service")):
+        if timings:
+            report[measure]["all"] = latency_stats([timing[column] for timing in timings])
+        for action in sorted({timing[0] for timing in timings}):
+            report[measure][action] = latency_stats([timing[column] for timing in timings if timing[0] == action])
+    return report
+
+
+def regressions(report, baseline, tolerance):
+    """Latency percentiles (and peak RSS) more than `tolerance` above the baseline."""
+    found = []
+    for measure in ("latency", "service"):
+        for action, stats in baseline.get(measure, {}).items():
+            for p in PERCENTILES:
+                key = f"p{p}_ms"
+                old, new = stats.get(key), report[measure].get(action, {}).get(key)
+                if old and new is not None and new > old * (1 + tolerance):
+                    found.append(f"{measure} {action} {key}: {old} -> {new}")
+    old, new = baseline.get("rss_mb", {}).get("peak"), report["rss_mb"]["peak"]
+    if old and new > old * (1 + tolerance):
+        found.append(f"peak RSS MB: {old} -> {new}")
+    return found
+
+
+def print_report(report):
+    print(f"Sessions: {report['sessions']['guests']} guest, {report['sessions']['users']} logged in, "
+          f"{report['sessions']['rounds']} round(s)")
+    for measure in ("latency", "service"):
+        print(f"{measure:<10}{'count':>7}" + "".join(f"{f'p{p} ms':>10}" for p in PERCENTILES) + f"{'max ms':>10}")
+        for action, stats in report[measure].items():
+            print(f"  {action:<8}{stats['count']:>7}" + "".join(f"{stats[f'p{p}_ms']:>10}" for p in PERCENTILES) + f"{stats['max_ms']:>10}")
+    print(f"Wall {report['wall_s']} s, CPU {report['cpu_s']} s ({report['cpu_utilization']:.0%} of one core)")
+    print(f"RSS {report['rss_mb']['before']} -> {report['rss_mb']['after']} MB (peak {report['rss_mb']['peak']} MB)")
+    for error in report["errors"]:
+        print("ERROR", error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of app.py.")
+    parser.add_argument("--guests", type=int, default=4, help="guest (demo) sessions")
+    parser.add_argument("--users", type=int, default=4, help="logged-in sessions")
+    parser.add_argument("--rounds", type=int, default=2, help="visits of every page per session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="report of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown over the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Deprecation notices from every session would bury the report
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    report = load_test(args.guests, args.users, args.rounds, args.seed)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = bool(report["errors"])
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("sessions") != report["sessions"]:
+            print("NOTE: the baseline ran a different session mix, so latencies are not comparable")
+        found = regressions(report, baseline, args.tolerance)
+        for line in found:
+            print("REGRESSION", line)
+        failed = failed or bool(found)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# mortality.py
+#
+# Survival-weighted view of a plan: instead of a fixed GLProjectionYears horizon, each
+# year's cash flow and shortfall counts with the chance of still being alive in it.
+#
+# life_table.csv holds q(x), the chance of dying within a year at age x, per gender
+# (Age, Male, Female). The bundled table is illustrative: a Gompertz-Makeham curve
+# calibrated to Indian life expectancy at 60 (about 17.5 years for men, 19.3 for women).
+# An official table (e.g. IALM 2012-14) in the same format can replace it, or be pointed
+# to with LIFE_TABLE_FILE.
+#
+# The table is read once per file version into cumulative log-survival arrays indexed by
+# age, so the chance to be alive k years from age a is one subtraction and exp(), looked
+# up for all years and scenarios at once with fancy indexing.
+
+import csv
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from ledger_engine import simulate_ledger, table_flows
+from projection_engine import plan_params
+
+BUNDLED_LIFE_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "life_table.csv")
+LIFE_TABLE_FILE = os.environ.get("LIFE_TABLE_FILE", BUNDLED_LIFE_TABLE)
+# Shown next to every survival figure while the bundled table is in use
+ILLUSTRATIVE_NOTE = ("Survival figures use an illustrative life table (a smooth curve matched to average Indian life "
+                     "expectancy at 60), not an official actuarial table. Treat them as rough guidance.")
+GENDERS = ("Male", "Female")
+# Other / unknown genders use the average of both columns
+UNISEX = len(GENDERS)
+
+
+class LifeTable:
+    """Survival lookups by age and gender over precomputed arrays."""
+
+    def __init__(self, ages, rates):
+        self.min_age, self.max_age = int(ages[0]), int(ages[-1])
+        qx = np.array([rates[gender] for gender in GENDERS] + [np.mean([rates[gender] for gender in GENDERS], axis=0)])
+        # log_survival[g, i]: log chance to reach age min_age + i from min_age; one more slot after max_age
+        with np.errstate(divide="ignore"):
+            steps = np.log1p(-np.clip(qx, 0.0, 1.0))
+        self.log_survival = np.concatenate([np.zeros((len(qx), 1)), np.cumsum(steps, axis=1)], axis=1)
+
+    def _positions(self, ages):
+        # Ages outside the table use its first / last row; nobody survives past max_age
+        return np.clip(np.rint(np.asarray(ages, dtype=float)).astype(int) - self.min_age, 0, self.max_age - self.min_age)
+
+    def survival(self, ages, genders, years):
+        """(..., years + 1) chance to be alive k = 0..years years from now, for (...) ages and genders."""
+        start = self._positions(ages)[..., None]
+        rows = gender_index(genders)[..., None]
+        reached = np.minimum(start + np.arange(years + 1), self.log_survival.shape[1] - 1)
+        return np.exp(self.log_survival[rows, reached] - self.log_survival[rows, start])
+
+    def life_expectancy(self, ages, genders):
+        """Expected remaining years of life (curtate + half a year)."""
+        return self.survival(ages, genders, self.max_age - self.min_age + 1)[..., 1:].sum(axis=-1) + 0.5
+
+
+def gender_index(genders):
+    genders = np.asarray(genders, dtype=object)
+    index = np.full(genders.shape, UNISEX)
+    for position, gender in enumerate(GENDERS):
+        index[genders == gender] = position
+    return index
+
+
+def read_table(path):
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    ages = np.array([int(row["Age"]) for row in rows])
+    if np.any(np.diff(ages) != 1):
+        raise ValueError(f"{os.path.basename(path)} must have one row per age, in order")
+    return ages, {gender: np.array([float(row[gender]) for row in rows]) for gender in GENDERS}
+
+
+@lru_cache(maxsize=4)
+def _load(path, mtime):
+    return LifeTable(*read_table(path))
+
+
+def life_table_note(path=LIFE_TABLE_FILE):
+    """ILLUSTRATIVE_NOTE for the bundled table, None for a table of your own."""
+    return ILLUSTRATIVE_NOTE if os.path.abspath(path) == BUNDLED_LIFE_TABLE else None
+
+
+def load_life_table(path=LIFE_TABLE_FILE):
+    """The table at `path`, re-read only when the file changes."""
+    return _load(path, os.path.getmtime(path))
+
+
+def weighted_outcomes(table, ages, genders, unfunded, horizons=None):
+    """
+    Survival-weighted results for (...) plans with (..., Y) yearly unfunded shortfalls.
+    A year counts with the chance to be alive at its start; years past a plan's own horizon
+    (`horizons`, default Y) don't count. Returns (..., Y) "weights" and (...) arrays:
+    "expected_shortfall", "outlive_probability" (alive when the corpus first falls short)
+    and "alive_at_end" (alive after the plan's last year).
+    """
+    unfunded = np.asarray(unfunded, dtype=float)
+    years = unfunded.shape[-1]
+    horizons = np.full(unfunded.shape[:-1], years) if horizons is None else np.asarray(horizons)
+    survival = table.survival(ages, genders, years)
+    in_plan = np.arange(years) < horizons[..., None]
+    weights = survival[..., :-1] * in_plan
+
+    short = (unfunded > 0.5) & in_plan
+    first_gap = short.argmax(axis=-1)
+    outlive = np.where(short.any(axis=-1), np.take_along_axis(weights, first_gap[..., None], axis=-1)[..., 0], 0.0)
+    return {
+        "weights": weights,
+        "expected_shortfall": (weights * unfunded).sum(axis=-1),
+        "outlive_probability": outlive,
+        "alive_at_end": np.take_along_axis(survival, horizons[..., None], axis=-1)[..., 0],
+    }
+
+
+def scenario_outcomes(table, projections):
+    """
+    weighted_outcomes() for several projected plans (e.g. scenarios) at once, given as
+    (projection table, evaluated context) pairs: their ledger parameters are stacked into
+    (plans,) arrays and run through one simulate_ledger() call.
+    """
+    contexts = [context for _, context in projections]
+    params = [plan_params(context) for context in contexts]
+    horizons = np.array([int(p["years"]) for p in params])
+    stacked = {key: np.array([float(p[key]) for p in params]) for key in params[0] if key != "years"}
+    # Yearly flows are padded to the longest horizon; years past a plan's own don't count
+    flows = [table_flows(df) for df, _ in projections]
+    for key in flows[0]:
+        stacked[key] = np.array([np.pad(flow[key], (0, horizons.max() - flow[key].size)) for flow in flows])
+    ledger = simulate_ledger(stacked, int(horizons.max()))
+    ages = [context.get("GLAge", {}).get("input", 0) for context in contexts]
+    genders = [context.get("GLGender", {}).get("input", "") for context in contexts]
+    return weighted_outcomes(table, ages, genders, ledger["unfunded"], horizons)
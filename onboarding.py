@@ -0,0 +1,82 @@
+# onboarding.py
+#
+# Seeds a complete first plan from the three onboarding answers: age, corpus and monthly
+# expenses.
+#
+# Rates, tax settings and scheme limits keep their config defaults. Everything personal
+# (extra income, one-time expenses) starts at zero, and the rest is derived with simple
+# rules of thumb:
+# - the corpus is taken as PF accumulation and split between SWP and deposits by age
+# - Sr Citizen FDs and SCSS only from 60 on; SCSS / POMIS get a slice of the deposits, up
+#   to their single-account limits
+# - the monthly expenses are spread over the "must" categories in the proportions of the
+#   default plan
+# - the SWP withdrawal is a fixed share of the SWP corpus and the plan runs to age 85 (or
+#   as far as the account allows)
+
+from config_registry import INPUT_DEFAULTS, RECURRING_EXPENSE_FIELDS
+from projection_engine import MUST_EXPENSE_FIELDS
+
+SENIOR_CITIZEN_AGE = 60
+PLAN_TO_AGE = 85
+MIN_PROJECTION_YEARS = 10
+# SWP share of the corpus is (100 - age)%, kept within these limits
+SWP_SHARE_LIMITS = (20.0, 60.0)
+# Yearly SWP withdrawal as a share of the SWP corpus
+SWP_WITHDRAWAL_RATE = 0.06
+# Slices of the deposit money placed in SCSS / POMIS (capped at the single limits)
+SCSS_SHARE = 0.4
+POMIS_SHARE = 0.15
+# Deposit split (% Normal FD) below and from the senior citizen age
+NORMAL_FD_PERCENT = {False: 100.0, True: 10.0}
+
+# Inputs that only make sense for the default sample person
+PERSONAL_FIELDS = (
+    "GLCurrentMonthlyRental", "GLMaxMonthlyRental", "GLAnnuityExistingMonthly", "GLAnnuityNew",
+    "GLPensionEPS", "GLDividendIncome", "GLPPFAccumulation", "GLSuperannuation",
+    "GLAgricultureIncome", "GLTradingIncome", "GLRealStateIncome", "GLConsultingIncome",
+    "LocalKidsEducation", "LocalHouseRenovation", "LocalVehicleRenewal", "LocalJewelry",
+    "LocalTravelForeign", "LocalOthers", "LocalMarriages", "LocalProperty",
+)
+
+
+def split_expenses(monthly_expenses):
+    """Spreads a monthly total over the must-have categories like the default plan does."""
+    weights = {name: float(INPUT_DEFAULTS[name]) for name in MUST_EXPENSE_FIELDS}
+    total_weight = sum(weights.values())
+    split = {name: round(monthly_expenses * weight / total_weight) for name, weight in weights.items()}
+    # Rounding leftovers go to the largest category, so the parts add up to the total
+    largest = max(weights, key=weights.get)
+    split[largest] += round(monthly_expenses) - sum(split.values())
+    return split
+
+
+def seed_plan_inputs(age, corpus, monthly_expenses, max_years=None):
+    """
+    {FieldName: value} for every input field of a plan built from the onboarding answers.
+    Projection years are capped at `max_years` when given (free accounts).
+    """
+    age, corpus, monthly_expenses = int(age), float(corpus), float(monthly_expenses)
+    senior = age >= SENIOR_CITIZEN_AGE
+    inputs = dict(INPUT_DEFAULTS)
+    inputs.update({name: 0 for name in PERSONAL_FIELDS})
+    inputs.update({name: 0 for name in RECURRING_EXPENSE_FIELDS})
+    inputs.update(split_expenses(monthly_expenses))
+    years = max(PLAN_TO_AGE - age, MIN_PROJECTION_YEARS)
+
+    low, high = SWP_SHARE_LIMITS
+    swp_percent = min(max(100.0 - age, low), high)
+    deposits = corpus * (100.0 - swp_percent) / 100.0
+    inputs.update({
+        "GLAge": age,
+        "GLProjectionYears": years if max_years is None else min(years, max_years),
+        "GLPFAccumulation": corpus,
+        "GLSWPInvestmentPercentage": swp_percent,
+        "GLNonSWPInvestmentPercentage": 100.0 - swp_percent,
+        "GLNormalFDExcludingPOMISSCSS": NORMAL_FD_PERCENT[senior],
+        "GLSrCitizenFDExcludingPOMISSCSS": 100.0 - NORMAL_FD_PERCENT[senior],
+        "GLSCSSSingle": round(min(deposits * SCSS_SHARE, INPUT_DEFAULTS["GLSCSSSingle"])) if senior else 0,
+        "GLPOMISSingle": round(min(deposits * POMIS_SHARE, INPUT_DEFAULTS["GLPOMISSingle"])),
+        "GLSWPMonthlyWithdrawal": round(corpus * swp_percent / 100.0 * SWP_WITHDRAWAL_RATE / 12),
+    })
+    return inputs
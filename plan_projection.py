@@ -0,0 +1,165 @@
+# plan_projection.py
+#
+# Formula evaluation and the yearly projection loop, without any Streamlit code, so the
+# app and the HTTP API (api_server.py) run the exact same projection.
+#
+# Every function takes the formula evaluator as a parameter: the app passes
+# eval_formula_with_debug, which shows formula errors on the page; everything else uses
+# evaluate_formula() as is. prepare_plan() turns a stored plan (the user_data file format)
+# into an evaluated PlanState outside the app, for the API and cohort_analytics.py.
+
+import math
+
+import pandas as pd
+
+from config_registry import (
+    clean_formula, VARIABLE_PATTERN, FIELD_MAP, INPUT_DEFAULTS, INPUT_FORMULA_ORDER, INVESTMENT_FORMULA_ORDER, RECURRING_EXPENSE_FIELDS,
+)
+from plan_state import PlanState
+from rate_table import link_legacy_rates, load_rate_table, resolve_rates
+from projection_engine import MONTHS_PER_YEAR, growth_factors, plan_params, monthly_projection_table
+from tax_engine import add_tax_columns
+from ladder_model import custom_ladder, ladder_income
+from custom_fields import add_custom_columns
+
+FORMULA_BUILTINS = {"math": math, "min": min, "max": max}
+
+
+def evaluate_formula(formula, data_context, field_name, on_error=None):
+    """Value of a config formula over the plan's inputs; 0 (reported to `on_error`) if it fails."""
+    expression = clean_formula(formula)
+    def replacer(match):
+        val = data_context.get(match.group(1), {}).get("input", 0)
+        try:
+            return str(float(val))
+        except (ValueError, TypeError):
+            return "0"
+    expression = VARIABLE_PATTERN.sub(replacer, expression)
+    try:
+        return eval(expression, {"__builtins__": FORMULA_BUILTINS}, {})
+    except Exception as e:
+        if on_error is not None:
+            on_error(f"ERROR in `{field_name}` ({expression}): {e}")
+        return 0
+
+
+def evaluate_input_formulas(data_context, evaluate=evaluate_formula):
+    """Input-page formula fields (totals), in dependency order so totals see fresh sub-totals."""
+    for key in INPUT_FORMULA_ORDER:
+        value = evaluate(FIELD_MAP[key]['Field Default Value'], data_context, key)
+        if key not in data_context:
+            data_context[key] = {}
+        data_context[key]['input'] = value
+    return data_context
+
+
+def prepare_plan(data):
+    """A stored plan as the app would load it: defaults filled in, rates resolved, totals evaluated."""
+    plan = PlanState.from_dict({key: {"input": value} for key, value in INPUT_DEFAULTS.items()})
+    for name, entry in data.items():
+        plan[name] = entry
+    link_legacy_rates(plan)
+    resolve_rates(plan, load_rate_table())
+    return evaluate_input_formulas(plan)
+
+
+def evaluate_investment_formulas(calc_context, evaluate=evaluate_formula):
+    """
+    Investment Plan formula fields. Values the yearly loop already calculated (source
+    "manual") are NOT overwritten.
+    """
+    for varname in INVESTMENT_FORMULA_ORDER:
+        if varname in calc_context and "manual" in calc_context[varname].get("source", ""):
+            continue
+        value = evaluate(FIELD_MAP[varname]["Field Value"], calc_context, varname)
+        if varname not in calc_context:
+            calc_context[varname] = {}
+        calc_context[varname]["input"] = value
+    return calc_context
+
+
+def project_plan(plan, monthly_resolution=False, evaluate=evaluate_formula):
+    """
+    Runs the full financial projection for a plan with evaluated input totals. Returns
+    (yearly DataFrame, evaluated base context), or (None, None) without projection years.
+    The monthly engine only knows the default deposit ladder, so a plan with a custom
+    ladder is always projected year by year.
+    """
+    projection_years = int(plan.get("GLProjectionYears", {}).get("input", 1))
+    if projection_years <= 0:
+        return None, None
+
+    base_context = plan.copy()
+    evaluate_investment_formulas(base_context, evaluate)
+
+    # Optional month-by-month engine (monthly SWP/POMIS payouts, quarterly SCSS, mid-year inflation steps)
+    if monthly_resolution and not custom_ladder(base_context):
+        table = add_custom_columns(monthly_projection_table(base_context, projection_years), base_context)
+        return add_tax_columns(table, base_context), base_context
+    
+    # --- Get all base values needed for the loop ---
+    inflation_rate = base_context.get("GLInflationRate", {}).get("input", 0) / 100.0
+    base_monthly_rental = base_context.get("GLCurrentMonthlyRental", {}).get("input", 0)
+    max_monthly_rental = base_context.get("GLMaxMonthlyRental", {}).get("input", 0)
+    base_recurring_expenses = {var: base_context.get(var, {}).get('input', 0) for var in RECURRING_EXPENSE_FIELDS}
+    
+    # FD / SCSS / POMIS income for every year from the deposit ladder (maturities, renewals, rollovers)
+    deposit_income = ladder_income(plan_params(base_context), projection_years, custom_ladder(base_context))
+    
+    swp_monthly_rate = base_context.get("LocalSWPMonthlyRate", {}).get("input", 0)
+    swp_monthly_withdrawal = base_context.get("GLSWPMonthlyWithdrawal", {}).get("input", 0)
+
+    # Shared factor tables instead of a pow() per field and year: inflation_index[year - 1]
+    # is (1 + inflation) ** (year - 1), swp_yearly_growth is (1 + monthly rate) ** 12 - 1
+    inflation_index = growth_factors(inflation_rate, projection_years)
+    swp_yearly_growth = growth_factors(swp_monthly_rate, MONTHS_PER_YEAR)[-1] - 1
+    
+    all_years_data = []
+    swp_corpus = base_context.get("LocalSWPInvestAmount", {}).get("input", 0)
+
+    for year in range(1, projection_years + 1):
+        calc_context = base_context.copy()
+        
+        yearly_interest = swp_corpus * swp_yearly_growth
+        yearly_withdrawal = swp_monthly_withdrawal * 12
+        ending_balance = swp_corpus + yearly_interest - yearly_withdrawal
+        
+        calc_context["LocalSWPInvestAmount"] = {"input": swp_corpus, "source": "manual"}
+        calc_context["LocalSWPYearlyInterest"] = {"input": yearly_interest, "source": "manual"}
+        calc_context["LocalSWPYearlyWithdrawal"] = {"input": yearly_withdrawal, "source": "manual"}
+        calc_context["LocalSWPBalancePostWithdrawal"] = {"input": ending_balance, "source": "manual"}
+        calc_context["GLSWPCorpusStatus"] = {"input": ending_balance - swp_corpus, "source": "manual"}
+        
+        # Inflate recurring expenses
+        inflation_factor = inflation_index[year - 1]
+        for varname, base_value in base_recurring_expenses.items():
+            calc_context[varname] = {"input": base_value * inflation_factor, "source": "manual"}
+        
+        # ** THE FIX - Part 1: Explicitly calculate expense totals for the year **
+        must_formula = FIELD_MAP["GLTotalYearlyExpensesMust"]["Field Input"]
+        optional_formula = FIELD_MAP["GLTotalYearlyExpensesOptional"]["Field Input"]
+        total_must_val = evaluate(must_formula, calc_context, "GLTotalYearlyExpensesMust")
+        total_opt_val = evaluate(optional_formula, calc_context, "GLTotalYearlyExpensesOptional")
+        calc_context["GLTotalYearlyExpensesMust"] = {"input": total_must_val, "source": "manual"}
+        calc_context["GLTotalYearlyExpensesOptional"] = {"input": total_opt_val, "source": "manual"}
+        
+        # Inflate rental income
+        inflated_monthly_rental = base_monthly_rental * inflation_factor
+        calc_context["LocalRentalIncome"] = {"input": min(inflated_monthly_rental, max_monthly_rental) * 12, "source": "manual"}
+
+        for varname, values in deposit_income.items():
+            calc_context[varname] = {"input": float(values[year - 1]), "source": "manual"}
+
+        evaluate_investment_formulas(calc_context, evaluate)
+        
+        # ** THE FIX - Part 2: Collect all relevant data for the year **
+        year_data = {"Year": year}
+        year_data.update(calc_context.inputs())
+        all_years_data.append(year_data)
+        
+        swp_corpus = ending_balance
+    
+    df_out = pd.DataFrame(all_years_data) if all_years_data else pd.DataFrame()
+    # User-defined lines, all years at once (see custom_fields.py)
+    df_out = add_custom_columns(df_out, base_context)
+    return add_tax_columns(df_out, base_context), base_context
@@ -0,0 +1,255 @@
+# plan_state.py
+#
+# Compact, array-backed storage for a user's plan.
+#
+# The app historically kept user_data as {"FieldName": {"input": value, "source": ...}}.
+# PlanState keeps the same mapping interface, so existing code such as
+# user_data.get("GLAge", {}).get("input", 0) or calc_context[name]["input"] = value
+# keeps working, but numeric inputs live in a single float64 array indexed by the
+# shared config registry. Copying, hashing and vectorized evaluation are then cheap.
+# Inputs stored as ints come back as ints, so a saved plan keeps 58 rather than 58.0.
+
+import hashlib
+import json
+from collections.abc import MutableMapping
+from numbers import Integral, Real
+
+import numpy as np
+
+from config_registry import FIELD_NAMES, FIELD_INDEX, FIELDS_BY_CONFIG, FORMULAS, formulas_affected_by
+
+_INVESTMENT_FIELDS = frozenset(FIELDS_BY_CONFIG["investment"])
+
+
+def _is_numeric(value):
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+class FieldView(MutableMapping):
+    """A live {"input": ..., "source": ...} view of one field inside a PlanState."""
+
+    __slots__ = ("_state", "_name")
+
+    def __init__(self, state, name):
+        self._state = state
+        self._name = name
+
+    def __getitem__(self, key):
+        if key == "input":
+            if not self._state._has_input(self._name):
+                raise KeyError(key)
+            return self._state.get_input(self._name)
+        return self._state._meta[self._name][key]
+
+    def __setitem__(self, key, value):
+        if key == "input":
+            self._state.set_input(self._name, value)
+        else:
+            self._state._meta.setdefault(self._name, {})[key] = value
+
+    def __delitem__(self, key):
+        if key == "input":
+            self._state._clear_input(self._name)
+        else:
+            del self._state._meta[self._name][key]
+
+    def __iter__(self):
+        if self._state._has_input(self._name):
+            yield "input"
+        yield from self._state._meta.get(self._name, {})
+
+    def __len__(self):
+        return int(self._state._has_input(self._name)) + len(self._state._meta.get(self._name, {}))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class PlanState(MutableMapping):
+    """
+    Mapping-compatible plan storage.
+
+    - numeric inputs: float64 array, one slot per registry field (plus a flag for ints)
+    - non-numeric inputs (e.g. GLGender): small side table
+    - per-field extras such as "source" or "default": small side table
+    - fields unknown to the registry are kept verbatim
+    """
+
+    __slots__ = ("_values", "_present", "_ints", "_objects", "_meta", "_extra")
+
+    def __init__(self):
+        self._values = np.full(len(FIELD_NAMES), np.nan)
+        self._present = np.zeros(len(FIELD_NAMES), dtype=bool)
+        self._ints = np.zeros(len(FIELD_NAMES), dtype=bool)
+        self._objects = {}
+        self._meta = {}
+        self._extra = {}
+
+    # --- Construction / serialization ---
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        for name, entry in data.items():
+            state[name] = entry
+        return state
+
+    def to_dict(self):
+        """Plain JSON-serializable dict in the historical user_data file format."""
+        out = {}
+        for name in self:
+            if name in self._extra:
+                out[name] = dict(self._extra[name])
+                continue
+            entry = dict(self._meta.get(name, {}))
+            if self._has_input(name):
+                entry["input"] = self.get_input(name)
+            out[name] = entry
+        return out
+
+    def copy(self):
+        clone = PlanState.__new__(PlanState)
+        clone._values = self._values.copy()
+        clone._present = self._present.copy()
+        clone._ints = self._ints.copy()
+        clone._objects = dict(self._objects)
+        clone._meta = {name: dict(entry) for name, entry in self._meta.items()}
+        clone._extra = {name: dict(entry) for name, entry in self._extra.items()}
+        return clone
+
+    def content_hash(self):
+        """Stable digest of the plan's inputs, usable as a cache key."""
+        digest = hashlib.sha1()
+        digest.update(self._present.tobytes())
+        digest.update(np.where(self._present, self._values, 0.0).tobytes())
+        digest.update(json.dumps(self._objects, sort_keys=True, default=str).encode())
+        # Sources matter too: a "manual" field is not re-evaluated from its formula
+        digest.update(json.dumps(self._meta, sort_keys=True, default=str).encode())
+        digest.update(json.dumps(self._extra, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    # --- Input access ---
+    def get_input(self, name, default=0):
+        index = FIELD_INDEX.get(name)
+        if index is None:
+            return self._extra.get(name, {}).get("input", default)
+        if name in self._objects:
+            return self._objects[name]
+        if self._present[index]:
+            return self._number(index)
+        return default
+
+    def set_input(self, name, value, source=None):
+        index = FIELD_INDEX.get(name)
+        if index is None:
+            self._extra.setdefault(name, {})["input"] = value
+        elif _is_numeric(value):
+            self._values[index] = value
+            self._present[index] = True
+            self._ints[index] = isinstance(value, Integral)
+            self._objects.pop(name, None)
+        else:
+            self._values[index] = np.nan
+            self._present[index] = True
+            self._ints[index] = False
+            self._objects[name] = value
+        if source is not None:
+            self._meta.setdefault(name, {})["source"] = source
+        elif index is not None and self._meta.get(name) == {}:
+            # {} only marked the field as present (context[name] = {} before setting
+            # its input); keeping it would make the hash differ from {"input": value}
+            del self._meta[name]
+
+    def inputs(self):
+        """{name: input} for every field that has an input, without building per-field views."""
+        out = {FIELD_NAMES[i]: self._number(i) for i in np.flatnonzero(self._present)}
+        out.update(self._objects)
+        out.update({name: entry["input"] for name, entry in self._extra.items() if "input" in entry})
+        return out
+
+    def vector(self, names, default=0.0):
+        """float64 vector of the given numeric fields, in the given order."""
+        indexes = np.fromiter((FIELD_INDEX[name] for name in names), dtype=np.intp, count=len(names))
+        values = self._values[indexes]
+        return np.where(self._present[indexes] & ~np.isnan(values), values, default)
+
+    def refresh_formulas(self, changed, evaluate):
+        """
+        Re-evaluates the input-page formula fields (totals) that depend on the `changed`
+        fields, in dependency order. `evaluate(formula, context, field_name)` is the app's
+        formula evaluator. Investment Plan formulas are left to the projection.
+        """
+        for name in formulas_affected_by(frozenset(changed)):
+            if name not in _INVESTMENT_FIELDS:
+                self.set_input(name, evaluate(FORMULAS[name], self, name))
+
+    def _number(self, index):
+        value = self._values[index]
+        return int(value) if self._ints[index] else float(value)
+
+    def _has_input(self, name):
+        index = FIELD_INDEX.get(name)
+        if index is None:
+            return "input" in self._extra.get(name, {})
+        return bool(self._present[index])
+
+    def _clear_input(self, name):
+        index = FIELD_INDEX.get(name)
+        if index is None:
+            self._extra.get(name, {}).pop("input", None)
+            return
+        self._values[index] = np.nan
+        self._present[index] = False
+        self._ints[index] = False
+        self._objects.pop(name, None)
+
+    # --- Mapping protocol ---
+    def __getitem__(self, name):
+        if name in self._extra:
+            return self._extra[name]
+        if name not in FIELD_INDEX or not (self._has_input(name) or name in self._meta):
+            raise KeyError(name)
+        return FieldView(self, name)
+
+    def __setitem__(self, name, entry):
+        if name not in FIELD_INDEX:
+            self._extra[name] = dict(entry)
+            return
+        self._clear_input(name)
+        self._meta.pop(name, None)
+        entry = dict(entry)
+        if "input" in entry:
+            self.set_input(name, entry.pop("input"))
+        if entry or not self._has_input(name):
+            # An empty entry still marks the field as present, like {} in a plain dict
+            self._meta[name] = entry
+
+    def __delitem__(self, name):
+        if name in self._extra:
+            del self._extra[name]
+            return
+        if name not in self:
+            raise KeyError(name)
+        self._clear_input(name)
+        self._meta.pop(name, None)
+
+    def __contains__(self, name):
+        if name in self._extra:
+            return True
+        return name in FIELD_INDEX and (self._has_input(name) or name in self._meta)
+
+    def __iter__(self):
+        for i in np.flatnonzero(self._present | self._meta_mask()):
+            yield FIELD_NAMES[i]
+        yield from self._extra
+
+    def __len__(self):
+        return int(np.count_nonzero(self._present | self._meta_mask())) + len(self._extra)
+
+    def _meta_mask(self):
+        mask = np.zeros(len(FIELD_NAMES), dtype=bool)
+        if self._meta:
+            mask[[FIELD_INDEX[name] for name in self._meta]] = True
+        return mask
+
+    def __repr__(self):
+        return f"PlanState({len(self)} fields)"
@@ -0,0 +1,40 @@
+# plan_store.py
+#
+# Central per-session store for the plan being edited.
+#
+# The plan is loaded (and its totals evaluated) once per session and kept in
+# st.session_state. Full reruns and the fragment reruns of the input sections work on the
+# same PlanState object, so a section can update a field, refresh the totals that depend
+# on it and save, without rerunning the whole script. An `on_save(plan)` callback runs
+# after every save (the app uses it to update the cohort analytics).
+
+import json
+
+import streamlit as st
+
+from rate_table import stored_plan
+
+STORE_KEY = "plan_store"
+
+
+def open_plan(path, loader, read_only=False, on_save=None):
+    """The session's plan stored at `path`, loaded with `loader()` the first time."""
+    store = st.session_state.get(STORE_KEY)
+    if store is None or store["path"] != path:
+        store = {"path": path, "plan": loader(), "read_only": read_only, "on_save": on_save}
+        st.session_state[STORE_KEY] = store
+    return store["plan"]
+
+
+def save_plan():
+    store = st.session_state.get(STORE_KEY)
+    if store and not store["read_only"]:
+        with open(store["path"], "w") as f:
+            json.dump(stored_plan(store["plan"]), f, indent=2)
+        if store.get("on_save"):
+            store["on_save"](store["plan"])
+
+
+def close_plan():
+    """Drops the session's plan, so the next run loads it again from its file."""
+    st.session_state.pop(STORE_KEY, None)
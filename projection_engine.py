@@ -0,0 +1,228 @@
+# projection_engine.py
+#
+# Array-based projection engines that work alongside calculate_projections() in app.py.
+#
+# plan_params() turns an evaluated plan context (user inputs + Investment Plan formulas)
+# into plain numbers; the engines then work on NumPy arrays only. Every parameter may
+# be a scalar or an array of shape (batch,), in which case all outputs gain a leading
+# batch axis, so many plans or variants can be evaluated in one pass.
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from config_registry import FORMULA_DEPS, INPUT_DEFAULTS, RECURRING_EXPENSE_FIELDS
+
+MONTHS_PER_YEAR = 12
+# SCSS and POMIS run for five years; afterwards the FD fund is re-invested in Sr Citizen FDs
+SCHEME_TENURE_YEARS = 5
+
+# Income fields that stay constant every year of the plan
+STATIC_INCOME_FIELDS = (
+    "LocalDividentIncome", "LocalAgricultureIncome", "LocalAnnuityExisting", "LocalAnnuityNew",
+    "LocalPensionEPS", "LocalTradingIncome", "LocalRealStateIncome", "LocalConsultingIncome",
+)
+MUST_EXPENSE_FIELDS = FORMULA_DEPS["GLTotalYearlyExpensesMust"]
+OPTIONAL_EXPENSE_FIELDS = FORMULA_DEPS["GLTotalYearlyExpensesOptional"]
+
+
+def _input(context, name, default=0):
+    value = context.get(name, {}).get("input", default)
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def plan_params(context):
+    """
+    Extracts the numbers the projection engines need from an evaluated plan context
+    (i.e. after store_and_eval_all_variables has filled in the Investment Plan fields).
+    """
+    return {
+        "years": int(_input(context, "GLProjectionYears")),
+        "inflation_rate": _input(context, "GLInflationRate") / 100.0,
+        "monthly_rental": _input(context, "GLCurrentMonthlyRental"),
+        "max_monthly_rental": _input(context, "GLMaxMonthlyRental"),
+        "expenses_must": sum(_input(context, name) for name in MUST_EXPENSE_FIELDS),
+        "expenses_optional": sum(_input(context, name) for name in OPTIONAL_EXPENSE_FIELDS),
+        "fd_fund": _input(context, "LocalFDInvestmentFund"),
+        "scss_amount": _input(context, "LocalSCSSAmount"),
+        "pomis_amount": _input(context, "LocalPOMISAmount"),
+        "normal_fd_share": _input(context, "LocalNormalFDPercent") / 100.0,
+        "normal_fd_rate": _input(context, "GLNormalFDRate") / 100.0,
+        "sr_fd_rate": _input(context, "GLSrCitizenFDRate") / 100.0,
+        "pomis_rate": _input(context, "GLPOMISRate") / 100.0,
+        "scss_rate": _input(context, "GLSCSSRate") / 100.0,
+        "swp_corpus": _input(context, "LocalSWPInvestAmount"),
+        "swp_monthly_rate": _input(context, "LocalSWPMonthlyRate"),
+        "swp_monthly_withdrawal": _input(context, "GLSWPMonthlyWithdrawal"),
+        "other_income": sum(_input(context, name) for name in STATIC_INCOME_FIELDS),
+        "one_time_must": _input(context, "LocalTotalOneTimeMust"),
+        "one_time_delayed": _input(context, "LocalTotalOneTimeDelayed"),
+        "delayed_expense_year": _input(context, "GLDelayedExpensesYear", INPUT_DEFAULTS["GLDelayedExpensesYear"]),
+    }
+
+
+def _col(value):
+    # Scalars and (batch,) arrays become (..., 1) so they broadcast against the time axis
+    return np.asarray(value, dtype=float)[..., None]
+
+
+@lru_cache(maxsize=256)
+def _factor_table(rate, periods, periods_per_year):
+    factors = _cumulative_factors(np.asarray(rate), periods, periods_per_year)
+    factors.setflags(write=False)
+    return factors
+
+
+def _cumulative_factors(rate, periods, periods_per_year):
+    step = (1.0 + rate[..., None]) ** (1.0 / periods_per_year)
+    steps = np.broadcast_to(step, rate.shape + (periods,))
+    return np.concatenate([np.ones(rate.shape + (1,)), np.cumprod(steps, axis=-1)], axis=-1)
+
+
+def growth_factors(rate, periods, periods_per_year=1):
+    """
+    Cumulative growth factors (1 + rate) ** (k / periods_per_year) for k = 0..periods, as a
+    (..., periods + 1) array built with one cumprod: inflation indexes (rate per year, one
+    period per year) or compounding (monthly rate, periods_per_year=1 and periods=12).
+
+    Tables for scalar rates are cached per (rate, periods) and shared (read-only) by every
+    expense line, year, page and scenario of the process; (batch,) rates are built on the fly.
+    """
+    if np.ndim(rate) == 0:
+        return _factor_table(float(rate), int(periods), float(periods_per_year))
+    return _cumulative_factors(np.asarray(rate, dtype=float), int(periods), float(periods_per_year))
+
+
+def swp_balances(corpus, monthly_rates, monthly_withdrawals):
+    """
+    Vectorized SWP account: each month the balance grows by that month's rate, then the
+    withdrawal is paid. Rates and withdrawals are (..., T) arrays (rates may vary month to
+    month). Once the corpus is exhausted the final withdrawal is whatever is left and the
+    account stays at zero.
+
+    Returns (opening balance, growth, withdrawal, closing balance), each (..., T).
+    """
+    rates, withdrawals = np.broadcast_arrays(np.asarray(monthly_rates, float), np.asarray(monthly_withdrawals, float))
+    corpus = _col(corpus)
+    growth_index = np.cumprod(1.0 + rates, axis=-1)
+    # Closed form of B[m] = B[m-1] * (1 + r[m]) - W[m]
+    closing = growth_index * (corpus - np.cumsum(withdrawals / growth_index, axis=-1))
+    exhausted = np.cumsum(closing < 0, axis=-1) > 0
+    closing = np.where(exhausted, 0.0, closing)
+    opening = np.concatenate([np.broadcast_to(corpus, closing.shape[:-1] + (1,)), closing[..., :-1]], axis=-1)
+    growth = opening * rates
+    withdrawn = np.where(exhausted, opening + growth, withdrawals)
+    return opening, growth, withdrawn, closing
+
+
+def simulate_monthly(params, years=None, inflation_step_months=6, swp_monthly_rates=None):
+    """
+    Month-by-month cash flows for a plan.
+
+    - SWP withdrawals are paid monthly out of a corpus compounding monthly
+    - POMIS pays interest monthly, SCSS quarterly, both for SCHEME_TENURE_YEARS
+    - FD interest is paid monthly on the same split as the yearly projection
+    - expenses and rent step up with inflation every `inflation_step_months` months
+      (6 = a mid-year step; 12 reproduces the once-a-year step of the yearly table)
+
+    `swp_monthly_rates` optionally overrides the constant SWP rate with a (..., T) path.
+    Returns a dict of (..., T) arrays.
+    """
+    years = int(params["years"] if years is None else years)
+    months = np.arange(years * MONTHS_PER_YEAR)
+    in_scheme = months < SCHEME_TENURE_YEARS * MONTHS_PER_YEAR
+    quarter_end = (months + 1) % 3 == 0
+
+    # --- Inflation index: one step every `inflation_step_months`, at the annual rate ---
+    steps = months // inflation_step_months
+    inflation = growth_factors(params["inflation_rate"], int(steps[-1]) if len(steps) else 0,
+                               MONTHS_PER_YEAR / inflation_step_months)[..., steps]
+
+    # --- SWP ---
+    rates = _col(params["swp_monthly_rate"]) if swp_monthly_rates is None else np.asarray(swp_monthly_rates, float)
+    rates, withdrawals, _ = np.broadcast_arrays(rates, _col(params["swp_monthly_withdrawal"]), months)
+    opening, growth, withdrawn, closing = swp_balances(params["swp_corpus"], rates, withdrawals)
+
+    # --- Guaranteed income ---
+    scss, pomis, fund = _col(params["scss_amount"]), _col(params["pomis_amount"]), _col(params["fd_fund"])
+    fd_principal = np.where(in_scheme, fund - scss - pomis, fund)
+    normal_fd = fd_principal * _col(params["normal_fd_share"]) * _col(params["normal_fd_rate"]) / MONTHS_PER_YEAR
+    sr_fd = fd_principal * (1.0 - _col(params["normal_fd_share"])) * _col(params["sr_fd_rate"]) / MONTHS_PER_YEAR
+    pomis_income = np.where(in_scheme, pomis * _col(params["pomis_rate"]) / MONTHS_PER_YEAR, 0.0)
+    scss_income = np.where(in_scheme & quarter_end, scss * _col(params["scss_rate"]) / 4, 0.0)
+
+    rental = np.minimum(_col(params["monthly_rental"]) * inflation, _col(params["max_monthly_rental"]))
+    shape = np.broadcast_shapes(closing.shape, inflation.shape, fd_principal.shape)
+    return {k: np.broadcast_to(v, shape) for k, v in {
+        "inflation_index": inflation,
+        "swp_opening": opening,
+        "swp_growth": growth,
+        "swp_withdrawal": withdrawn,
+        "swp_closing": closing,
+        "normal_fd_income": normal_fd,
+        "sr_fd_income_first5": np.where(in_scheme, sr_fd, 0.0),
+        "sr_fd_income_past5": np.where(in_scheme, 0.0, sr_fd),
+        "pomis_income": pomis_income,
+        "scss_income": scss_income,
+        "rental_income": rental,
+        "other_income": _col(params["other_income"]) / MONTHS_PER_YEAR,
+        "expenses_must": _col(params["expenses_must"]) * inflation,
+        "expenses_optional": _col(params["expenses_optional"]) * inflation,
+    }.items()}
+
+
+def monthly_to_yearly(monthly):
+    """Aggregates simulate_monthly() output to (..., Y) arrays, one value per plan year."""
+    def by_year(values):
+        return values.reshape(values.shape[:-1] + (-1, MONTHS_PER_YEAR))
+
+    yearly = {}
+    for key, values in monthly.items():
+        if key == "swp_opening":
+            yearly[key] = by_year(values)[..., 0]
+        elif key == "swp_closing":
+            yearly[key] = by_year(values)[..., -1]
+        elif key in ("inflation_index", "expenses_must", "expenses_optional"):
+            # Expense figures stay monthly amounts, as in the yearly table: the year's average month
+            yearly[key] = by_year(values).mean(axis=-1)
+        else:
+            yearly[key] = by_year(values).sum(axis=-1)
+    return yearly
+
+
+def monthly_projection_table(context, years=None, inflation_step_months=6):
+    """
+    Runs the monthly engine for an evaluated plan context and returns a DataFrame with the
+    same columns as calculate_projections(), so the existing pages can display it as is.
+    """
+    params = plan_params(context)
+    years = params["years"] if years is None else int(years)
+    yearly = monthly_to_yearly(simulate_monthly(params, years, inflation_step_months))
+
+    table = pd.DataFrame([context.inputs()] * years)
+    table.insert(0, "Year", np.arange(1, years + 1))
+    for name in RECURRING_EXPENSE_FIELDS:
+        table[name] = _input(context, name) * yearly["inflation_index"]
+    columns = {
+        "LocalSWPInvestAmount": yearly["swp_opening"],
+        "LocalSWPYearlyInterest": yearly["swp_growth"],
+        "LocalSWPYearlyWithdrawal": yearly["swp_withdrawal"],
+        "LocalSWPBalancePostWithdrawal": yearly["swp_closing"],
+        "GLSWPCorpusStatus": yearly["swp_closing"] - yearly["swp_opening"],
+        "GLTotalYearlyExpensesMust": yearly["expenses_must"],
+        "GLTotalYearlyExpensesOptional": yearly["expenses_optional"],
+        "LocalRentalIncome": yearly["rental_income"],
+        "LocalNormalFDYearlyIncome": yearly["normal_fd_income"],
+        "LocalSrFDYearlyIncomeFirst5": yearly["sr_fd_income_first5"],
+        "LocalSrFDYearlyIncomePast5": yearly["sr_fd_income_past5"],
+        "LocalPOMISYearlyIncome": yearly["pomis_income"],
+        "LocalSCSSYearlyIncome": yearly["scss_income"],
+    }
+    for name, values in columns.items():
+        table[name] = values
+    table["GLTotalIncomeOverallFDs"] = table[list(FORMULA_DEPS["GLTotalIncomeOverallFDs"])].sum(axis=1)
+    return table
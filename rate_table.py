@@ -0,0 +1,166 @@
+# rate_table.py
+#
+# Published FD / SCSS / POMIS rates, kept in one effective-dated table instead of a copy
+# in every plan.
+#
+# rate_table.csv holds one row per rate change (Field, Effective From, Rate in percent);
+# a row applies from its date until the next row for the same field, so future changes
+# can be entered ahead of time. The table is read once per file version and indexed in
+# memory (per field: sorted dates + rates), shared by every session of the process.
+#
+# A plan links to the table by marking a rate field with source "rate_table". Linked
+# fields are saved without a value and resolved against the table whenever the plan is
+# used. Typing a different rate on the input page makes it the plan's own value. Plans
+# whose linked rates moved get a new content hash, so only those are projected again;
+# every other cached projection stays valid.
+
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from config_registry import INPUT_DEFAULTS
+
+RATE_TABLE_FILE = os.environ.get("RATE_TABLE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_table.csv"))
+RATE_FIELDS = ("GLSrCitizenFDRate", "GLNormalFDRate", "GLSCSSRate", "GLPOMISRate")
+RATE_SOURCE = "rate_table"
+TABLE_COLUMNS = ("Field", "Effective From", "Rate")
+
+
+class RateTable:
+    """In-memory index over the effective-dated rate rows."""
+
+    def __init__(self, rows):
+        self.version = hashlib.sha1(json.dumps(sorted(rows)).encode()).hexdigest()[:12]
+        self._index = {}
+        for field in {row[0] for row in rows}:
+            dated = sorted((date, rate) for name, date, rate in rows if name == field)
+            dates = np.array([date for date, _ in dated], dtype="datetime64[D]")
+            rates = np.array([rate for _, rate in dated], dtype=float)
+            self._index[field] = (dates, rates)
+
+    def _row_in_force(self, field, on):
+        # Index of the last row dated on or before `on` (today by default), -1 if none
+        if field not in self._index:
+            return -1
+        dates = self._index[field][0]
+        return int(np.searchsorted(dates, np.datetime64(on or datetime.date.today(), "D"), side="right")) - 1
+
+    def rate_on(self, field, on=None):
+        """Rate in force for `field` on date `on`; None if the table has none yet."""
+        position = self._row_in_force(field, on)
+        return float(self._index[field][1][position]) if position >= 0 else None
+
+    def effective_from(self, field, on=None):
+        position = self._row_in_force(field, on)
+        return self._index[field][0][position].item() if position >= 0 else None
+
+    def current_rates(self, on=None):
+        """{field: rate} for every rate field, falling back to the config default."""
+        rates = {}
+        for field in RATE_FIELDS:
+            rate = self.rate_on(field, on)
+            rates[field] = INPUT_DEFAULTS[field] if rate is None else rate
+        return rates
+
+    def changed_fields(self, other, on=None):
+        """Rate fields whose rate in force differs between this table and `other`."""
+        mine, theirs = self.current_rates(on), other.current_rates(on)
+        return {field for field in RATE_FIELDS if mine[field] != theirs[field]}
+
+
+def read_rows(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in TABLE_COLUMNS if name not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{os.path.basename(path)} is missing column(s): {', '.join(missing)}")
+        return [(row["Field"].strip(), row["Effective From"].strip(), float(row["Rate"])) for row in reader if row["Field"].strip()]
+
+
+@lru_cache(maxsize=4)
+def _load(path, mtime):
+    return RateTable(read_rows(path))
+
+
+def load_rate_table(path=RATE_TABLE_FILE):
+    """The table at `path`, re-read only when the file changes."""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    return _load(path, mtime)
+
+
+# --- Plans ---
+def is_linked(plan, field):
+    return plan.get(field, {}).get("source") == RATE_SOURCE
+
+
+def link_rates(plan, fields=RATE_FIELDS):
+    for field in fields:
+        plan[field] = {"source": RATE_SOURCE}
+    return plan
+
+
+def link_legacy_rates(plan):
+    """
+    Old plan files stored a copy of the default rates. Those copies (and missing rates) are
+    linked to the table; rates the user changed stay the plan's own.
+    """
+    for field in RATE_FIELDS:
+        entry = plan.get(field, {})
+        if entry.get("source") is None and entry.get("input", INPUT_DEFAULTS[field]) == INPUT_DEFAULTS[field]:
+            plan[field] = {"source": RATE_SOURCE}
+    return plan
+
+
+def resolve_rates(plan, table, on=None):
+    """Writes the rates in force into the plan's linked fields; returns the fields that changed."""
+    changed = set()
+    for field, rate in table.current_rates(on).items():
+        if is_linked(plan, field) and plan[field].get("input") != rate:
+            plan.set_input(field, rate)
+            changed.add(field)
+    return changed
+
+
+def stored_plan(plan):
+    """The plan as saved to its file: linked rate fields keep only the link, not a value."""
+    data = plan.to_dict()
+    for field in RATE_FIELDS:
+        if data.get(field, {}).get("source") == RATE_SOURCE:
+            data[field] = {"source": RATE_SOURCE}
+    return data
+
+
+def affected_plans(plans, changed):
+    """Names of the plans ({name: plan data}) that link to any of the `changed` rate fields."""
+    return sorted(name for name, data in plans.items()
+                  if any(data.get(field, {}).get("source") == RATE_SOURCE for field in changed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lists the saved plans a rate table change affects.")
+    parser.add_argument("old", help="previous rate table (CSV)")
+    parser.add_argument("new", help="new rate table (CSV)")
+    parser.add_argument("plans", nargs="*", help="plan files (*_user_data.json)")
+    parser.add_argument("--on", help="date to compare the rates on (YYYY-MM-DD, default today)")
+    args = parser.parse_args()
+
+    changed = RateTable(read_rows(args.old)).changed_fields(RateTable(read_rows(args.new)), args.on)
+    print("Changed rates:", ", ".join(sorted(changed)) or "none")
+    plans = {}
+    for path in args.plans:
+        with open(path) as f:
+            plans[path] = link_legacy_rates(json.load(f))
+    for path in affected_plans(plans, changed):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
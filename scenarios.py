@@ -0,0 +1,70 @@
+# scenarios.py
+#
+# Named what-if scenarios, stored as deltas over the user's base plan.
+#
+# A scenario is {"inputs": {FieldName: value, ...}, "joint_limits": bool}. Only the inputs
+# that differ from the base plan are kept (in user_data["Scenarios"]), so a scenario
+# follows every later edit of the base plan. A scenario's plan is built from the already
+# evaluated base plan: the changed inputs are written in and only the formula fields
+# downstream of them are re-evaluated.
+
+from config_registry import INPUT_DEFAULTS
+
+SCENARIOS_KEY = "Scenarios"
+BASE_SCENARIO = "Current Plan"
+MAX_SCENARIOS = 8
+# With joint accounts the SCSS / POMIS amounts come from the joint limits instead of the single ones
+JOINT_LIMIT_OVERRIDES = {"LocalSCSSAmount": "GLSCSSJoint", "LocalPOMISAmount": "GLPOMISJoint"}
+# Inputs a scenario can change: every numeric, non-formula input field
+SCENARIO_FIELDS = tuple(name for name, value in INPUT_DEFAULTS.items() if isinstance(value, (int, float)))
+
+
+def load_scenarios(plan):
+    return dict(plan.get(SCENARIOS_KEY, {}).get("input", {}))
+
+
+def store_scenarios(plan, scenarios):
+    if scenarios:
+        plan[SCENARIOS_KEY] = {"input": scenarios}
+    elif SCENARIOS_KEY in plan:
+        del plan[SCENARIOS_KEY]
+
+
+def scenario_deltas(base_plan, inputs):
+    """Keeps only the inputs that differ from the base plan."""
+    deltas = {}
+    for name, value in inputs.items():
+        try:
+            value = float(value)
+        except (ValueError, TypeError):
+            continue
+        if name in SCENARIO_FIELDS and value != base_plan.get_input(name, INPUT_DEFAULTS[name]):
+            deltas[name] = value
+    return deltas
+
+
+def build_scenario_plan(base_plan, scenario, evaluate):
+    """
+    Plan for one scenario. `base_plan` must already have its input-page totals evaluated
+    (calculate_initial_totals); `evaluate(formula, context, field_name)` is the app's formula
+    evaluator. Investment Plan formulas are left to the projection, which evaluates them anyway.
+    """
+    plan = base_plan.copy()
+    if SCENARIOS_KEY in plan:
+        del plan[SCENARIOS_KEY]
+    inputs = scenario.get("inputs", {})
+    for name, value in inputs.items():
+        plan.set_input(name, value)
+    plan.refresh_formulas(inputs, evaluate)
+    if scenario.get("joint_limits"):
+        for name, limit in JOINT_LIMIT_OVERRIDES.items():
+            # "manual" keeps store_and_eval_all_variables from re-deriving it from the single limit
+            plan[name] = {"input": plan.get_input(limit, INPUT_DEFAULTS[limit]), "source": "manual"}
+    return plan
+
+
+def describe_scenario(scenario, descriptions):
+    parts = [f"{descriptions.get(name, name)}: {value:,.2f}".rstrip("0").rstrip(".") for name, value in scenario.get("inputs", {}).items()]
+    if scenario.get("joint_limits"):
+        parts.append("Joint SCSS/POMIS limits")
+    return "; ".join(parts) or "Same as current plan"
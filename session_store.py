@@ -0,0 +1,166 @@
+# session_store.py
+#
+# Process-wide store for the heavy artifacts of a session: projection tables, Plotly
+# figures and generated PDF bytes.
+#
+# Artifacts are keyed by content (e.g. the plan's content hash), so sessions looking at
+# the same plan share one copy, and st.session_state only ever holds small values. The
+# store is bounded by a byte budget (least recently used artifacts go first) and forgets
+# sessions that have been idle for a while, dropping whatever only they were using.
+# Pinned artifacts (the shared guest demo) are never evicted.
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_CACHE_BYTES = int(os.environ.get("ARTIFACT_CACHE_MB", "256")) * 1024 * 1024
+SESSION_IDLE_SECONDS = int(os.environ.get("SESSION_IDLE_MINUTES", "30")) * 60
+# Idle sessions are swept at most this often, not on every rerun
+SWEEP_INTERVAL_SECONDS = 60
+
+
+def artifact_size(value):
+    """Approximate memory held by an artifact, in bytes."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(artifact_size(item) for item in value.values())
+    if hasattr(value, "to_plotly_json"):
+        return len(value.to_json())
+    if isinstance(value, (tuple, list)):
+        return sum(artifact_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ArtifactStore:
+    """
+    Bounded, thread-safe LRU cache shared by all sessions of the process.
+
+    Every artifact remembers which sessions used it. An artifact is dropped when the byte
+    budget needs room (oldest use first) or when all sessions that used it went idle,
+    unless it is pinned.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, idle_seconds=SESSION_IDLE_SECONDS):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._items = OrderedDict()  # key -> (value, size)
+        self._owners = {}            # key -> {session_id, ...}
+        self._sessions = {}          # session_id -> {"last_seen": ..., "keys": {...}}
+        self._pinned = set()
+        self._bytes = 0
+        self._last_sweep = 0.0
+        self._lock = threading.RLock()
+
+    # --- Sessions ---
+    def touch(self, session_id):
+        """Marks a session as active and sweeps idle sessions now and then."""
+        now = time.monotonic()
+        with self._lock:
+            self._sessions.setdefault(session_id, {"keys": set()})["last_seen"] = now
+            if now - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+                self.evict_idle(now)
+
+    def evict_idle(self, now=None):
+        """Forgets sessions idle for longer than idle_seconds; returns how many went."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_sweep = now
+            idle = [sid for sid, session in self._sessions.items() if now - session["last_seen"] > self.idle_seconds]
+            for sid in idle:
+                for key in self._sessions.pop(sid)["keys"]:
+                    owners = self._owners.get(key)
+                    if owners is None:
+                        continue
+                    owners.discard(sid)
+                    if not owners and key not in self._pinned:
+                        self._remove(key)
+            return len(idle)
+
+    def end_session(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id]["last_seen"] = float("-inf")
+                self.evict_idle(time.monotonic())
+
+    # --- Artifacts ---
+    def get(self, key, session_id=None):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            self._own(key, session_id)
+            return self._items[key][0]
+
+    def put(self, key, value, session_id=None, pinned=False):
+        """Stores an artifact; one that does not fit the budget is returned but not kept."""
+        size = artifact_size(value)
+        with self._lock:
+            self._remove(key)
+            # Pinned artifacts stay, so don't evict anything for one that can never fit
+            if size > self.max_bytes - sum(self._items[k][1] for k in self._pinned):
+                return value
+            while self._bytes + size > self.max_bytes:
+                victim = next((k for k in self._items if k not in self._pinned), None)
+                if victim is None:
+                    return value
+                self._remove(victim)
+            self._items[key] = (value, size)
+            self._bytes += size
+            if pinned:
+                self._pinned.add(key)
+            self._own(key, session_id)
+        return value
+
+    def get_or_create(self, key, factory, session_id=None):
+        value = self.get(key, session_id)
+        if value is None:
+            # Built outside the lock; two sessions racing on the same key just both build it
+            value = self.put(key, factory(), session_id)
+        return value
+
+    def _own(self, key, session_id):
+        if session_id is None:
+            return
+        self._owners.setdefault(key, set()).add(session_id)
+        self._sessions.setdefault(session_id, {"keys": set(), "last_seen": time.monotonic()})["keys"].add(key)
+
+    def _remove(self, key):
+        entry = self._items.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+        self._pinned.discard(key)
+        for sid in self._owners.pop(key, ()):
+            if sid in self._sessions:
+                self._sessions[sid]["keys"].discard(key)
+
+    # --- Reporting ---
+    def stats(self):
+        with self._lock:
+            return {"artifacts": len(self._items), "pinned": len(self._pinned), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes, "sessions": len(self._sessions)}
+
+    def session_report(self):
+        """One row per session: artifacts it uses, their bytes and how much of that is shared."""
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for sid, session in self._sessions.items():
+                keys = [key for key in session["keys"] if key in self._items]
+                rows.append({
+                    "Session": sid,
+                    "Artifacts": len(keys),
+                    "Bytes": sum(self._items[key][1] for key in keys),
+                    "Shared Bytes": sum(self._items[key][1] for key in keys if len(self._owners.get(key, ())) > 1),
+                    "Idle (s)": int(now - session["last_seen"]),
+                })
+            return rows
@@ -0,0 +1,101 @@
+// service-worker.js
+//
+// Offline support for the planner. Streamlit serves this file as app/static/service-worker.js
+// (server.enableStaticServing) and inject_pwa_script() in app.py registers it.
+//
+// - install: precaches the app's own files (manifest, offline page)
+// - Streamlit's own bundles (static/js, static/css, static/media) have hashed names and never
+//   change, so they are served from the cache first and cached on first use
+// - the app's own files (app/static/): network first, so edits show up, the cache when offline
+// - the app page: network only; offline it redirects to offline.html, since the Streamlit page
+//   can't do anything without its server (redirected rather than served in place, so the
+//   page's own URLs, like the summary, resolve from app/static/)
+// - the websocket and _stcore endpoints are never cached
+//
+// The app writes the user's last projection summary into the "planner-summary" cache
+// itself (see inject_pwa_script); offline.html reads it from there.
+
+const SHELL_CACHE = "planner-shell-v2";
+const ASSET_CACHE = "planner-assets-v2";
+const SUMMARY_CACHE = "planner-summary";
+const KEEP = [SHELL_CACHE, ASSET_CACHE, SUMMARY_CACHE];
+
+// This file lives in <app>/app/static/
+const STATIC_ROOT = new URL("./", self.location).href;
+const OFFLINE_PAGE = STATIC_ROOT + "offline.html";
+const SHELL = [STATIC_ROOT + "manifest.json", OFFLINE_PAGE];
+// Streamlit's hashed bundles, e.g. /static/js/main.1a2b3c.js
+const BUNDLE_PATH = /\/static\/(js|css|media)\//;
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches.open(SHELL_CACHE)
+      .then((cache) => cache.addAll(SHELL))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(names.filter((name) => !KEEP.includes(name)).map((name) => caches.delete(name))))
+      .then(() => self.clients.claim())
+  );
+});
+
+function isBundle(url) {
+  return BUNDLE_PATH.test(url.pathname) && !url.href.startsWith(STATIC_ROOT);
+}
+
+async function cacheFirst(request) {
+  const cached = await caches.match(request);
+  if (cached) {
+    return cached;
+  }
+  const response = await fetch(request);
+  if (response.ok) {
+    const cache = await caches.open(ASSET_CACHE);
+    cache.put(request, response.clone());
+  }
+  return response;
+}
+
+async function networkFirst(request) {
+  try {
+    const response = await fetch(request);
+    if (response.ok) {
+      const cache = await caches.open(SHELL_CACHE);
+      cache.put(request, response.clone());
+    }
+    return response;
+  } catch (err) {
+    return (await caches.match(request)) || Response.error();
+  }
+}
+
+async function offlineFallback(request) {
+  try {
+    return await fetch(request);
+  } catch (err) {
+    const offline = await caches.match(OFFLINE_PAGE);
+    if (!offline) {
+      return Response.error();
+    }
+    return request.url === OFFLINE_PAGE ? offline : Response.redirect(OFFLINE_PAGE, 302);
+  }
+}
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (request.method !== "GET" || url.origin !== self.location.origin || url.pathname.includes("/_stcore/")) {
+    return;
+  }
+  if (request.mode === "navigate") {
+    event.respondWith(offlineFallback(request));
+  } else if (url.href.startsWith(STATIC_ROOT)) {
+    event.respondWith(networkFirst(request));
+  } else if (isBundle(url)) {
+    event.respondWith(cacheFirst(request));
+  }
+});
@@ -0,0 +1,167 @@
+# tax_engine.py
+#
+# Yearly tax estimate for a projection:
+#   - LTCG on SWP redemptions, using the running cost basis of the SWP corpus
+#     (each withdrawal sells a slice of units; only the gain part of it is taxed,
+#     after the GLSWPLCTGExemption, at GLSWPLCTGTaxSlab %)
+#   - slab income tax on FD / SCSS / POMIS interest and rental income, with the
+#     senior-citizen exemptions of the chosen regime
+#
+# With GLDeductComputedTax on (the default), the computed tax is paid out of the cash flow:
+# it takes the place of the hand-entered LocalMiscellaneousTax line in the must expenses.
+#
+# Slab tables are precomputed once into (threshold, tax-at-threshold, rate) arrays, so a
+# lookup is a binary search: bisect for a single income, np.searchsorted for all
+# projection years at once.
+
+import bisect
+
+import numpy as np
+
+from projection_engine import MONTHS_PER_YEAR
+
+TAX_REGIMES = ("New", "Old")
+CESS_RATE = 0.04
+RENTAL_STANDARD_DEDUCTION = 0.30
+SENIOR_AGE, SUPER_SENIOR_AGE = 60, 80
+# Sec 80TTB: interest deduction for senior citizens (old regime only)
+SENIOR_INTEREST_DEDUCTION = 50000
+
+# (regime, age band) -> [(income from, marginal rate), ...]
+SLABS = {
+    ("New", "all"): [(0, 0.0), (400000, 0.05), (800000, 0.10), (1200000, 0.15), (1600000, 0.20), (2000000, 0.25), (2400000, 0.30)],
+    ("Old", "below_senior"): [(0, 0.0), (250000, 0.05), (500000, 0.20), (1000000, 0.30)],
+    ("Old", "senior"): [(0, 0.0), (300000, 0.05), (500000, 0.20), (1000000, 0.30)],
+    ("Old", "super_senior"): [(0, 0.0), (500000, 0.20), (1000000, 0.30)],
+}
+# Sec 87A: no slab tax up to this taxable income. Just above it the new regime gives marginal
+# relief: the tax is capped at the income over the limit, so a rupee more never costs more
+REBATE_LIMIT = {"New": 1200000, "Old": 500000}
+DEDUCT_TAX_OPTIONS = ("Yes", "No")
+
+
+def _build_table(slabs):
+    thresholds = np.array([start for start, _ in slabs], dtype=float)
+    rates = np.array([rate for _, rate in slabs], dtype=float)
+    base_tax = np.concatenate([[0.0], np.cumsum(np.diff(thresholds) * rates[:-1])])
+    return thresholds, base_tax, rates
+
+
+SLAB_TABLES = {key: _build_table(slabs) for key, slabs in SLABS.items()}
+
+
+def _age_band(regime, age):
+    if regime == "New":
+        return "all"
+    if age >= SUPER_SENIOR_AGE:
+        return "super_senior"
+    return "senior" if age >= SENIOR_AGE else "below_senior"
+
+
+def slab_tax(taxable_income, regime="New", age=0):
+    """Tax (with cess and 87A rebate) on a single taxable income."""
+    thresholds, base_tax, rates = SLAB_TABLES[(regime, _age_band(regime, age))]
+    if taxable_income <= REBATE_LIMIT[regime]:
+        return 0.0
+    i = bisect.bisect_right(thresholds, taxable_income) - 1
+    tax = base_tax[i] + (taxable_income - thresholds[i]) * rates[i]
+    if regime == "New":
+        tax = min(tax, taxable_income - REBATE_LIMIT[regime])
+    return float(tax * (1 + CESS_RATE))
+
+
+def slab_tax_vector(taxable_incomes, regime="New", ages=0):
+    """slab_tax() for an array of incomes (e.g. one per projection year), ages broadcast alongside."""
+    incomes = np.asarray(taxable_incomes, dtype=float)
+    ages = np.broadcast_to(np.asarray(ages, dtype=float), incomes.shape)
+    tax = np.zeros(incomes.shape)
+    bands = {"all": np.ones(incomes.shape, dtype=bool)} if regime == "New" else {
+        "super_senior": ages >= SUPER_SENIOR_AGE,
+        "senior": (ages >= SENIOR_AGE) & (ages < SUPER_SENIOR_AGE),
+        "below_senior": ages < SENIOR_AGE,
+    }
+    for band, mask in bands.items():
+        thresholds, base_tax, rates = SLAB_TABLES[(regime, band)]
+        i = np.searchsorted(thresholds, incomes, side="right") - 1
+        tax = np.where(mask, base_tax[i] + (incomes - thresholds[i]) * rates[i], tax)
+    if regime == "New":
+        tax = np.minimum(tax, incomes - REBATE_LIMIT[regime])
+    tax = np.where(incomes <= REBATE_LIMIT[regime], 0.0, tax)
+    return tax * (1 + CESS_RATE)
+
+
+def swp_gains(cost_basis, values_before, withdrawals):
+    """
+    Capital gain realised by each SWP withdrawal under average-cost accounting.
+
+    `values_before` is the corpus value just before each withdrawal. A withdrawal sells
+    the fraction w / value of the holding and takes the same fraction of the remaining
+    cost basis with it; the rest of the withdrawal is gain. A withdrawal can't sell more
+    than the corpus holds: once it is used up, nothing is sold and there is no gain.
+    Arrays are (..., periods).
+    """
+    values_before = np.asarray(values_before, dtype=float)
+    withdrawals = np.minimum(np.asarray(withdrawals, dtype=float), np.maximum(values_before, 0.0))
+    sold = np.clip(np.divide(withdrawals, values_before, out=np.zeros(np.broadcast(withdrawals, values_before).shape),
+                             where=values_before > 0), 0.0, 1.0)
+    remaining = np.cumprod(1.0 - sold, axis=-1)
+    basis_before = np.asarray(cost_basis, dtype=float)[..., None] * np.concatenate(
+        [np.ones(remaining.shape[:-1] + (1,)), remaining[..., :-1]], axis=-1)
+    return withdrawals - basis_before * sold
+
+
+def ltcg_tax(yearly_gains, exemption, rate_percent):
+    """LTCG tax per year: gains above the yearly exemption taxed at the flat LTCG rate, plus cess."""
+    taxable = np.maximum(np.asarray(yearly_gains, dtype=float) - exemption, 0.0)
+    return taxable * rate_percent / 100.0 * (1 + CESS_RATE)
+
+
+def _value(context, name, default=0):
+    return context.get(name, {}).get("input", default)
+
+
+def projection_taxes(table, context):
+    """
+    Taxes for each year of a projection table (the output of calculate_projections or the
+    monthly engine). All redemptions are treated as long-term; interest and rent are taxed
+    at the plan's regime using the age reached in each year.
+    """
+    regime = _value(context, "GLTaxRegime", "New")
+    regime = regime if regime in TAX_REGIMES else "New"
+    years = table["Year"].to_numpy(dtype=float)
+    ages = float(_value(context, "GLAge")) + years - 1
+
+    withdrawals = table["LocalSWPYearlyWithdrawal"].to_numpy(dtype=float)
+    values_before = (table["LocalSWPInvestAmount"] + table["LocalSWPYearlyInterest"]).to_numpy(dtype=float)
+    gains = swp_gains(float(table["LocalSWPInvestAmount"].iloc[0]), values_before, withdrawals)
+    ltcg = ltcg_tax(gains, float(_value(context, "GLSWPLCTGExemption")), float(_value(context, "GLSWPLCTGTaxSlab")))
+
+    interest = table[["LocalNormalFDYearlyIncome", "LocalSrFDYearlyIncomeFirst5", "LocalSrFDYearlyIncomePast5",
+                      "LocalPOMISYearlyIncome", "LocalSCSSYearlyIncome"]].sum(axis=1).to_numpy(dtype=float)
+    if regime == "Old":
+        interest = interest - np.where(ages >= SENIOR_AGE, np.minimum(interest, SENIOR_INTEREST_DEDUCTION), 0.0)
+    rental = table["LocalRentalIncome"].to_numpy(dtype=float) * (1 - RENTAL_STANDARD_DEDUCTION)
+    income_tax = slab_tax_vector(interest + rental, regime, ages)
+
+    return {"LocalSWPLTCGTax": ltcg, "LocalSlabIncomeTax": income_tax, "GLTotalTax": ltcg + income_tax}
+
+
+def deducts_tax(context):
+    return _value(context, "GLDeductComputedTax", "Yes") != "No"
+
+
+def add_tax_columns(table, context):
+    """
+    Adds the projection_taxes() columns to a projection table (in place) and returns it.
+    When the plan deducts the computed tax, a twelfth of it replaces LocalMiscellaneousTax
+    (expenses are monthly amounts) and the must-expense total follows.
+    """
+    if table is None or table.empty:
+        return table
+    for name, values in projection_taxes(table, context).items():
+        table[name] = values
+    if deducts_tax(context):
+        monthly_tax = table["GLTotalTax"] / MONTHS_PER_YEAR
+        table["GLTotalYearlyExpensesMust"] += monthly_tax - table["LocalMiscellaneousTax"]
+        table["LocalMiscellaneousTax"] = monthly_tax
+    return table
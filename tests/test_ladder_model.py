@@ -0,0 +1,59 @@
+# test_ladder_model.py
+#
+# The default ladder against the original FD / SCSS / POMIS schedule (the monthly
+# engine still computes it directly), and ladder rows with blank cells.
+
+import numpy as np
+import pytest
+
+from ladder_model import clean_row, default_ladder, ladder_arrays, ladder_income
+from plan_projection import prepare_plan, evaluate_investment_formulas
+from projection_engine import monthly_to_yearly, plan_params, simulate_monthly
+
+YEARS = 12
+
+
+def default_params():
+    context = prepare_plan({"GLProjectionYears": {"input": YEARS}})
+    return plan_params(evaluate_investment_formulas(context.copy()))
+
+
+def test_default_ladder_reproduces_the_original_schedule():
+    params = default_params()
+    income = ladder_income(params, YEARS)
+    yearly = monthly_to_yearly(simulate_monthly(params, YEARS, inflation_step_months=12))
+    for column, stream in (("LocalNormalFDYearlyIncome", "normal_fd_income"),
+                           ("LocalSrFDYearlyIncomeFirst5", "sr_fd_income_first5"),
+                           ("LocalSrFDYearlyIncomePast5", "sr_fd_income_past5"),
+                           ("LocalPOMISYearlyIncome", "pomis_income"),
+                           ("LocalSCSSYearlyIncome", "scss_income")):
+        assert income[column] == pytest.approx(yearly[stream]), column
+    assert not income["LocalDepositsPaidOut"].any()
+
+
+def test_default_ladder_schedule_by_hand():
+    params = default_params()
+    income = ladder_income(params, YEARS)
+    fd_principal = params["fd_fund"] - params["scss_amount"] - params["pomis_amount"]
+    share = params["normal_fd_share"]
+    # SCSS and POMIS pay for five years, then their principal earns FD interest
+    assert income["LocalSCSSYearlyIncome"][:5] == pytest.approx(params["scss_amount"] * params["scss_rate"])
+    assert not income["LocalSCSSYearlyIncome"][5:].any()
+    assert income["LocalNormalFDYearlyIncome"][0] == pytest.approx(fd_principal * share * params["normal_fd_rate"])
+    assert income["LocalNormalFDYearlyIncome"][5] == pytest.approx(params["fd_fund"] * share * params["normal_fd_rate"])
+    assert income["LocalSrFDYearlyIncomePast5"][5] == pytest.approx(params["fd_fund"] * (1 - share) * params["sr_fd_rate"])
+
+
+def test_blank_cells_get_defaults():
+    row = {"Instrument": "Normal FD", "Amount": 100000.0, "Start Year": np.nan, "Tenure (years)": float("nan"),
+           "Payout": np.nan, "At Maturity": None}
+    assert clean_row(row) == {"Instrument": "Normal FD", "Amount": 100000.0, "Start Year": 1, "Tenure (years)": 1,
+                              "Payout": "Yearly", "At Maturity": "Renew"}
+    tranches = ladder_arrays([row, {"Instrument": np.nan, "Amount": 5.0}, {"Instrument": "SCSS", "Amount": np.nan}])
+    assert tranches["amount"].tolist() == [100000.0]
+    assert tranches["start"].tolist() == [1]
+
+
+def test_default_rows_survive_cleaning():
+    rows = default_ladder(default_params())
+    assert [clean_row(row) for row in rows] == rows
@@ -0,0 +1,16 @@
+# test_onboarding.py
+#
+# Projection years of a seeded plan, with and without the free-account cap.
+
+from onboarding import MIN_PROJECTION_YEARS, PLAN_TO_AGE, seed_plan_inputs
+
+
+def test_plan_runs_to_age_85():
+    assert seed_plan_inputs(60, 5000000, 50000)["GLProjectionYears"] == PLAN_TO_AGE - 60
+    assert seed_plan_inputs(80, 5000000, 50000)["GLProjectionYears"] == MIN_PROJECTION_YEARS
+
+
+def test_free_accounts_are_capped():
+    assert seed_plan_inputs(60, 5000000, 50000, max_years=2)["GLProjectionYears"] == 2
+    # The cap never lengthens a plan
+    assert seed_plan_inputs(60, 5000000, 50000, max_years=50)["GLProjectionYears"] == PLAN_TO_AGE - 60
@@ -0,0 +1,61 @@
+# test_rate_table.py
+#
+# rate_table.py against a small fixture table (rate_table_fixture.csv). GLPOMISRate has
+# no rows there, so it falls back to the config default.
+
+import datetime
+import os
+
+from config_registry import INPUT_DEFAULTS
+from plan_state import PlanState
+from rate_table import RATE_SOURCE, is_linked, link_legacy_rates, load_rate_table, resolve_rates
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_table_fixture.csv")
+
+
+def fixture_table():
+    return load_rate_table(FIXTURE)
+
+
+def test_current_rates_use_the_row_in_force():
+    rates = fixture_table().current_rates(datetime.date(2025, 6, 1))
+    assert rates["GLSrCitizenFDRate"] == 7.25
+    assert rates["GLNormalFDRate"] == 6.75
+    assert rates["GLSCSSRate"] == 8.2
+    assert rates["GLPOMISRate"] == INPUT_DEFAULTS["GLPOMISRate"]
+
+
+def test_current_rates_on_a_change_date_and_before_the_first_row():
+    table = fixture_table()
+    assert table.current_rates(datetime.date(2025, 4, 1))["GLSrCitizenFDRate"] == 7.25
+    assert table.current_rates(datetime.date(2025, 3, 31))["GLSrCitizenFDRate"] == 7.5
+    early = table.current_rates(datetime.date(2023, 12, 31))
+    assert early["GLNormalFDRate"] == INPUT_DEFAULTS["GLNormalFDRate"]
+
+
+def test_link_legacy_rates_links_default_copies_only():
+    plan = PlanState.from_dict({
+        "GLSrCitizenFDRate": {"input": INPUT_DEFAULTS["GLSrCitizenFDRate"]},
+        "GLNormalFDRate": {"input": 9.0},
+        "GLSCSSRate": {"input": 8.5, "source": "manual"},
+    })
+    link_legacy_rates(plan)
+    assert is_linked(plan, "GLSrCitizenFDRate")
+    assert is_linked(plan, "GLPOMISRate")
+    assert not is_linked(plan, "GLNormalFDRate")
+    assert plan["GLNormalFDRate"]["input"] == 9.0
+    assert not is_linked(plan, "GLSCSSRate")
+
+
+def test_resolve_rates_fills_linked_fields_and_reports_changes():
+    plan = link_legacy_rates(PlanState.from_dict({"GLNormalFDRate": {"input": 9.0}}))
+    changed = resolve_rates(plan, fixture_table(), datetime.date(2025, 6, 1))
+    assert changed == {"GLSrCitizenFDRate", "GLSCSSRate", "GLPOMISRate"}
+    assert plan["GLSrCitizenFDRate"]["input"] == 7.25
+    assert plan["GLSCSSRate"]["source"] == RATE_SOURCE
+    assert plan["GLNormalFDRate"]["input"] == 9.0
+
+    # Nothing moves until the next rate change takes effect
+    assert resolve_rates(plan, fixture_table(), datetime.date(2025, 12, 31)) == set()
+    assert resolve_rates(plan, fixture_table(), datetime.date(2026, 1, 1)) == {"GLSCSSRate"}
+    assert plan["GLSCSSRate"]["input"] == 8.0
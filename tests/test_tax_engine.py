@@ -0,0 +1,57 @@
+# test_tax_engine.py
+#
+# Slab tax, the 87A rebate and its marginal relief, and LTCG on SWP redemptions.
+
+import numpy as np
+import pytest
+
+from tax_engine import CESS_RATE, REBATE_LIMIT, ltcg_tax, slab_tax, slab_tax_vector, swp_gains
+
+
+def test_new_regime_slabs():
+    # 4L at 0, 4L at 5%, 4L at 10%, 4L at 15%, 4L at 20%: 2L, plus cess
+    assert slab_tax(2000000) == pytest.approx(200000 * (1 + CESS_RATE))
+    assert slab_tax(2800000) == pytest.approx((300000 + 400000 * 0.30) * (1 + CESS_RATE))
+
+
+def test_old_regime_slabs_by_age():
+    # 2.5L / 3L / 5L exempt for below 60 / 60+ / 80+
+    assert slab_tax(800000, "Old", 40) == pytest.approx((12500 + 300000 * 0.20) * (1 + CESS_RATE))
+    assert slab_tax(800000, "Old", 65) == pytest.approx((10000 + 300000 * 0.20) * (1 + CESS_RATE))
+    assert slab_tax(800000, "Old", 85) == pytest.approx(300000 * 0.20 * (1 + CESS_RATE))
+
+
+def test_rebate_and_marginal_relief():
+    limit = REBATE_LIMIT["New"]
+    assert slab_tax(limit) == 0.0
+    # Just over the limit the tax is capped at the income over it
+    assert slab_tax(limit + 1000) == pytest.approx(1000 * (1 + CESS_RATE))
+    assert slab_tax(limit + 1000) < slab_tax(limit + 100000)
+    # Far above it the slab tax is lower than the excess, so no relief
+    assert slab_tax(1400000) == pytest.approx((60000 + 200000 * 0.15) * (1 + CESS_RATE))
+    # The old regime has no marginal relief
+    assert slab_tax(REBATE_LIMIT["Old"] + 1, "Old", 40) == pytest.approx((12500 + 0.20) * (1 + CESS_RATE))
+
+
+def test_vector_matches_scalar():
+    incomes = np.array([0, 300000, 1200000, 1201000, 1250000, 1400000, 2000000, 3000000], dtype=float)
+    ages = np.array([40, 62, 81, 55, 60, 70, 90, 59])
+    for regime in ("New", "Old"):
+        expected = [slab_tax(income, regime, age) for income, age in zip(incomes, ages)]
+        assert slab_tax_vector(incomes, regime, ages) == pytest.approx(expected)
+
+
+def test_swp_gains_average_cost():
+    # Half of a 2L holding (1L cost) sold: half the cost basis goes with it
+    gains = swp_gains(100000, [200000, 100000], [100000, 100000])
+    assert gains == pytest.approx([50000, 50000])
+
+
+def test_exhausted_corpus_has_no_gain_or_tax():
+    values_before = np.array([500000, 50000, 0, -600000], dtype=float)
+    withdrawals = np.full(4, 300000.0)
+    gains = swp_gains(400000, values_before, withdrawals)
+    # Year 2 sells what is left, years 3 and 4 sell nothing
+    assert gains[2:] == pytest.approx([0, 0])
+    assert gains[1] <= 50000
+    assert ltcg_tax(gains, 100000, 12.5)[2:] == pytest.approx([0, 0])
@@ -0,0 +1,92 @@
+# whatif.py
+#
+# What-if sliders for the Summary page: inflation, SWP growth and the monthly SWP
+# withdrawal.
+#
+# Each slider covers a range around the plan's own value. A coarse grid over the three
+# ranges (GRID_POINTS per axis) is projected once per plan, in a background thread, and
+# kept as a response surface: total income and expenses per year at every grid point.
+# Slider positions between grid points are interpolated (multilinear, per year), which
+# is instant; the exact projection of the chosen values is run separately and replaces
+# the interpolated one when it is ready.
+
+import numpy as np
+
+from plan_projection import evaluate_formula, project_plan
+from projection_engine import MONTHS_PER_YEAR
+from scenarios import build_scenario_plan
+
+GRID_POINTS = 5
+# field: (label, half-width of the range, step); withdrawals range over a share of the plan's value
+WHATIF_FIELDS = {
+    "GLInflationRate": ("Inflation (%)", 4.0, 0.25),
+    "GLSWPGrowthRate": ("SWP Growth (%)", 4.0, 0.25),
+    "GLSWPMonthlyWithdrawal": ("Monthly SWP Withdrawal", 0.5, 500.0),
+}
+# Withdrawal range when the plan has none
+DEFAULT_WITHDRAWAL_RANGE = 50000.0
+
+
+def slider_ranges(plan):
+    """{field: (low, high, value, step)} around the plan's values."""
+    ranges = {}
+    for field, (_, width, step) in WHATIF_FIELDS.items():
+        value = float(plan.get_input(field, 0) or 0)
+        if field == "GLSWPMonthlyWithdrawal":
+            low, high = value * (1 - width), value * (1 + width)
+            if value <= 0:
+                high = DEFAULT_WITHDRAWAL_RANGE
+        else:
+            low, high = value - width, value + width
+        low = max(np.floor(low / step) * step, 0.0)
+        high = max(np.ceil(high / step) * step, low + step)
+        ranges[field] = (float(low), float(high), value, step)
+    return ranges
+
+
+def whatif_plan(plan, values):
+    """The plan with the slider values written in (and its dependent formulas refreshed)."""
+    changed = {field: float(value) for field, value in values.items() if float(value) != plan.get_input(field, 0)}
+    return build_scenario_plan(plan, {"inputs": changed}, evaluate_formula)
+
+
+def income_expenses(df_projections):
+    """(total income, total expenses) per year, as on the income-vs-expense chart."""
+    income = df_projections["GLTotalIncomeOverallFDs"].to_numpy(dtype=float)
+    # The expense totals are monthly amounts
+    monthly = df_projections["GLTotalYearlyExpensesMust"] + df_projections["GLTotalYearlyExpensesOptional"]
+    expenses = (monthly * MONTHS_PER_YEAR).to_numpy(dtype=float)
+    return income, expenses
+
+
+def response_surface(plan, ranges, monthly_resolution=False):
+    """
+    Projects the plan at every point of the slider grid. Returns {"axes": [(GRID_POINTS,)
+    per field], "income" / "expenses": (GRID_POINTS,) * fields + (years,)}, or None when
+    the plan has no projection.
+    """
+    axes = [np.linspace(low, high, GRID_POINTS) for low, high, _, _ in ranges.values()]
+    income = expenses = None
+    for index in np.ndindex(*(len(axis) for axis in axes)):
+        values = {field: axis[i] for field, axis, i in zip(ranges, axes, index)}
+        df, _ = project_plan(whatif_plan(plan, values), monthly_resolution)
+        if df is None or df.empty:
+            return None
+        point_income, point_expenses = income_expenses(df)
+        if income is None:
+            income = np.empty(tuple(len(axis) for axis in axes) + point_income.shape)
+            expenses = np.empty_like(income)
+        income[index], expenses[index] = point_income, point_expenses
+    return {"axes": axes, "income": income, "expenses": expenses}
+
+
+def interpolate(surface, values):
+    """(income, expenses) per year at slider `values` (in WHATIF_FIELDS order), interpolated."""
+    income, expenses = surface["income"], surface["expenses"]
+    for axis, value in zip(surface["axes"], values):
+        # Collapse the leading axis: blend the two grid slices around the value
+        position = np.clip(np.searchsorted(axis, value, side="right") - 1, 0, len(axis) - 2)
+        weight = np.clip((value - axis[position]) / (axis[position + 1] - axis[position]), 0.0, 1.0)
+        income = income[position] * (1 - weight) + income[position + 1] * weight
+        expenses = expenses[position] * (1 - weight) + expenses[position + 1] * weight
+    return income, expenses